@@ -0,0 +1,118 @@
+# app/alert_log.py
+"""
+Journal des alertes de la salle (indépendant de Tk).
+
+Fonctionnalités :
+- AlertLog : deque à capacité fixe comme source de vérité (les plus anciennes sortent
+  automatiquement) ; add() est O(1) quel que soit le volume.
+- Niveaux de sévérité : info, warning, error.
+- Abonnés (listeners) notifiés à chaque ajout (ex: interfaces/alert_view.py qui regroupe
+  les insertions dans le widget Text).
+- JournalWriter : persistance asynchrone sur disque (thread dédié, une écriture + flush par lot),
+  avec rotation simple (fichier .1) au-delà de `max_bytes`.
+
+Usage:
+    from app.alert_log import AlertLog
+    alerts = AlertLog(capacity=200, journal_path="data/alerts.log")
+    alerts.add("Poste 3 - Session terminée", level="warning")
+    for entry in alerts.entries():
+        print(entry["at"], entry["level"], entry["message"])
+    alerts.close()
+"""
+
+import os
+import queue
+import threading
+from collections import deque
+from datetime import datetime
+from typing import Any, Callable, Deque, Dict, List, Optional
+
+LEVELS = ("info", "warning", "error")
+
+
+class JournalWriter:
+    def __init__(self, path, max_bytes: int = 1_000_000):
+        self.path = str(path)
+        self.max_bytes = max_bytes
+        self._queue: "queue.Queue[Optional[str]]" = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="AlertJournalWriter", daemon=True)
+        self._thread.start()
+
+    def write(self, line: str) -> None:
+        self._queue.put(line)
+
+    def close(self, timeout: float = 2.0) -> None:
+        self._queue.put(None)
+        self._thread.join(timeout)
+
+    def _run(self) -> None:
+        stop = False
+        while not stop:
+            lines = [self._queue.get()]
+            # regroupe tout ce qui est déjà en file : une seule écriture disque par lot
+            while True:
+                try:
+                    lines.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            if None in lines:
+                stop = True
+                lines = [l for l in lines if l is not None]
+            if lines:
+                self._append(lines)
+
+    def _append(self, lines: List[str]) -> None:
+        try:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            if os.path.exists(self.path) and os.path.getsize(self.path) > self.max_bytes:
+                os.replace(self.path, self.path + ".1")
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write("".join(lines))
+        except Exception as e:
+            print("[DEBUG] JournalWriter error:", e)
+
+
+class AlertLog:
+    def __init__(self, capacity: int = 200, journal_path=None, clock: Callable[[], datetime] = datetime.now):
+        self.capacity = capacity
+        self.clock = clock
+        self._entries: Deque[Dict[str, Any]] = deque(maxlen=capacity)
+        self._lock = threading.Lock()
+        self._listeners: List[Callable[[Dict[str, Any]], None]] = []
+        self.total = 0
+        self._journal = JournalWriter(journal_path) if journal_path else None
+
+    def add_listener(self, listener: Callable[[Dict[str, Any]], None]) -> None:
+        self._listeners.append(listener)
+
+    def add(self, message: str, level: str = "info") -> Dict[str, Any]:
+        if level not in LEVELS:
+            level = "info"
+        entry = {"at": self.clock(), "level": level, "message": message}
+        with self._lock:
+            self._entries.append(entry)
+            self.total += 1
+        if self._journal is not None:
+            self._journal.write(f"{entry['at'].isoformat(sep=' ', timespec='seconds')}\t{level.upper()}\t{message}\n")
+        for listener in self._listeners:
+            try:
+                listener(entry)
+            except Exception as e:
+                print("[DEBUG] AlertLog listener error:", e)
+        return entry
+
+    def entries(self, level: Optional[str] = None) -> List[Dict[str, Any]]:
+        with self._lock:
+            if level is None:
+                return list(self._entries)
+            return [e for e in self._entries if e["level"] == level]
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def close(self) -> None:
+        if self._journal is not None:
+            self._journal.close()
+            self._journal = None
@@ -0,0 +1,425 @@
+# app/analytics.py
+"""
+Analyses de fin de mois vectorisées (NumPy) sur les sessions et les journaux fidélité / bonus.
+
+Fonctionnalités :
+- Chargement en colonnes : sessions, bonus_transactions, tickets_fidelite et
+  fidelity_reward_grants sont lus par lots (fetchmany) dans des tableaux int64 ; les
+  horodatages sont convertis en secondes par SQLite (strftime('%s')), sans parsing Python.
+- Cache disque : chaque table chargée est écrite en .npy (un fichier par colonne) avec une
+  empreinte (nombre de lignes, id max, somme de contrôle) ; tant que l'empreinte ne change pas,
+  les colonnes sont rouvertes en mmap_mode="r" (aucune lecture SQL). Les résultats d'une
+  période sont mis en cache de la même façon.
+- Analyses (groupements par np.bincount / np.unique, aucune boucle Python par ligne) :
+    occupancy_heatmap   minutes occupées poste x heure de la journée (sessions découpées par heure)
+    revenue_by_tier     sessions et recette par palier FCFA (montants des grilles group_tariffs)
+    bonus_liability     minutes bonus émises / consommées par jour et encours cumulé
+    retention_cohorts   clients fidélité par mois de 1er ticket x mois d'activité suivants
+- Horodatages : sessions en heure locale ; journaux (bonus, tickets, grants) en UTC, tels
+  qu'enregistrés.
+
+Usage:
+    from app.analytics import SalleAnalytics
+    an = SalleAnalytics.from_database("data/rdm_gsalle.db")
+    report = an.report("2026-01-01", "2026-12-31")     # {"occupancy": ndarray, ...}
+
+    python -m app.analytics --start 2026-01-01 --end 2026-12-31 [--db ...] [--cache-dir ...] [--no-cache]
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+from datetime import date
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+try:
+    from config.settings import ANALYTICS_CACHE_DIR, DATABASE_PATH, TARIFS_DEFAULT
+except Exception:
+    ANALYTICS_CACHE_DIR = Path(__file__).resolve().parents[1] / "data" / "analytics_cache"
+    DATABASE_PATH = Path(__file__).resolve().parents[1] / "data" / "rdm_gsalle.db"
+    TARIFS_DEFAULT = {}
+
+CHUNK_ROWS = 50_000
+DAY = 86_400
+HOUR = 3_600
+MISSING = -1            # horodatage absent / illisible
+
+# table -> (requête, colonnes, expression d'empreinte)
+# Les horodatages sont des secondes "naïves" (strftime('%s') ne convertit aucun fuseau).
+SOURCES: Dict[str, Tuple[str, Tuple[str, ...], str]] = {
+    "sessions": (
+        """SELECT id, COALESCE(poste_id, -1), COALESCE(client_id, -1),
+                  COALESCE(CAST(strftime('%s', debut) AS INTEGER), -1),
+                  COALESCE(CAST(strftime('%s', fin) AS INTEGER), -1),
+                  COALESCE(montant_paye, 0),
+                  CASE statut WHEN 'en_cours' THEN 0 WHEN 'termine' THEN 1 WHEN 'expire' THEN 2 ELSE -1 END
+             FROM sessions ORDER BY id""",
+        ("id", "poste_id", "client_id", "start", "end", "montant", "statut"),   # statut : 0 en cours, 1 terminé, 2 expiré
+        # les sessions sont mises à jour en place (fin, montant, statut)
+        "COUNT(*), MAX(id), TOTAL(montant_paye), MAX(fin), TOTAL(statut = 'en_cours')",
+    ),
+    "bonus_transactions": (
+        """SELECT id, COALESCE(user_id, -1), COALESCE(minutes_delta, 0),
+                  COALESCE(CAST(strftime('%s', created_at) AS INTEGER), -1)
+             FROM bonus_transactions ORDER BY id""",
+        ("id", "user_id", "minutes", "at"),
+        "COUNT(*), MAX(id), TOTAL(minutes_delta)",
+    ),
+    "tickets_fidelite": (
+        """SELECT id, COALESCE(user_id, -1),
+                  COALESCE(CAST(strftime('%s', ticket_date) AS INTEGER), -1),
+                  COALESCE(amount_fcfa, 0), COALESCE(expired, 0)
+             FROM tickets_fidelite
+            WHERE COALESCE(notes, '') NOT LIKE '%Revoked:%'
+            ORDER BY id""",
+        ("id", "user_id", "day", "amount", "expired"),
+        "COUNT(*), MAX(id), TOTAL(expired), SUM(COALESCE(notes, '') LIKE '%Revoked:%')",
+    ),
+    "fidelity_reward_grants": (
+        """SELECT id, COALESCE(user_id, -1), COALESCE(minutes_awarded, 0),
+                  COALESCE(CAST(strftime('%s', created_at) AS INTEGER), -1),
+                  COALESCE(CAST(strftime('%s', expiry_at) AS INTEGER), -1),
+                  COALESCE(used, 0)
+             FROM fidelity_reward_grants ORDER BY id""",
+        ("id", "user_id", "minutes", "at", "expiry", "used"),
+        "COUNT(*), MAX(id), TOTAL(used)",
+    ),
+}
+
+Columns = Dict[str, np.ndarray]
+
+
+def _open_readonly(db_path: str) -> sqlite3.Connection:
+    uri = Path(db_path).resolve().as_uri() + "?mode=ro"
+    return sqlite3.connect(uri, uri=True)
+
+
+def _epoch(day: Any) -> int:
+    """'YYYY-MM-DD' / date -> secondes (minuit, même convention que strftime('%s'))."""
+    if isinstance(day, str):
+        day = date.fromisoformat(day[:10])
+    return (day.toordinal() - date(1970, 1, 1).toordinal()) * DAY
+
+
+def _empty(columns: Sequence[str]) -> Columns:
+    return {name: np.empty(0, dtype=np.int64) for name in columns}
+
+
+# ---------------- Chargement par lots ----------------
+def load_columns(cur, sql: str, columns: Sequence[str], chunk_rows: int = CHUNK_ROWS) -> Columns:
+    """Exécute `sql` (colonnes entières, NULL remplacés en SQL) et empile les lots par colonne."""
+    cur.execute(sql)
+    chunks: List[np.ndarray] = []
+    while True:
+        rows = cur.fetchmany(chunk_rows)
+        if not rows:
+            break
+        chunks.append(np.array(rows, dtype=np.int64))
+    if not chunks:
+        return _empty(columns)
+    table = np.concatenate(chunks) if len(chunks) > 1 else chunks[0]
+    return {name: np.ascontiguousarray(table[:, i]) for i, name in enumerate(columns)}
+
+
+def _fingerprint(cur, table: str, expr: str) -> Optional[str]:
+    cur.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (table,))
+    if cur.fetchone() is None:
+        return None
+    cur.execute(f"SELECT {expr} FROM {table}")
+    return json.dumps(list(cur.fetchone()))
+
+
+# ---------------- Cache .npy ----------------
+class NpyCache:
+    """Répertoire de groupes de tableaux : <racine>/<nom>/{meta.json, <colonne>.npy}."""
+
+    def __init__(self, root: Any):
+        self.root = Path(root)
+
+    def load(self, name: str, fingerprint: str) -> Optional[Columns]:
+        folder = self.root / name
+        try:
+            meta = json.loads((folder / "meta.json").read_text(encoding="utf-8"))
+            if meta.get("fingerprint") != fingerprint:
+                return None
+            return {col: np.load(folder / f"{col}.npy", mmap_mode="r") for col in meta["columns"]}
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def save(self, name: str, fingerprint: str, arrays: Columns) -> None:
+        folder = self.root / name
+        try:
+            folder.mkdir(parents=True, exist_ok=True)
+            (folder / "meta.json").unlink(missing_ok=True)
+            for col, arr in arrays.items():
+                # fichier temporaire puis os.replace : un tableau encore ouvert en mmap garde l'ancien fichier
+                tmp = folder / f"{col}.tmp.npy"
+                np.save(tmp, np.asarray(arr))
+                os.replace(tmp, folder / f"{col}.npy")
+            # meta en dernier : un cache interrompu n'est jamais relu comme valide
+            (folder / "meta.json").write_text(
+                json.dumps({"fingerprint": fingerprint, "columns": list(arrays)}), encoding="utf-8")
+        except OSError as e:
+            print("[DEBUG] NpyCache.save error:", e)
+
+
+# ---------------- Analyses (pures, sur colonnes) ----------------
+def occupancy_heatmap(sessions: Columns, poste_ids: np.ndarray, start: int, end: int) -> np.ndarray:
+    """
+    Minutes occupées [poste, heure] sur [start, end) : chaque session est découpée aux
+    changements d'heure (heure de début et de fin partielles, heures pleines par somme cumulée).
+    """
+    n_postes = len(poste_ids)
+    heat = np.zeros((n_postes, 24), dtype=np.float64)
+    if not n_postes:
+        return heat
+    s = np.maximum(sessions["start"], start)
+    e = np.minimum(sessions["end"], end)
+    row = np.minimum(np.searchsorted(poste_ids, sessions["poste_id"]), n_postes - 1)
+    keep = (sessions["start"] != MISSING) & (sessions["end"] != MISSING) & (e > s)
+    keep &= poste_ids[row] == sessions["poste_id"]
+    s, e, row = s[keep], e[keep], row[keep]
+    if not len(s):
+        return heat
+    base = start // HOUR
+    n_hours = (end - 1) // HOUR - base + 1
+    h0, h1 = s // HOUR - base, (e - 1) // HOUR - base
+    seconds = np.zeros(n_postes * n_hours, dtype=np.float64)
+    size = seconds.size
+    same = h0 == h1
+    # session contenue dans une seule heure
+    seconds += np.bincount(row[same] * n_hours + h0[same], weights=(e - s)[same], minlength=size)
+    multi = ~same
+    r, a, b = row[multi], h0[multi], h1[multi]
+    sm, em = s[multi], e[multi]
+    # heure de début (partielle) et heure de fin (partielle)
+    seconds += np.bincount(r * n_hours + a, weights=(a + base + 1) * HOUR - sm, minlength=size)
+    seconds += np.bincount(r * n_hours + b, weights=em - (b + base) * HOUR, minlength=size)
+    # heures pleines a+1 .. b-1 : +1 / -1 puis somme cumulée le long de chaque poste
+    full = b - a > 1
+    delta = np.zeros((n_postes, n_hours + 1), dtype=np.int64)
+    np.add.at(delta, (r[full], a[full] + 1), 1)
+    np.add.at(delta, (r[full], b[full]), -1)
+    seconds += (np.cumsum(delta, axis=1)[:, :n_hours] * HOUR).ravel()
+    # heure absolue -> heure de la journée
+    hour_of_day = (np.arange(n_hours) + base) % 24
+    flat = (np.arange(n_postes)[:, None] * 24 + hour_of_day[None, :]).ravel()
+    heat += np.bincount(flat, weights=seconds, minlength=n_postes * 24).reshape(n_postes, 24)
+    return heat / 60.0
+
+
+def revenue_by_tier(sessions: Columns, edges: np.ndarray, start: int, end: int) -> Dict[str, np.ndarray]:
+    """
+    Sessions démarrées dans [start, end) par palier : palier i = montant dans [edges[i], edges[i+1]) ;
+    palier 0 = sous le plus petit montant de grille (prolongations partielles, gratuités).
+    """
+    mask = (sessions["start"] >= start) & (sessions["start"] < end)
+    montant = sessions["montant"][mask]
+    idx = np.searchsorted(edges, montant, side="right")
+    n = len(edges) + 1
+    return {
+        "lower": np.concatenate(([0], edges)).astype(np.int64),
+        "sessions": np.bincount(idx, minlength=n).astype(np.int64),
+        "revenue": np.bincount(idx, weights=montant, minlength=n).astype(np.int64),
+    }
+
+
+def bonus_liability(bonus: Columns, start: int, end: int) -> Dict[str, np.ndarray]:
+    """
+    Par jour de [start, end) : minutes émises, consommées et encours (solde de toutes les
+    transactions antérieures compris, donc l'encours d'ouverture n'est pas perdu).
+    """
+    n_days = max(0, (end - start + DAY - 1) // DAY)
+    at, minutes = bonus["at"], bonus["minutes"]
+    valid = at != MISSING
+    opening = int(minutes[valid & (at < start)].sum())
+    mask = valid & (at >= start) & (at < end)
+    day = (at[mask] - start) // DAY
+    m = minutes[mask]
+    issued = np.bincount(day, weights=np.where(m > 0, m, 0), minlength=n_days)
+    consumed = np.bincount(day, weights=np.where(m < 0, -m, 0), minlength=n_days)
+    return {
+        "day": np.arange(n_days, dtype=np.int64) * DAY + start,
+        "issued": issued.astype(np.int64),
+        "consumed": consumed.astype(np.int64),
+        "liability": opening + np.cumsum(issued - consumed).astype(np.int64),
+    }
+
+
+def _month_index(seconds: np.ndarray) -> np.ndarray:
+    months = seconds.astype("datetime64[s]").astype("datetime64[M]")
+    return months.astype(np.int64)       # mois depuis 1970-01
+
+
+def retention_cohorts(tickets: Columns, start: int, end: int, horizon: int = 12) -> Dict[str, np.ndarray]:
+    """
+    Cohortes mensuelles : clients dont le 1er ticket (tout l'historique) tombe dans [start, end),
+    actifs k mois plus tard (k = 0..horizon-1). Comptes distincts (utilisateur, mois).
+    """
+    valid = tickets["day"] != MISSING
+    users, month = tickets["user_id"][valid], _month_index(tickets["day"][valid])
+    if not len(users):
+        empty = np.zeros((0, horizon), dtype=np.int64)
+        return {"cohort": np.empty(0, dtype="datetime64[M]"), "active": empty, "rate": empty.astype(np.float64)}
+    # paires (utilisateur, mois) distinctes, triées par utilisateur puis mois
+    span = int(month.max() - month.min() + 1)
+    pairs = np.unique((users - users.min()) * span + (month - month.min()))
+    user_idx, m = pairs // span, pairs % span + month.min()
+    # 1er mois de chaque utilisateur = 1re paire de son bloc
+    first_of_block = np.r_[True, user_idx[1:] != user_idx[:-1]]
+    first_month = np.maximum.accumulate(np.where(first_of_block, np.arange(len(pairs)), 0))
+    cohort = m[first_month]
+    offset = m - cohort
+    lo, hi = _month_index(np.array([start]))[0], _month_index(np.array([end - 1]))[0]
+    keep = (cohort >= lo) & (cohort <= hi) & (offset < horizon)
+    n_cohorts = int(hi - lo + 1)
+    active = np.bincount((cohort[keep] - lo) * horizon + offset[keep],
+                         minlength=n_cohorts * horizon).reshape(n_cohorts, horizon)
+    size = active[:, :1]
+    rate = np.divide(active, size, out=np.zeros(active.shape), where=size > 0)
+    return {"cohort": (np.arange(n_cohorts) + lo).astype("datetime64[M]"), "active": active, "rate": rate}
+
+
+# ---------------- Façade ----------------
+class SalleAnalytics:
+    def __init__(self, tables: Dict[str, Columns], poste_ids: np.ndarray, tier_edges: np.ndarray,
+                 fingerprints: Optional[Dict[str, Optional[str]]] = None, cache: Optional[NpyCache] = None):
+        self.tables = tables
+        self.poste_ids = np.asarray(poste_ids, dtype=np.int64)
+        self.tier_edges = np.asarray(tier_edges, dtype=np.int64)
+        self.fingerprints = fingerprints or {}
+        self.cache = cache
+        self.loaded_from_cache: List[str] = []
+
+    @classmethod
+    def from_database(cls, db_path: Optional[str] = None, cache_dir: Any = ANALYTICS_CACHE_DIR,
+                      use_cache: bool = True, chunk_rows: int = CHUNK_ROWS) -> "SalleAnalytics":
+        db_path = str(db_path or DATABASE_PATH)
+        cache = NpyCache(cache_dir) if use_cache and cache_dir else None
+        tables, fingerprints, from_cache = {}, {}, []
+        conn = _open_readonly(db_path)
+        try:
+            cur = conn.cursor()
+            for name, (sql, columns, expr) in SOURCES.items():
+                fp = _fingerprint(cur, name, expr)
+                fingerprints[name] = fp
+                if fp is None:
+                    tables[name] = _empty(columns)
+                    continue
+                cached = cache.load(name, fp) if cache else None
+                if cached is not None:
+                    tables[name] = cached
+                    from_cache.append(name)
+                    continue
+                tables[name] = load_columns(cur, sql, columns, chunk_rows)
+                if cache:
+                    cache.save(name, fp, tables[name])
+            poste_ids = cls._poste_ids(cur, tables["sessions"])
+            tier_edges = cls._tier_edges(cur)
+        finally:
+            conn.close()
+        analytics = cls(tables, poste_ids, tier_edges, fingerprints, cache)
+        analytics.loaded_from_cache = from_cache
+        return analytics
+
+    @staticmethod
+    def _poste_ids(cur, sessions: Columns) -> np.ndarray:
+        cur.execute("SELECT id FROM postes")
+        known = np.array([r[0] for r in cur.fetchall()], dtype=np.int64)
+        return np.union1d(known, sessions["poste_id"][sessions["poste_id"] != MISSING])
+
+    @staticmethod
+    def _tier_edges(cur) -> np.ndarray:
+        """Montants des grilles (group_tariffs), sinon ceux de TARIFS_DEFAULT."""
+        amounts: Iterable[int] = ()
+        cur.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'group_tariffs'")
+        if cur.fetchone():
+            cur.execute("SELECT DISTINCT montant FROM group_tariffs")
+            amounts = [r[0] for r in cur.fetchall()]
+        if not amounts:
+            amounts = [int(m) for grid in TARIFS_DEFAULT.values() for m in grid]
+        return np.unique(np.array(list(amounts), dtype=np.int64))
+
+    def report(self, start: Any, end: Any, horizon: int = 12) -> Dict[str, np.ndarray]:
+        """Toutes les analyses pour les jours [start, end] (bornes incluses)."""
+        lo, hi = _epoch(start), _epoch(end) + DAY
+        key = None
+        if self.cache is not None and all(self.fingerprints.get(t) is not None for t in SOURCES):
+            raw = json.dumps([self.fingerprints, lo, hi, horizon, self.tier_edges.tolist(), self.poste_ids.tolist()])
+            key = hashlib.sha1(raw.encode("utf-8")).hexdigest()
+            cached = self.cache.load(f"report_{lo}_{hi}", key)
+            if cached is not None:
+                return cached
+        sessions = self.tables["sessions"]
+        tiers = revenue_by_tier(sessions, self.tier_edges, lo, hi)
+        liability = bonus_liability(self.tables["bonus_transactions"], lo, hi)
+        cohorts = retention_cohorts(self.tables["tickets_fidelite"], lo, hi, horizon)
+        grants = self.tables["fidelity_reward_grants"]
+        in_period = (grants["at"] >= lo) & (grants["at"] < hi)
+        result = {
+            "poste_ids": self.poste_ids,
+            "occupancy": occupancy_heatmap(sessions, self.poste_ids, lo, hi),
+            "tier_lower": tiers["lower"], "tier_sessions": tiers["sessions"], "tier_revenue": tiers["revenue"],
+            "day": liability["day"], "bonus_issued": liability["issued"],
+            "bonus_consumed": liability["consumed"], "bonus_liability": liability["liability"],
+            "grant_minutes": np.bincount((grants["at"][in_period] - lo) // DAY,
+                                         weights=grants["minutes"][in_period],
+                                         minlength=len(liability["day"])).astype(np.int64),
+            "cohort": cohorts["cohort"].astype(np.int64), "cohort_active": cohorts["active"],
+            "cohort_rate": cohorts["rate"],
+        }
+        if key is not None:
+            self.cache.save(f"report_{lo}_{hi}", key, result)
+        return result
+
+
+def summarize(report: Dict[str, np.ndarray]) -> Dict[str, Any]:
+    """Vue JSON compacte d'un rapport (CLI)."""
+    occupancy = np.asarray(report["occupancy"])
+    days = np.asarray(report["day"])
+    cohorts = np.asarray(report["cohort"]).astype("datetime64[M]")
+    return {
+        "occupancy_minutes_by_hour": np.round(occupancy.sum(axis=0)).astype(int).tolist(),
+        "occupancy_minutes_by_poste": {int(p): int(round(v)) for p, v in zip(report["poste_ids"], occupancy.sum(axis=1))},
+        "revenue_by_tier": [{"from_fcfa": int(lo), "sessions": int(n), "revenue": int(r)}
+                            for lo, n, r in zip(report["tier_lower"], report["tier_sessions"], report["tier_revenue"])],
+        "bonus_liability_end": int(report["bonus_liability"][-1]) if len(days) else 0,
+        "bonus_issued": int(np.sum(report["bonus_issued"])),
+        "bonus_consumed": int(np.sum(report["bonus_consumed"])),
+        "grant_minutes": int(np.sum(report["grant_minutes"])),
+        "retention": {str(c): np.round(np.asarray(r), 3).tolist()
+                      for c, r in zip(cohorts, report["cohort_rate"])},
+    }
+
+
+# ----------------------- CLI -----------------------
+if __name__ == "__main__":
+    import argparse
+    import time
+
+    parser = argparse.ArgumentParser(description="Analyses vectorisées des sessions et journaux fidélité (lecture seule).")
+    parser.add_argument("--db", default=None, help="Chemin de la base (défaut: config.settings.DATABASE_PATH)")
+    parser.add_argument("--start", default=None, help="1er jour (YYYY-MM-DD, défaut: il y a 365 jours)")
+    parser.add_argument("--end", default=None, help="Dernier jour inclus (YYYY-MM-DD, défaut: aujourd'hui)")
+    parser.add_argument("--cache-dir", default=str(ANALYTICS_CACHE_DIR))
+    parser.add_argument("--no-cache", action="store_true")
+    args = parser.parse_args()
+
+    end_day = date.fromisoformat(args.end) if args.end else date.today()
+    start_day = date.fromisoformat(args.start) if args.start else date.fromordinal(end_day.toordinal() - 364)
+    t0 = time.perf_counter()
+    an = SalleAnalytics.from_database(args.db, cache_dir=args.cache_dir, use_cache=not args.no_cache)
+    t1 = time.perf_counter()
+    rep = an.report(start_day, end_day)
+    t2 = time.perf_counter()
+    print(json.dumps({
+        "rows": {name: int(len(next(iter(cols.values())))) for name, cols in an.tables.items()},
+        "from_cache": an.loaded_from_cache,
+        "load_seconds": round(t1 - t0, 3),
+        "analyse_seconds": round(t2 - t1, 3),
+        "report": summarize(rep),
+    }, indent=2, ensure_ascii=False))
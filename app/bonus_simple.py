@@ -23,6 +23,11 @@ import math
 # adapte l'import suivant à ta structure (comme dans admin_interface.py)
 from models.database import DatabaseManager
 from config.settings import DATABASE_PATH
+from app.config_store import BUMP_REVISION_SQL
+from app.paged_query import PagedQuery
+
+HISTORY_COLUMNS = ("id", "user_id", "minutes_delta", "source", "reference", "created_at",
+                   "operator_id", "notes", "balance_after")
 
 
 class BonusManager:
@@ -50,6 +55,11 @@ class BonusManager:
         create_index_sql = """
         CREATE INDEX IF NOT EXISTS idx_bonus_user ON bonus_transactions(user_id);
         """
+        # historique paginé : tri par date, solde cumulé par utilisateur
+        history_indexes = (
+            "CREATE INDEX IF NOT EXISTS idx_bonus_created ON bonus_transactions(created_at, id)",
+            "CREATE INDEX IF NOT EXISTS idx_bonus_user_created ON bonus_transactions(user_id, created_at, id)",
+        )
         default_configs = {
             "bonus_enabled": "1",
             "bonus_fcfa_per_minute": "50",           # 50 FCFA -> 1 minute (par défaut)
@@ -66,6 +76,8 @@ class BonusManager:
                 cur.execute("CREATE TABLE IF NOT EXISTS config (cle TEXT PRIMARY KEY, valeur TEXT)")
                 cur.execute(create_table_sql)
                 cur.execute(create_index_sql)
+                for ddl in history_indexes:
+                    cur.execute(ddl)
                 # insert defaults if absent
                 for k, v in default_configs.items():
                     cur.execute("SELECT valeur FROM config WHERE cle = ?", (k,))
@@ -91,6 +103,7 @@ class BonusManager:
         with self.db.get_connection() as conn:
             cur = conn.cursor()
             cur.execute("INSERT OR REPLACE INTO config (cle, valeur) VALUES (?, ?)", (key, value))
+            cur.execute(BUMP_REVISION_SQL)     # caches ConfigStore des autres processus
             conn.commit()
 
     # ---------------- Calcul / règles ----------------
@@ -287,43 +300,58 @@ class BonusManager:
             conn.commit()
 
     # ---------------- Historique / listing ----------------
+    def history_query(self, user_id: Optional[int] = None) -> PagedQuery:
+        """
+        Source paginée de l'historique (liste virtuelle admin), triée par date décroissante.
+        balance_after = solde de l'utilisateur de la ligne après l'opération (par utilisateur, même
+        sans filtre : un cumul global mélangeant les comptes n'a pas de sens).
+        - Un utilisateur : fonction fenêtre SUM() OVER (PARTITION BY user_id ...), un seul parcours
+          de ses lignes sur idx_bonus_user_created.
+        - Tous les utilisateurs : sous-requête corrélée, évaluée pour les seules lignes de la page ;
+          une fonction fenêtre empêcherait SQLite d'appliquer le filtre du curseur et le COUNT(*)
+          sans calculer la table entière (~10x plus lent par page).
+        """
+        if user_id is not None:
+            sql = """
+                SELECT t.id, t.user_id, t.minutes_delta, t.source, t.reference, t.created_at, t.operator_id, t.notes,
+                       SUM(t.minutes_delta) OVER (PARTITION BY t.user_id ORDER BY t.created_at, t.id) AS balance_after
+                  FROM bonus_transactions t WHERE t.user_id = ?
+            """
+            return PagedQuery(self.db, sql, HISTORY_COLUMNS, order=("created_at", True), params=(user_id,))
+        sql = """
+            SELECT t.id, t.user_id, t.minutes_delta, t.source, t.reference, t.created_at, t.operator_id, t.notes,
+                   (SELECT SUM(b.minutes_delta) FROM bonus_transactions b
+                     WHERE b.user_id = t.user_id AND (b.created_at, b.id) <= (t.created_at, t.id)) AS balance_after
+              FROM bonus_transactions t
+        """
+        return PagedQuery(self.db, sql, HISTORY_COLUMNS, order=("created_at", True))
+
     def list_bonus_history(self, user_id: Optional[int] = None, limit: int = 200, offset: int = 0) -> List[Dict[str, Any]]:
         """
-        Retourne l'historique (par défaut trié DESC) avec solde recalculé pour chaque ligne.
-        Pour inclure solde_after, on récupère les transactions asc, calcule cumul et renvoie en ordre DESC.
+        Retourne l'historique trié DESC (created_at, id) avec le solde de l'utilisateur après chaque ligne ;
+        seule la page demandée est lue. Pour un utilisateur : la page (idx_bonus_user_created) plus un
+        seul SUM indexé jusqu'à sa 1re ligne, les soldes suivants s'en déduisent en descendant la page.
         """
         try:
+            if user_id is None:
+                return self.history_query().fetch_dicts(offset, limit)
             with self.db.get_connection() as conn:
                 cur = conn.cursor()
-                params = []
-                where = ""
-                if user_id is not None:
-                    where = "WHERE user_id = ?"
-                    params.append(user_id)
-                # récupérer en ASC pour calcul du solde progressif
-                sql = f"SELECT id, user_id, minutes_delta, source, reference, created_at, operator_id, notes FROM bonus_transactions {where} ORDER BY created_at ASC, id ASC"
-                cur.execute(sql, params)
+                cur.execute(
+                    "SELECT id, user_id, minutes_delta, source, reference, created_at, operator_id, notes "
+                    "FROM bonus_transactions WHERE user_id = ? ORDER BY created_at DESC, id DESC LIMIT ? OFFSET ?",
+                    (user_id, int(limit), int(offset)))
                 rows = cur.fetchall()
-                # calculer solde_progressif
-                history = []
-                running = 0
-                for r in rows:
-                    running += int(r[2] or 0)
-                    history.append({
-                        "id": r[0],
-                        "user_id": r[1],
-                        "minutes_delta": int(r[2] or 0),
-                        "source": r[3],
-                        "reference": r[4],
-                        "created_at": r[5],
-                        "operator_id": r[6],
-                        "notes": r[7],
-                        "balance_after": running
-                    })
-                # retourner en DESC avec limit/offset
-                history_desc = list(reversed(history))
-                start = offset
-                end = offset + limit
-                return history_desc[start:end]
+                balance = 0
+                if rows:
+                    cur.execute("SELECT COALESCE(SUM(minutes_delta), 0) FROM bonus_transactions "
+                                "WHERE user_id = ? AND (created_at, id) <= (?, ?)", (user_id, rows[0][5], rows[0][0]))
+                    balance = cur.fetchone()[0]
+            conn.close()
+            history = []
+            for r in rows:
+                history.append(dict(zip(HISTORY_COLUMNS, r + (balance,))))
+                balance -= int(r[2] or 0)
+            return history
         except Exception as e:
             raise RuntimeError(f"list_bonus_history failed: {e}")
@@ -0,0 +1,213 @@
+# app/config_store.py
+"""
+Accès groupé à la table config (cle, valeur) avec cache mémoire et numéro de révision.
+
+Fonctionnalités :
+- load() : toutes les clés en une requête ; get() / get_json() lisent ensuite le cache.
+- save(changes, remove=()) : compare les valeurs (normalisées en texte, listes / dicts en JSON,
+  None en chaîne vide : config.valeur est NOT NULL) au cache et n'écrit que les clés modifiées, en une transaction (executemany) ; la clé
+  `config_revision` est incrémentée dans la même transaction.
+- Si un autre processus a écrit entre-temps (révision en base différente), le cache est relu
+  dans la transaction avant le calcul des différences.
+- diff(data, remove_missing) : {"added", "changed", "removed"} pour prévisualiser un import.
+- revision_changed() : une lecture indexée ; les autres processus (interface gérant) s'en servent
+  pour invalider leurs caches.
+
+Usage:
+    from app.config_store import ConfigStore
+    store = ConfigStore(db)
+    store.get("devise", "FCFA")
+    changed = store.save({"devise": "EUR", "serial_ports": ["/dev/ttyUSB0"]})
+    plan = store.diff(json.load(f), remove_missing=True)
+    store.apply_diff(plan)
+"""
+
+import json
+import threading
+from typing import Any, Dict, Iterable, List, Optional
+
+REVISION_KEY = "config_revision"
+
+# même définition que models/database.py
+CONFIG_DDL = """
+    CREATE TABLE IF NOT EXISTS config (
+        cle TEXT PRIMARY KEY,
+        valeur TEXT NOT NULL,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+"""
+
+BUMP_REVISION_SQL = """
+    INSERT INTO config (cle, valeur) VALUES ('config_revision', '1')
+    ON CONFLICT(cle) DO UPDATE SET valeur = CAST(valeur AS INTEGER) + 1
+"""
+
+
+def to_config_value(value: Any) -> str:
+    """Valeur telle que stockée en base (texte ; listes / dicts en JSON ; None -> "")."""
+    if value is None:
+        return ""
+    if isinstance(value, (list, dict)):
+        return json.dumps(value)
+    return str(value)
+
+
+class ConfigStore:
+    def __init__(self, db):
+        self.db = db
+        self._lock = threading.Lock()
+        self._values: Dict[str, Optional[str]] = {}
+        self._revision = None
+        self._loaded = False
+        self.writes = 0
+
+    # ---------------- Lecture ----------------
+    def _read_all(self, cur) -> None:
+        cur.execute(CONFIG_DDL)
+        cur.execute("SELECT cle, valeur FROM config")
+        values = dict(cur.fetchall())
+        revision = values.pop(REVISION_KEY, None)
+        with self._lock:
+            self._values = values
+            self._revision = revision
+            self._loaded = True
+
+    def load(self) -> Dict[str, Optional[str]]:
+        with self.db.get_connection() as conn:
+            self._read_all(conn.cursor())
+            conn.commit()
+        conn.close()
+        return self.values()
+
+    def ensure_loaded(self) -> None:
+        if not self._loaded:
+            self.load()
+
+    def values(self) -> Dict[str, Optional[str]]:
+        """Copie du cache (sans la clé de révision)."""
+        self.ensure_loaded()
+        with self._lock:
+            return dict(self._values)
+
+    def get(self, key: str, default: Any = None) -> Any:
+        self.ensure_loaded()
+        with self._lock:
+            return self._values.get(key, default)
+
+    def get_json(self, key: str, default: Any = None) -> Any:
+        raw = self.get(key)
+        if raw is None:
+            return default
+        try:
+            return json.loads(raw)
+        except (TypeError, ValueError):
+            return default
+
+    @property
+    def revision(self) -> int:
+        try:
+            return int(self._revision or 0)
+        except ValueError:
+            return 0
+
+    def _db_revision(self, cur) -> Optional[str]:
+        cur.execute("SELECT valeur FROM config WHERE cle = ?", (REVISION_KEY,))
+        row = cur.fetchone()
+        return row[0] if row else None
+
+    def revision_changed(self) -> bool:
+        """True (et cache relu) si la configuration a été modifiée par un autre processus."""
+        if not self._loaded:
+            self.load()
+            return True
+        with self.db.get_connection() as conn:
+            cur = conn.cursor()
+            changed = self._db_revision(cur) != self._revision
+            if changed:
+                self._read_all(cur)
+        conn.close()
+        return changed
+
+    # ---------------- Différences ----------------
+    def diff(self, data: Dict[str, Any], remove_missing: bool = False) -> Dict[str, Any]:
+        """
+        Compare `data` au cache : {"added": {cle: valeur}, "changed": {cle: (ancienne, nouvelle)},
+        "removed": [cle]} ("removed" seulement si remove_missing : clés absentes de `data`).
+        """
+        current = self.values()
+        return self._diff(current, data, remove_missing)
+
+    @staticmethod
+    def _diff(current: Dict[str, Optional[str]], data: Dict[str, Any], remove_missing: bool) -> Dict[str, Any]:
+        added, changed = {}, {}
+        for key, value in data.items():
+            if key == REVISION_KEY:
+                continue
+            new = to_config_value(value)
+            if key not in current:
+                added[key] = new
+            elif current[key] != new:
+                changed[key] = (current[key], new)
+        removed = sorted(k for k in current if k not in data) if remove_missing else []
+        return {"added": added, "changed": changed, "removed": removed}
+
+    # ---------------- Écriture ----------------
+    def save(self, changes: Dict[str, Any], remove: Iterable[str] = ()) -> Dict[str, Any]:
+        """
+        Écrit les seules clés modifiées (et supprime `remove`) en une transaction ;
+        retourne le diff appliqué (vide si rien n'a changé : aucune écriture, révision inchangée).
+        """
+        self.ensure_loaded()
+        remove = [k for k in remove if k != REVISION_KEY]
+        with self.db.get_connection() as conn:
+            cur = conn.cursor()
+            # verrou d'écriture dès le début : la relecture de révision et l'écriture sont atomiques
+            cur.execute("BEGIN IMMEDIATE")
+            if self._db_revision(cur) != self._revision:
+                self._read_all(cur)
+            with self._lock:
+                current = dict(self._values)
+            plan = self._diff(current, changes, False)
+            plan["removed"] = [k for k in remove if k in current and k not in changes]
+            self._write(cur, plan)
+            conn.commit()
+        conn.close()
+        return plan
+
+    def apply_diff(self, plan: Dict[str, Any]) -> Dict[str, Any]:
+        """Applique un diff calculé par diff() (prévisualisation d'import)."""
+        changes = dict(plan.get("added") or {})
+        changes.update({k: new for k, (_old, new) in (plan.get("changed") or {}).items()})
+        return self.save(changes, remove=plan.get("removed") or [])
+
+    def set(self, key: str, value: Any) -> bool:
+        plan = self.save({key: value})
+        return bool(plan["added"] or plan["changed"])
+
+    def _write(self, cur, plan: Dict[str, Any]) -> None:
+        rows = list(plan["added"].items()) + [(k, new) for k, (_old, new) in plan["changed"].items()]
+        if not rows and not plan["removed"]:
+            return
+        cur.executemany("INSERT OR REPLACE INTO config (cle, valeur) VALUES (?, ?)", rows)
+        cur.executemany("DELETE FROM config WHERE cle = ?", [(k,) for k in plan["removed"]])
+        cur.execute(BUMP_REVISION_SQL)
+        revision = self._db_revision(cur)
+        with self._lock:
+            self._values.update(rows)
+            for key in plan["removed"]:
+                self._values.pop(key, None)
+            self._revision = revision
+        self.writes += 1
+
+
+def format_diff(plan: Dict[str, Any], limit: int = 350) -> List[str]:
+    """Lignes lisibles d'un diff (prévisualisation)."""
+    def short(value):
+        text = "" if value is None else str(value)
+        if not text:
+            return '"" (vide)'
+        return text if len(text) <= limit else text[:limit] + " ... (tronqué)"
+    lines = [f"+ {k} : {short(v)}" for k, v in sorted(plan["added"].items())]
+    lines += [f"~ {k} : {short(old)}  ->  {short(new)}" for k, (old, new) in sorted(plan["changed"].items())]
+    lines += [f"- {k}" for k in plan["removed"]]
+    return lines
@@ -0,0 +1,37 @@
+# app/console_names.py
+"""
+Normalisation des noms de consoles (PS4, "PlayStation 4", "ps iv" -> "PS4").
+
+- normalize_console_name est mémoïsé (lru_cache) : le nombre de libellés distincts est petit,
+  la regex et la recherche de préfixe ne tournent qu'une fois par libellé.
+
+Usage:
+    from app.console_names import normalize_console_name
+    normalize_console_name("PlayStation 5")   # -> "PS5"
+"""
+
+import re
+from functools import lru_cache
+
+CONSOLE_ALIASES = {
+    "PS2": "PS2", "PS3": "PS3", "PS4": "PS4", "PS5": "PS5",
+    "PLAYSTATION2": "PS2", "PLAYSTATION3": "PS3", "PLAYSTATION4": "PS4", "PLAYSTATION5": "PS5",
+    "PSII": "PS2", "PSIII": "PS3", "PSIV": "PS4",
+    "XBOX": "XBOX", "XBOXONE": "XBOX", "XBOX360": "XBOX",
+}
+
+_NON_ALNUM = re.compile(r'[^A-Z0-9]')
+
+
+@lru_cache(maxsize=256)
+def normalize_console_name(name: str) -> str:
+    """Normalise (strip, upper) et réduit les variantes courantes à des clés canoniques."""
+    if not name:
+        return ""
+    s = _NON_ALNUM.sub('', name.strip().upper())
+    if s in CONSOLE_ALIASES:
+        return CONSOLE_ALIASES[s]
+    for k in CONSOLE_ALIASES:
+        if s.startswith(k):
+            return CONSOLE_ALIASES[k]
+    return s
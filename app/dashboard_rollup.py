@@ -0,0 +1,321 @@
+# app/dashboard_rollup.py
+"""
+Agrégats du tableau de bord admin (table dashboard_rollup) tenus à jour de façon incrémentale.
+
+Fonctionnalités :
+- dashboard_rollup(metric, period, key, value, count), clé (metric, period, key) :
+    occupancy_poste  jour / poste      minutes occupées
+    occupancy_hour   jour / heure      minutes occupées (session découpée par tranche horaire)
+    bonus_issued     jour              minutes bonus créditées (minutes_delta > 0)
+    bonus_consumed   jour              minutes bonus utilisées / débitées (minutes_delta < 0)
+    grant_cost       semaine ISO / type   minutes offertes par les récompenses fidélité
+- catch_up(cur) : rattrapage par marque d'eau (rollup_watermarks) ; seules les lignes nouvelles
+  sont lues (bonus_transactions et fidelity_reward_grants sont des journaux en ajout seul).
+  Une session est comptée une fois close : celles encore en cours au passage de la marque sont
+  notées dans rollup_pending et revérifiées (par id) aux rattrapages suivants, sans bloquer les
+  sessions plus récentes déjà closes.
+- La recette par groupe de console vient de revenue_rollup (tenue à chaque paiement).
+- DashboardData.series(days) : une poignée de lectures indexées par plage de périodes,
+  résultat gardé en cache jusqu'au prochain rattrapage effectif ou à refresh().
+
+Usage:
+    from app.dashboard_rollup import DashboardData
+    data = DashboardData(db)
+    data.catch_up()                  # thread de travail (TaskRunner)
+    series = data.series(days=30)    # {"occupancy_poste": [(libellé, minutes)], ...}
+"""
+
+import threading
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.revenue_rollup import ensure_revenue_schema
+
+DASHBOARD_ROLLUP_DDL = """
+    CREATE TABLE IF NOT EXISTS dashboard_rollup (
+        metric TEXT NOT NULL,
+        period TEXT NOT NULL,
+        key TEXT NOT NULL DEFAULT '',
+        value INTEGER NOT NULL DEFAULT 0,
+        count INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (metric, period, key)
+    ) WITHOUT ROWID
+"""
+
+WATERMARKS_DDL = """
+    CREATE TABLE IF NOT EXISTS rollup_watermarks (
+        source TEXT PRIMARY KEY,
+        last_id INTEGER NOT NULL DEFAULT 0
+    )
+"""
+
+_UPSERT_SQL = """
+    INSERT INTO dashboard_rollup (metric, period, key, value, count) VALUES (?, ?, ?, ?, ?)
+    ON CONFLICT(metric, period, key) DO UPDATE SET
+        value = value + excluded.value,
+        count = count + excluded.count
+"""
+
+PENDING_DDL = """
+    CREATE TABLE IF NOT EXISTS rollup_pending (
+        source TEXT NOT NULL,
+        id INTEGER NOT NULL,
+        PRIMARY KEY (source, id)
+    ) WITHOUT ROWID
+"""
+
+SOURCES = ("sessions", "bonus_transactions", "fidelity_reward_grants")
+
+
+def ensure_dashboard_schema(cur) -> None:
+    cur.execute(DASHBOARD_ROLLUP_DDL)
+    cur.execute(WATERMARKS_DDL)
+    cur.execute(PENDING_DDL)
+
+
+def _parse(value: Any) -> Optional[datetime]:
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(str(value)).replace(tzinfo=None)
+    except ValueError:
+        return None
+
+
+def iso_week(day: date) -> str:
+    year, week, _ = day.isocalendar()
+    return f"{year}-W{week:02d}"
+
+
+def split_by_hour(start: datetime, end: datetime) -> List[Tuple[str, str, float]]:
+    """[(jour, heure, minutes)] : découpe [start, end) aux changements d'heure."""
+    slices = []
+    cursor = start
+    while cursor < end:
+        boundary = cursor.replace(minute=0, second=0, microsecond=0) + timedelta(hours=1)
+        stop = min(boundary, end)
+        slices.append((cursor.strftime("%Y-%m-%d"), f"{cursor.hour:02d}", (stop - cursor).total_seconds() / 60.0))
+        cursor = stop
+    return slices
+
+
+def _table_exists(cur, name: str) -> bool:
+    cur.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (name,))
+    return cur.fetchone() is not None
+
+
+def _watermark(cur, source: str) -> int:
+    cur.execute("SELECT last_id FROM rollup_watermarks WHERE source = ?", (source,))
+    row = cur.fetchone()
+    return row[0] if row else 0
+
+
+def _set_watermark(cur, source: str, last_id: int) -> None:
+    cur.execute("INSERT INTO rollup_watermarks (source, last_id) VALUES (?, ?) "
+                "ON CONFLICT(source) DO UPDATE SET last_id = excluded.last_id", (source, last_id))
+
+
+# ---------------- Rattrapage par source ----------------
+def _session_closed(statut, end: Optional[datetime], now: datetime) -> bool:
+    return statut != "en_cours" or (end is not None and end <= now)
+
+
+def _add_session(per_key: Dict[Tuple[str, str, str], List[float]], poste_id, start, end) -> None:
+    if start is None or end is None or end <= start:
+        return
+    slices = split_by_hour(start, end)
+    for day, hour, minutes in slices:
+        for metric, key in (("occupancy_hour", hour), ("occupancy_poste", str(poste_id))):
+            acc = per_key.setdefault((metric, day, key), [0.0, 0])
+            acc[0] += minutes
+    # une session compte une fois par jour et par poste touchés
+    for day in {d for d, _h, _m in slices}:
+        per_key[("occupancy_poste", day, str(poste_id))][1] += 1
+
+
+def _flush_sessions(cur, per_key) -> None:
+    cur.executemany(_UPSERT_SQL, [(m, p, k, int(round(v)), n) for (m, p, k), (v, n) in per_key.items()])
+
+
+def _catch_up_pending_sessions(cur, now: datetime) -> int:
+    """Sessions notées en cours aux rattrapages précédents et closes depuis."""
+    cur.execute("SELECT s.id, s.poste_id, s.debut, s.fin, s.statut FROM rollup_pending p "
+                "JOIN sessions s ON s.id = p.id WHERE p.source = 'sessions'")
+    per_key: Dict[Tuple[str, str, str], List[float]] = {}
+    closed = []
+    for sid, poste_id, debut, fin, statut in cur.fetchall():
+        end = _parse(fin)
+        if _session_closed(statut, end, now):
+            closed.append((sid,))
+            _add_session(per_key, poste_id, _parse(debut), end)
+    _flush_sessions(cur, per_key)
+    cur.executemany("DELETE FROM rollup_pending WHERE source = 'sessions' AND id = ?", closed)
+    # session supprimée entre-temps : rien à compter
+    cur.execute("DELETE FROM rollup_pending WHERE source = 'sessions' "
+                "AND id NOT IN (SELECT id FROM sessions)")
+    return len(closed)
+
+
+def _catch_up_sessions(cur, now: datetime, batch: int) -> Tuple[int, int]:
+    """Sessions au-delà de la marque : closes -> agrégées ; en cours -> rollup_pending.
+    Retourne (lignes lues, sessions agrégées)."""
+    last = _watermark(cur, "sessions")
+    cur.execute("SELECT id, poste_id, debut, fin, statut FROM sessions WHERE id > ? ORDER BY id LIMIT ?", (last, batch))
+    rows = cur.fetchall()
+    per_key: Dict[Tuple[str, str, str], List[float]] = {}
+    pending = []
+    for sid, poste_id, debut, fin, statut in rows:
+        end = _parse(fin)
+        if _session_closed(statut, end, now):
+            _add_session(per_key, poste_id, _parse(debut), end)
+        else:
+            pending.append((sid,))
+    if rows:
+        _flush_sessions(cur, per_key)
+        cur.executemany("INSERT OR IGNORE INTO rollup_pending (source, id) VALUES ('sessions', ?)", pending)
+        _set_watermark(cur, "sessions", rows[-1][0])
+    return len(rows), len(rows) - len(pending)
+
+
+def _catch_up_bonus(cur, batch: int) -> int:
+    last = _watermark(cur, "bonus_transactions")
+    cur.execute("SELECT id, minutes_delta, created_at FROM bonus_transactions WHERE id > ? ORDER BY id LIMIT ?",
+                (last, batch))
+    rows = cur.fetchall()
+    per_key: Dict[Tuple[str, str], List[int]] = {}
+    for tid, delta, created_at in rows:
+        at = _parse(created_at)
+        if at is None or not delta:
+            continue
+        metric = "bonus_issued" if delta > 0 else "bonus_consumed"
+        acc = per_key.setdefault((metric, at.strftime("%Y-%m-%d")), [0, 0])
+        acc[0] += abs(int(delta))
+        acc[1] += 1
+    if rows:
+        cur.executemany(_UPSERT_SQL, [(m, p, "", v, n) for (m, p), (v, n) in per_key.items()])
+        _set_watermark(cur, "bonus_transactions", rows[-1][0])
+    return len(rows)
+
+
+def _catch_up_grants(cur, batch: int) -> int:
+    last = _watermark(cur, "fidelity_reward_grants")
+    cur.execute("SELECT id, grant_type, minutes_awarded, created_at FROM fidelity_reward_grants "
+                "WHERE id > ? ORDER BY id LIMIT ?", (last, batch))
+    rows = cur.fetchall()
+    per_key: Dict[Tuple[str, str], List[int]] = {}
+    for gid, grant_type, minutes, created_at in rows:
+        at = _parse(created_at)
+        if at is None:
+            continue
+        acc = per_key.setdefault((iso_week(at.date()), grant_type or ""), [0, 0])
+        acc[0] += int(minutes or 0)
+        acc[1] += 1
+    if rows:
+        cur.executemany(_UPSERT_SQL, [("grant_cost", p, k, v, n) for (p, k), (v, n) in per_key.items()])
+        _set_watermark(cur, "fidelity_reward_grants", rows[-1][0])
+    return len(rows)
+
+
+def catch_up(cur, now: Optional[datetime] = None, batch: int = 5000) -> Dict[str, int]:
+    """Intègre les lignes nouvelles de chaque source (par lots) ; retourne le nombre de lignes agrégées."""
+    ensure_dashboard_schema(cur)
+    now = now or datetime.now()
+    counts = {}
+    readers = {
+        "sessions": lambda: _catch_up_sessions(cur, now, batch),
+        "bonus_transactions": lambda: (_catch_up_bonus(cur, batch),) * 2,
+        "fidelity_reward_grants": lambda: (_catch_up_grants(cur, batch),) * 2,
+    }
+    for source in SOURCES:
+        total = 0
+        if _table_exists(cur, source):
+            if source == "sessions":
+                total += _catch_up_pending_sessions(cur, now)
+            while True:
+                read, added = readers[source]()
+                total += added
+                if read < batch:
+                    break
+        counts[source] = total
+    return counts
+
+
+def rebuild_dashboard_rollup(cur, now: Optional[datetime] = None) -> Dict[str, int]:
+    """Reconstruction complète (migration / contrôle)."""
+    ensure_dashboard_schema(cur)
+    cur.execute("DELETE FROM dashboard_rollup")
+    cur.execute("DELETE FROM rollup_watermarks")
+    cur.execute("DELETE FROM rollup_pending")
+    return catch_up(cur, now)
+
+
+class DashboardData:
+    def __init__(self, db):
+        self.db = db
+        self._lock = threading.Lock()
+        self._cache: Dict[Tuple[str, str], Dict[str, Any]] = {}
+        self.queries = 0
+
+    def catch_up(self, now: Optional[datetime] = None) -> Dict[str, int]:
+        with self.db.get_connection() as conn:
+            counts = catch_up(conn.cursor(), now)
+            conn.commit()
+        conn.close()
+        if any(counts.values()):
+            self.refresh()
+        return counts
+
+    def refresh(self) -> None:
+        """Oublie les séries en cache (relues au prochain series())."""
+        with self._lock:
+            self._cache.clear()
+
+    def series(self, days: int = 30, today: Optional[date] = None) -> Dict[str, Any]:
+        today = today or date.today()
+        start = today - timedelta(days=max(1, days) - 1)
+        span = (start.isoformat(), today.isoformat())
+        with self._lock:
+            cached = self._cache.get(span)
+        if cached is not None:
+            return cached
+        result = self._read(start, today)
+        with self._lock:
+            self._cache[span] = result
+        return result
+
+    def _read(self, start: date, end: date) -> Dict[str, Any]:
+        first, last = start.isoformat(), end.isoformat()
+        with self.db.get_connection() as conn:
+            cur = conn.cursor()
+            ensure_dashboard_schema(cur)
+            ensure_revenue_schema(cur)
+
+            def grouped(metric, lo=first, hi=last, by="key"):
+                cur.execute(f"SELECT {by}, SUM(value) FROM dashboard_rollup WHERE metric = ? "
+                            f"AND period BETWEEN ? AND ? GROUP BY {by} ORDER BY {by}", (metric, lo, hi))
+                self.queries += 1
+                return cur.fetchall()
+
+            occupancy_poste = grouped("occupancy_poste")
+            occupancy_hour = dict(grouped("occupancy_hour"))
+            issued = dict(grouped("bonus_issued", by="period"))
+            consumed = dict(grouped("bonus_consumed", by="period"))
+            grants = grouped("grant_cost", iso_week(start), iso_week(end), by="period")
+            cur.execute("SELECT key, SUM(montant) FROM revenue_rollup WHERE dimension = 'console' "
+                        "AND period BETWEEN ? AND ? GROUP BY key ORDER BY SUM(montant) DESC", (first, last))
+            revenue = cur.fetchall()
+            names = {}
+            if occupancy_poste and _table_exists(cur, "postes"):
+                cur.execute("SELECT id, nom FROM postes")
+                names = {str(pid): nom for pid, nom in cur.fetchall()}
+            self.queries += 2
+        conn.close()
+        days = [(start + timedelta(days=i)).isoformat() for i in range((end - start).days + 1)]
+        return {
+            "start": first, "end": last,
+            "occupancy_poste": [(names.get(k, f"Poste {k}"), v) for k, v in occupancy_poste],
+            "occupancy_hour": [(f"{h:02d}h", occupancy_hour.get(f"{h:02d}", 0)) for h in range(24)],
+            "revenue_console": [(k or "?", v) for k, v in revenue],
+            "bonus": [(d[5:], issued.get(d, 0), consumed.get(d, 0)) for d in days],
+            "grant_cost": grants,
+        }
@@ -0,0 +1,104 @@
+# app/deadline_scheduler.py
+"""
+Ordonnanceur d'échéances (min-heap) pour les comptes à rebours des sessions.
+
+Fonctionnalités :
+- schedule(key, kind, due, payload) : programme un évènement à l'instant absolu `due`
+  (horloge monotone). Une nouvelle programmation (key, kind) remplace la précédente.
+- cancel(key, kind=None) : annulation paresseuse (l'entrée reste dans le tas et est ignorée).
+- pop_due(now) : retourne uniquement les évènements échus, dans l'ordre chronologique.
+- time_until_next(now) : délai avant le prochain évènement (None si rien n'est programmé),
+  pour armer un seul réveil (root.after / Condition.wait) au lieu d'un tick par seconde.
+
+Coût : O(log n) par programmation / échéance, rien à faire tant qu'aucun évènement n'est dû.
+
+Usage:
+    from app.deadline_scheduler import DeadlineScheduler
+    sched = DeadlineScheduler()
+    end = time.monotonic() + 30 * 60
+    sched.schedule(poste_id, "warning", end - 120)
+    sched.schedule(poste_id, "expire", end)
+    for key, kind, payload in sched.pop_due():
+        ...
+"""
+
+import heapq
+import itertools
+import threading
+import time
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple
+
+
+class DeadlineScheduler:
+    def __init__(self, clock: Callable[[], float] = time.monotonic):
+        self.clock = clock
+        self._heap: List[Tuple[float, int, Hashable, str, Any]] = []
+        self._live: Dict[Tuple[Hashable, str], int] = {}
+        self._counter = itertools.count()
+        self._lock = threading.RLock()
+
+    def __len__(self) -> int:
+        return len(self._live)
+
+    def schedule(self, key: Hashable, kind: str, due: float, payload: Any = None) -> None:
+        """Programme (ou reprogramme) l'évènement (key, kind) à l'instant monotone `due`."""
+        with self._lock:
+            token = next(self._counter)
+            self._live[(key, kind)] = token
+            heapq.heappush(self._heap, (due, token, key, kind, payload))
+            self._maybe_compact()
+
+    def cancel(self, key: Hashable, kind: Optional[str] = None) -> None:
+        """Annule l'évènement (key, kind), ou tous les évènements de `key` si kind est None."""
+        with self._lock:
+            if kind is not None:
+                self._live.pop((key, kind), None)
+            else:
+                for k in [k for k in self._live if k[0] == key]:
+                    del self._live[k]
+
+    def is_scheduled(self, key: Hashable, kind: str) -> bool:
+        return (key, kind) in self._live
+
+    def _discard_stale_top(self) -> None:
+        heap = self._heap
+        while heap and self._live.get((heap[0][2], heap[0][3])) != heap[0][1]:
+            heapq.heappop(heap)
+
+    def _maybe_compact(self) -> None:
+        # trop d'entrées annulées dans le tas : on le reconstruit
+        if len(self._heap) > 2 * len(self._live) + 64:
+            self._heap = [e for e in self._heap if self._live.get((e[2], e[3])) == e[1]]
+            heapq.heapify(self._heap)
+
+    def next_due(self) -> Optional[float]:
+        """Instant monotone du prochain évènement actif, ou None."""
+        with self._lock:
+            self._discard_stale_top()
+            return self._heap[0][0] if self._heap else None
+
+    def time_until_next(self, now: Optional[float] = None) -> Optional[float]:
+        due = self.next_due()
+        if due is None:
+            return None
+        now = self.clock() if now is None else now
+        return max(0.0, due - now)
+
+    def pop_due(self, now: Optional[float] = None) -> List[Tuple[Hashable, str, Any]]:
+        """Retire et retourne les évènements dont l'échéance est <= now."""
+        now = self.clock() if now is None else now
+        due_events = []
+        with self._lock:
+            heap = self._heap
+            while heap and heap[0][0] <= now:
+                due, token, key, kind, payload = heapq.heappop(heap)
+                if self._live.get((key, kind)) != token:
+                    continue
+                del self._live[(key, kind)]
+                due_events.append((key, kind, payload))
+        return due_events
+
+    def clear(self) -> None:
+        with self._lock:
+            self._heap.clear()
+            self._live.clear()
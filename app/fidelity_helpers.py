@@ -1,54 +1,277 @@
-﻿# app/fidelity_helpers.py
+# app/fidelity_helpers.py
 import sqlite3
 from datetime import date, datetime, timedelta
 from pathlib import Path
 
 DB = str(Path(__file__).resolve().parents[1] / "data" / "rdm_gsalle.db")
 
+# ---------------- Schéma canonique (celui de TicketsManager.run_migrations) ----------------
+TICKETS_FIDELITE_DDL = """
+CREATE TABLE IF NOT EXISTS tickets_fidelite (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id INTEGER NOT NULL,
+    ticket_date TEXT NOT NULL,
+    created_at TEXT NOT NULL,
+    source TEXT NOT NULL,
+    session_id TEXT,
+    amount_fcfa INTEGER,
+    sequence_id INTEGER,
+    expired INTEGER DEFAULT 0,
+    notes TEXT
+);
+"""
+
+FIDELITY_GRANTS_DDL = """
+CREATE TABLE IF NOT EXISTS fidelity_reward_grants (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id INTEGER NOT NULL,
+    grant_type TEXT NOT NULL,
+    tickets_count INTEGER NOT NULL,
+    minutes_awarded INTEGER NOT NULL,
+    created_at TEXT NOT NULL,
+    expiry_at TEXT,
+    source_reference TEXT,
+    used INTEGER DEFAULT 0,
+    notes TEXT
+);
+"""
+
+# colonne canonique -> (colonnes sources acceptées, valeur SQL par défaut)
+# Les colonnes legacy viennent de migrations/001_create_fidelity_tables.sql.
+_TICKETS_COLUMNS = [
+    ("id", ["id"], "NULL"),
+    ("user_id", ["user_id", "client_id"], None),
+    ("ticket_date", ["ticket_date", "date_jour"], None),
+    ("created_at", ["created_at"], "datetime('now')"),
+    ("source", ["source"], "'auto'"),
+    ("session_id", ["session_id"], "NULL"),
+    ("amount_fcfa", ["amount_fcfa"], "NULL"),
+    ("sequence_id", ["sequence_id"], "NULL"),
+    ("expired", ["expired"], "0"),
+    ("notes", ["notes", "note"], "NULL"),
+]
+_GRANTS_COLUMNS = [
+    ("id", ["id"], "NULL"),
+    ("user_id", ["user_id", "client_id"], None),
+    ("grant_type", ["grant_type", "source"], "'auto'"),
+    ("tickets_count", ["tickets_count"], "0"),
+    ("minutes_awarded", ["minutes_awarded", "minutes_granted"], "0"),
+    ("created_at", ["created_at", "grant_date"], "datetime('now')"),
+    ("expiry_at", ["expiry_at"], "NULL"),
+    ("source_reference", ["source_reference"], "'legacy:' || id"),
+    ("used", ["used"], "0"),
+    ("notes", ["notes", "note"], "NULL"),
+]
+
+# INSERT ... RETURNING disponible depuis SQLite 3.35
+_HAS_RETURNING = sqlite3.sqlite_version_info >= (3, 35, 0)
+
+# Cache du schéma détecté : (fichier de la base, PRAGMA schema_version) -> mapping.
+# Les connexions sont éphémères (une par opération) : la clé porte sur la base, pas sur la connexion.
+_SCHEMA_CACHE = {}
+_SCHEMA_CACHE_MAX = 64
+_SCHEMA_KEY_SQL = (
+    "SELECT (SELECT file FROM pragma_database_list WHERE name = 'main'),"
+    " (SELECT schema_version FROM pragma_schema_version)"
+)
+
+
+def _table_columns(cur, table):
+    cur.execute(f"PRAGMA table_info('{table}')")
+    return [r[1] for r in cur.fetchall()]
+
+
 def _detect_schema(conn):
+    """
+    Retourne le mapping des colonnes utilisateur/date/minutes des tables de fidélité.
+    Le résultat est mis en cache par fichier de base et schema_version (changé par tout
+    ALTER/CREATE/DROP, y compris d'un autre processus) : une seule lecture d'en-tête par appel
+    au lieu des PRAGMA table_info / index_list. Les bases en mémoire ne sont pas mises en cache.
+    """
     cur = conn.cursor()
-    cur.execute("PRAGMA table_info('tickets_fidelite')")
-    cols = [r[1] for r in cur.fetchall()]
-    cur.execute("PRAGMA table_info('fidelity_reward_grants')")
-    grants_cols = [r[1] for r in cur.fetchall()]
+    cur.execute(_SCHEMA_KEY_SQL)
+    path, version = cur.fetchone()
+    key = (path, version) if path else None
+    cached = _SCHEMA_CACHE.get(key) if key else None
+    if cached is not None:
+        return cached
+
+    cols = _table_columns(cur, "tickets_fidelite")
+    grants_cols = _table_columns(cur, "fidelity_reward_grants")
 
     mapping = {}
     mapping['ticket_user_col'] = 'user_id' if 'user_id' in cols else ('client_id' if 'client_id' in cols else None)
     mapping['ticket_date_col'] = 'ticket_date' if 'ticket_date' in cols else ('date_jour' if 'date_jour' in cols else None)
     mapping['grant_user_col'] = 'user_id' if 'user_id' in grants_cols else ('client_id' if 'client_id' in grants_cols else None)
     mapping['grant_minutes_col'] = 'minutes_awarded' if 'minutes_awarded' in grants_cols else ('minutes_granted' if 'minutes_granted' in grants_cols else None)
+    cur.execute("PRAGMA index_list('fidelity_reward_grants')")
+    mapping['grant_unique_index'] = any(r[1] == 'idx_reward_user_type_ref' for r in cur.fetchall())
+    mapping['canonical'] = (
+        mapping['ticket_user_col'] == 'user_id' and mapping['ticket_date_col'] == 'ticket_date'
+        and mapping['grant_user_col'] == 'user_id' and mapping['grant_minutes_col'] == 'minutes_awarded'
+        and mapping['grant_unique_index']
+    )
+
+    if key:
+        if len(_SCHEMA_CACHE) >= _SCHEMA_CACHE_MAX:
+            _SCHEMA_CACHE.clear()
+        _SCHEMA_CACHE[key] = mapping
     return mapping
 
-def count_tickets(conn, user_id, start_date, end_date):
+
+def _rebuild_table(cur, table, ddl, columns, existing):
+    """Recrée `table` au format canonique en recopiant les colonnes legacy correspondantes."""
+    exprs = []
+    for name, sources, default in columns:
+        src = next((c for c in sources if c in existing), None)
+        if src is None:
+            exprs.append(default)
+        elif default is not None and default != "NULL":
+            exprs.append(f"COALESCE({src}, {default})")
+        else:
+            exprs.append(src)
+    legacy = f"{table}_legacy"
+    cur.execute(f"DROP TABLE IF EXISTS {legacy}")
+    cur.execute(f"ALTER TABLE {table} RENAME TO {legacy}")
+    cur.execute(ddl)
+    cur.execute(
+        f"INSERT INTO {table} ({', '.join(c[0] for c in columns)}) SELECT {', '.join(exprs)} FROM {legacy}"
+    )
+    cur.execute(f"DROP TABLE {legacy}")
+
+
+def migrate_to_canonical_schema(conn):
+    """
+    Converge une base existante vers le schéma canonique (user_id / ticket_date / minutes_awarded).
+    Les tables créées par 001_create_fidelity_tables.sql (client_id / date_jour / minutes_granted)
+    sont reconstruites en conservant les ids et les données, puis l'index unique des grants
+    est posé (voir ensure_grant_unique_index). Idempotent.
+    Retourne la liste des tables reconstruites.
+    """
+    cur = conn.cursor()
+    rebuilt = []
+    try:
+        cur.execute("SAVEPOINT fidelity_canonical")
+        cols = _table_columns(cur, "tickets_fidelite")
+        if cols and not ("user_id" in cols and "ticket_date" in cols):
+            _rebuild_table(cur, "tickets_fidelite", TICKETS_FIDELITE_DDL, _TICKETS_COLUMNS, cols)
+            rebuilt.append("tickets_fidelite")
+        cur.execute(TICKETS_FIDELITE_DDL)
+        grants_cols = _table_columns(cur, "fidelity_reward_grants")
+        if grants_cols and not all(c in grants_cols for c in ("user_id", "grant_type", "minutes_awarded", "source_reference")):
+            _rebuild_table(cur, "fidelity_reward_grants", FIDELITY_GRANTS_DDL, _GRANTS_COLUMNS, grants_cols)
+            rebuilt.append("fidelity_reward_grants")
+        cur.execute(FIDELITY_GRANTS_DDL)
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_tickets_user_date ON tickets_fidelite(user_id, ticket_date)")
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_reward_user ON fidelity_reward_grants(user_id)")
+        _dedup_and_index_grants(cur)
+        cur.execute("RELEASE SAVEPOINT fidelity_canonical")
+        conn.commit()
+    except Exception:
+        cur.execute("ROLLBACK TO SAVEPOINT fidelity_canonical")
+        cur.execute("RELEASE SAVEPOINT fidelity_canonical")
+        raise
+    _forget_schema(conn)
+    return rebuilt
+
+
+def _forget_schema(conn):
+    """Oublie les mappings en cache de la base de `conn` (toutes versions de schéma)."""
+    path = conn.execute("SELECT file FROM pragma_database_list WHERE name = 'main'").fetchone()[0]
+    for key in [k for k in _SCHEMA_CACHE if k[0] == path]:
+        _SCHEMA_CACHE.pop(key, None)
+
+
+def ensure_grant_unique_index(conn):
+    """
+    Crée l'index unique (user_id, grant_type, source_reference) qui rend les grants idempotents.
+    Avant cela : les références non discriminantes ('' / 'admin_force') reçoivent un suffixe ':<id>'
+    et les doublons existants sont supprimés (on garde le premier grant, déjà crédité).
+    Retourne le nombre de doublons supprimés.
+    """
+    removed = _dedup_and_index_grants(conn.cursor())
+    conn.commit()
+    return removed
+
+
+def _dedup_and_index_grants(cur):
+    cur.execute("""
+        UPDATE fidelity_reward_grants
+        SET source_reference = CASE WHEN COALESCE(source_reference, '') = '' THEN 'legacy' ELSE source_reference END || ':' || id
+        WHERE COALESCE(source_reference, '') IN ('', 'admin_force')
+    """)
+    cur.execute("""
+        DELETE FROM fidelity_reward_grants
+        WHERE id NOT IN (
+            SELECT MIN(id) FROM fidelity_reward_grants GROUP BY user_id, grant_type, source_reference
+        )
+    """)
+    removed = cur.rowcount
+    cur.execute("""
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_reward_user_type_ref
+        ON fidelity_reward_grants(user_id, grant_type, source_reference)
+    """)
+    return removed
+
+
+def insert_grant_if_absent(cur, user_id, grant_type, tickets_count, minutes, created_at, expiry_at, source_reference, notes):
+    """
+    Insère un grant en une seule instruction indexée (INSERT OR IGNORE sur idx_reward_user_type_ref).
+    Retourne l'id du grant créé, ou None s'il existait déjà pour (user_id, grant_type, source_reference).
+    Ne commit pas : l'appelant garde la main sur la transaction.
+    """
+    params = (user_id, grant_type, tickets_count, minutes, created_at, expiry_at, source_reference, notes)
+    sql = """
+        INSERT OR IGNORE INTO fidelity_reward_grants
+          (user_id, grant_type, tickets_count, minutes_awarded, created_at, expiry_at, source_reference, used, notes)
+        VALUES (?, ?, ?, ?, ?, ?, ?, 0, ?)
+    """
+    if _HAS_RETURNING:
+        cur.execute(sql + " RETURNING id", params)
+        row = cur.fetchone()
+        return row[0] if row else None
+    cur.execute(sql, params)
+    return cur.lastrowid if cur.rowcount == 1 else None
+
+
+def _ensure_canonical(conn):
     m = _detect_schema(conn)
-    ucol = m['ticket_user_col']
-    dcol = m['ticket_date_col']
-    if not ucol or not dcol:
+    if m['canonical']:
+        return
+    if not m['ticket_user_col'] or not m['ticket_date_col']:
         raise RuntimeError("Tickets table missing expected columns.")
+    # base legacy (001) : conversion unique, ensuite le cache renvoie directement le mapping canonique
+    migrate_to_canonical_schema(conn)
+
+
+def count_tickets(conn, user_id, start_date, end_date):
+    _ensure_canonical(conn)
     cur = conn.cursor()
-    cur.execute(f"""
-      SELECT COUNT(DISTINCT {dcol}) FROM tickets_fidelite
-      WHERE {ucol}=? AND {dcol} BETWEEN ? AND ?
+    cur.execute("""
+      SELECT COUNT(DISTINCT ticket_date) FROM tickets_fidelite
+      WHERE user_id=? AND ticket_date BETWEEN ? AND ?
     """, (user_id, start_date.isoformat(), end_date.isoformat()))
     return cur.fetchone()[0]
 
 def insert_ticket_if_eligible(conn, user_id, amount_fcfa, source='auto', ticket_day=None, min_fcfa=100):
     if ticket_day is None:
         ticket_day = date.today()
-    m = _detect_schema(conn)
-    ucol = m['ticket_user_col']; dcol = m['ticket_date_col']
-    if not ucol or not dcol:
-        raise RuntimeError("Tickets table missing expected columns.")
+    _ensure_canonical(conn)
     if amount_fcfa < min_fcfa:
         return False, "Amount below threshold"
     cur = conn.cursor()
+    day = ticket_day.isoformat()
     try:
-        cur.execute(f"""
-           INSERT OR IGNORE INTO tickets_fidelite ({ucol}, {dcol}, source, created_at, amount_fcfa)
-           VALUES (?, ?, ?, datetime('now'), ?)
-        """, (user_id, ticket_day.isoformat(), source, amount_fcfa))
+        # un seul ticket non expiré par jour (le schéma canonique n'a pas de contrainte UNIQUE)
+        cur.execute("""
+           INSERT INTO tickets_fidelite (user_id, ticket_date, source, created_at, amount_fcfa)
+           SELECT ?, ?, ?, datetime('now'), ?
+           WHERE NOT EXISTS (
+               SELECT 1 FROM tickets_fidelite WHERE user_id=? AND ticket_date=? AND COALESCE(expired, 0)=0
+           )
+        """, (user_id, day, source, amount_fcfa, user_id, day))
         conn.commit()
-        cur.execute(f"SELECT 1 FROM tickets_fidelite WHERE {ucol}=? AND {dcol}=? LIMIT 1", (user_id, ticket_day.isoformat()))
+        cur.execute("SELECT 1 FROM tickets_fidelite WHERE user_id=? AND ticket_date=? LIMIT 1", (user_id, day))
         exists = cur.fetchone() is not None
         return exists, "Inserted or already exists"
     except Exception:
@@ -83,16 +306,6 @@ def compute_reward_for_user(conn, user_id, ref_date=None, cfg=None):
         minutes = cfg['extended_rewards'].get(str(t14), minutes)
     return {'tickets_7': t7, 'tickets_14': t14, 'minutes': minutes, 'granted': minutes > 0, 'window_start_7': start7, 'window_end_7': ref_date, 'window_start_14': start14, 'window_end_14': ref_date}
 
-def _grant_exists(conn, user_id, tickets_count, window_start_date, window_end_date):
-    cur = conn.cursor()
-    start_ts = window_start_date.isoformat() + " 00:00:00"
-    end_ts = window_end_date.isoformat() + " 23:59:59"
-    cur.execute("""
-      SELECT COUNT(*) FROM fidelity_reward_grants
-      WHERE user_id=? AND tickets_count=? AND created_at BETWEEN ? AND ?
-    """, (user_id, tickets_count, start_ts, end_ts))
-    return cur.fetchone()[0] > 0
-
 def _log_to_bonus_transactions(conn, user_id, minutes, note, source="fidelity_auto"):
     cur = conn.cursor()
     now = datetime.now().isoformat()
@@ -165,26 +378,29 @@ def grant_fidelity_reward_if_eligible(conn, user_id, ref_date=None, cfg=None):
     if minutes <= 0:
         return {"granted": False, "reason": "Calculated minutes is zero", "reward": reward}
 
-    # idempotence on grants
-    if _grant_exists(conn, user_id, tickets_count, window_start, window_end):
-        return {"granted": False, "reason": "Already granted for this window and tickets_count", "reward": reward}
-
     cur = conn.cursor()
+    # identité de la fenêtre dans la clé : stable tant que son 1er ticket y reste (la fenêtre qui
+    # glisse ne change pas la clé) ; l'index unique seul rend l'insertion idempotente
+    cur.execute("""
+      SELECT id FROM tickets_fidelite
+      WHERE user_id=? AND ticket_date BETWEEN ? AND ?
+      ORDER BY ticket_date, id LIMIT 1
+    """, (user_id, window_start.isoformat(), window_end.isoformat()))
+    first_ticket = cur.fetchone()
     expire_after = cfg.get("expire_after_days", 14)
     expiry_date = (ref_date + timedelta(days=expire_after)).isoformat()
+    src_ref = f"auto_first_ticket:{first_ticket[0] if first_ticket else 0}:cnt{tickets_count}"
 
-    # create grant
+    # create grant (idempotent: unique index on user_id, grant_type, source_reference)
     try:
-        cur.execute("""
-          INSERT INTO fidelity_reward_grants
-            (user_id, grant_type, tickets_count, minutes_awarded, created_at, expiry_at, source_reference, used, notes)
-          VALUES (?, ?, ?, ?, datetime('now'), ?, ?, 0, ?)
-        """, (user_id, 'auto', tickets_count, minutes, expiry_date, '', 'Granted automatically'))
+        grant_rowid = insert_grant_if_absent(cur, user_id, 'auto', tickets_count, minutes,
+                                             datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S"), expiry_date, src_ref, 'Granted automatically')
         conn.commit()
-        grant_rowid = cur.lastrowid
     except Exception:
         conn.rollback()
         raise
+    if grant_rowid is None:
+        return {"granted": False, "reason": "Already granted for this window and tickets_count", "reward": reward}
 
     # logging: bonus_transactions (always) + bonus_history (if client exists)
     logged = {}
@@ -0,0 +1,299 @@
+# app/fidelity_simulator.py
+"""
+Simulateur hors-ligne des récompenses de fidélité.
+
+Fonctionnalités :
+- Charge une seule fois l'historique tickets_fidelite (lecture seule) dans des tableaux compacts
+  (jours ordinaux triés par utilisateur).
+- Rejoue cet historique sous N configurations candidates en appliquant les mêmes règles que
+  TicketsManager._process_rewards_for_user (7j, 14j, JF30, expiration des séquences < 3 tickets).
+- Pour chaque configuration : minutes totales attribuées, nombre de grants / minutes par palier,
+  coût équivalent en FCFA.
+- Les configurations sont évaluées en parallèle dans un ProcessPoolExecutor (l'historique n'est
+  transmis qu'une fois par worker).
+
+Une configuration candidate utilise les mêmes clés que la table config ; les clés absentes
+reprennent la valeur actuelle de la base :
+    {"fidelity_rewards_7d": [{"tickets": 3, "minutes": 10}, ...],
+     "fidelity_jf30_per_ticket_minutes": 1}
+
+Usage :
+    from app.fidelity_simulator import FidelitySimulator
+    sim = FidelitySimulator.from_database("data/rdm_gsalle.db")
+    results = sim.run([{"fidelity_jf30_min_tickets": 15}, {"fidelity_jf30_per_ticket_minutes": 1}])
+
+    python -m app.fidelity_simulator --configs candidats.json [--db data/rdm_gsalle.db] [--workers 4]
+"""
+
+import json
+import os
+import sqlite3
+from array import array
+from bisect import bisect_left, bisect_right
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence
+
+from app.tickets_fidelite import REWARD_CONFIG_KEYS, parse_reward_config
+
+# Règle d'expiration des séquences (identique à TicketsManager)
+SEQUENCE_DAYS = 7
+SEQUENCE_MIN_TICKETS = 3
+
+
+def _open_readonly(db_path: str) -> sqlite3.Connection:
+    """Ouvre la base en lecture seule (mode=ro) : le simulateur ne peut rien écrire."""
+    uri = Path(db_path).resolve().as_uri() + "?mode=ro"
+    return sqlite3.connect(uri, uri=True)
+
+
+def _day_ordinal(value: str) -> int:
+    return date.fromisoformat(str(value)[:10]).toordinal()
+
+
+# ----------------------- Replay (pur, sans base) -----------------------
+def _replay_user(days: Sequence[int], cfg: Dict[str, Any], stats: Dict[str, Any]) -> None:
+    """
+    Rejoue chronologiquement les tickets d'un utilisateur (jours ordinaux triés)
+    et accumule les grants dans stats. Reproduit _process_rewards_for_user appelé après
+    chaque insertion de ticket.
+    """
+    tiers_7d = cfg["tiers_7d"]
+    tiers_14d = cfg["tiers_14d"]
+    threshold30 = cfg["jf30_min_tickets"]
+    per_ticket = cfg["jf30_per_ticket_minutes"]
+
+    live: List[int] = []          # jours des tickets non expirés (triés)
+    seq_days: List[int] = []      # jours des tickets de la séquence active
+    seq_start: Optional[int] = None
+    has_7d = False
+    granted = set()
+    rewarded = False
+
+    for d in days:
+        # un seul ticket non expiré par jour (record_ticket_if_eligible)
+        if live and live[-1] == d:
+            continue
+        if seq_start is None:
+            seq_start = d
+            seq_days = []
+        seq_days.append(d)
+        live.append(d)
+
+        # ---- 7 jours : palier le plus élevé atteint ----
+        cnt7 = len(live) - bisect_left(live, d - 6)
+        tier = None
+        for req, minutes in tiers_7d:
+            if cnt7 >= req:
+                tier = (req, minutes)
+        if tier and ("7d", d) not in granted:
+            granted.add(("7d", d))
+            has_7d = True
+            rewarded = True
+            stats["grants"]["7d:%d" % tier[0]] = stats["grants"].get("7d:%d" % tier[0], 0) + 1
+            stats["minutes_by_type"]["7d"] += tier[1]
+
+        # ---- 14 jours : ajouts cumulés, seulement après un grant 7j ----
+        if has_7d:
+            cnt14 = len(live) - bisect_left(live, d - 13)
+            for req, add_minutes in tiers_14d:
+                if cnt14 >= req and ("14d", d, req) not in granted:
+                    granted.add(("14d", d, req))
+                    rewarded = True
+                    stats["grants"]["14d:%d" % req] = stats["grants"].get("14d:%d" % req, 0) + 1
+                    stats["minutes_by_type"]["14d"] += add_minutes
+
+        # ---- JF30 ----
+        cnt30 = len(live) - bisect_left(live, d - 29)
+        if cnt30 >= threshold30 and ("jf30", d, cnt30) not in granted:
+            granted.add(("jf30", d, cnt30))
+            rewarded = True
+            stats["grants"]["jf30"] = stats["grants"].get("jf30", 0) + 1
+            stats["minutes_by_type"]["jf30"] += cnt30 * per_ticket
+
+        # ---- expiration / validation de la séquence active ----
+        if seq_start is not None and d > seq_start + SEQUENCE_DAYS - 1:
+            end = seq_start + SEQUENCE_DAYS - 1
+            cnt_initial = bisect_right(seq_days, end) - bisect_left(seq_days, seq_start)
+            if cnt_initial < SEQUENCE_MIN_TICKETS:
+                dropped = set(seq_days)
+                live = [x for x in live if x not in dropped]
+                stats["expired_tickets"] += len(seq_days)
+            seq_start = None
+            seq_days = []
+
+    if rewarded:
+        stats["users_rewarded"] += 1
+
+
+def _prepare_config(cfg: Dict[str, Any]) -> Dict[str, Any]:
+    """Pré-trie les barèmes une seule fois par configuration."""
+    tiers_7d = sorted((int(r.get("tickets", 0)), int(r.get("minutes", 0))) for r in cfg["rewards_7d"])
+    tiers_14d = sorted((int(r.get("tickets", 0)), int(r.get("add_minutes", 0))) for r in cfg["rewards_14d"])
+    prepared = dict(cfg)
+    prepared["tiers_7d"] = tiers_7d
+    prepared["tiers_14d"] = tiers_14d
+    return prepared
+
+
+def simulate(offsets: Sequence[int], days: Sequence[int], cfg: Dict[str, Any], fcfa_per_minute: float) -> Dict[str, Any]:
+    """
+    Évalue une configuration normalisée (parse_reward_config) sur l'historique.
+    offsets/days : représentation compacte (days[offsets[i]:offsets[i+1]] = tickets de l'utilisateur i).
+    """
+    prepared = _prepare_config(cfg)
+    stats = {
+        "grants": {},
+        "minutes_by_type": {"7d": 0, "14d": 0, "jf30": 0},
+        "users_rewarded": 0,
+        "expired_tickets": 0,
+    }
+    for i in range(len(offsets) - 1):
+        _replay_user(days[offsets[i]:offsets[i + 1]], prepared, stats)
+
+    total = sum(stats["minutes_by_type"].values())
+    stats["grants"] = dict(sorted(stats["grants"].items(), key=lambda kv: (kv[0].split(":")[0], int(kv[0].split(":")[1]) if ":" in kv[0] else 0)))
+    stats["total_grants"] = sum(stats["grants"].values())
+    stats["total_minutes"] = total
+    stats["cost_fcfa"] = round(total * fcfa_per_minute, 2)
+    return stats
+
+
+# Historique partagé avec les workers (initialisé une seule fois par processus)
+_WORKER_HISTORY = None
+
+
+def _init_worker(offsets, days):
+    global _WORKER_HISTORY
+    _WORKER_HISTORY = (offsets, days)
+
+
+def _simulate_in_worker(cfg: Dict[str, Any], fcfa_per_minute: float) -> Dict[str, Any]:
+    offsets, days = _WORKER_HISTORY
+    return simulate(offsets, days, cfg, fcfa_per_minute)
+
+
+# ----------------------- Simulator -----------------------
+class FidelitySimulator:
+    def __init__(self, offsets: array, days: array, base_config: Optional[Dict[str, Any]] = None, fcfa_per_minute: float = 100 / 6):
+        """
+        offsets/days : historique compact (voir simulate()).
+        base_config : valeurs brutes des clés REWARD_CONFIG_KEYS (comme dans la table config).
+        fcfa_per_minute : prix d'une minute de jeu, pour convertir les minutes offertes en FCFA.
+        """
+        self.offsets = offsets
+        self.days = days
+        self.base_config = dict(base_config or {})
+        self.fcfa_per_minute = float(fcfa_per_minute)
+
+    @classmethod
+    def from_database(cls, db_path: Optional[str] = None, fcfa_per_minute: Optional[float] = None) -> "FidelitySimulator":
+        """
+        Charge l'historique et la configuration actuelle en lecture seule.
+        Les tickets révoqués par l'admin sont ignorés ; les tickets expirés par la règle
+        des séquences sont conservés (ils sont ré-expirés pendant le rejeu).
+        """
+        if db_path is None:
+            from config.settings import DATABASE_PATH
+            db_path = str(DATABASE_PATH)
+        conn = _open_readonly(db_path)
+        try:
+            cur = conn.cursor()
+            cur.execute("""
+                SELECT user_id, ticket_date FROM tickets_fidelite
+                WHERE COALESCE(notes, '') NOT LIKE '%Revoked:%'
+                ORDER BY user_id, ticket_date, id
+            """)
+            offsets = array("l", [0])
+            days = array("l")
+            current_user = None
+            for user_id, ticket_date in cur:
+                if user_id != current_user and current_user is not None:
+                    offsets.append(len(days))
+                current_user = user_id
+                try:
+                    days.append(_day_ordinal(ticket_date))
+                except Exception:
+                    continue
+            if current_user is not None:
+                offsets.append(len(days))
+
+            placeholders = ",".join("?" for _ in REWARD_CONFIG_KEYS)
+            cur.execute(f"SELECT cle, valeur FROM config WHERE cle IN ({placeholders})", REWARD_CONFIG_KEYS)
+            base_config = {k: v for k, v in cur.fetchall()}
+
+            if fcfa_per_minute is None:
+                cur.execute("SELECT valeur FROM config WHERE cle = 'standard_tariff_fcfa_per_6min'")
+                row = cur.fetchone()
+                try:
+                    fcfa_per_minute = float(row[0]) / 6 if row else 100 / 6
+                except Exception:
+                    fcfa_per_minute = 100 / 6
+        finally:
+            conn.close()
+        return cls(offsets, days, base_config, fcfa_per_minute)
+
+    @property
+    def user_count(self) -> int:
+        return len(self.offsets) - 1
+
+    @property
+    def ticket_count(self) -> int:
+        return len(self.days)
+
+    def _resolve(self, candidate: Dict[str, Any]) -> Dict[str, Any]:
+        raw = dict(self.base_config)
+        for k in REWARD_CONFIG_KEYS:
+            if k in candidate:
+                raw[k] = candidate[k]
+        return parse_reward_config(raw)
+
+    def run(self, candidates: List[Dict[str, Any]], workers: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        Évalue chaque configuration candidate. workers=None -> nombre de CPU ; workers<=1 -> séquentiel.
+        Retourne une liste de résultats dans l'ordre des candidats.
+        """
+        configs = [self._resolve(c or {}) for c in candidates]
+        if workers is None:
+            workers = min(len(configs), os.cpu_count() or 1)
+        if workers <= 1 or len(configs) <= 1:
+            results = [simulate(self.offsets, self.days, cfg, self.fcfa_per_minute) for cfg in configs]
+        else:
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(self.offsets, self.days)) as pool:
+                results = list(pool.map(_simulate_in_worker, configs, [self.fcfa_per_minute] * len(configs)))
+        for i, (cand, res) in enumerate(zip(candidates, results)):
+            res["index"] = i
+            res["label"] = (cand or {}).get("label", f"config_{i}")
+        return results
+
+
+# ----------------------- CLI -----------------------
+if __name__ == "__main__":
+    import argparse
+    import time
+
+    parser = argparse.ArgumentParser(description="Simulation hors-ligne des barèmes de fidélité (lecture seule).")
+    parser.add_argument("--db", default=None, help="Chemin de la base (défaut: config.settings.DATABASE_PATH)")
+    parser.add_argument("--configs", default=None, help="Fichier JSON: liste de configurations candidates")
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args()
+
+    candidates = [{"label": "current"}]
+    if args.configs:
+        with open(args.configs, "r", encoding="utf-8") as f:
+            candidates += json.load(f)
+
+    t0 = time.perf_counter()
+    sim = FidelitySimulator.from_database(args.db)
+    t1 = time.perf_counter()
+    results = sim.run(candidates, workers=args.workers)
+    t2 = time.perf_counter()
+    print(json.dumps({
+        "users": sim.user_count,
+        "tickets": sim.ticket_count,
+        "fcfa_per_minute": round(sim.fcfa_per_minute, 4),
+        "load_seconds": round(t1 - t0, 3),
+        "simulate_seconds": round(t2 - t1, 3),
+        "results": results,
+    }, indent=2, ensure_ascii=False))
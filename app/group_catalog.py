@@ -0,0 +1,103 @@
+# app/group_catalog.py
+"""
+Catalogue partagé des groupes de consoles (table console_groups).
+
+Fonctionnalités :
+- Une seule requête charge tous les groupes dans une table id -> {"id", "name", "icon", "tariffs"}
+  (grille agrégée depuis group_tariffs en JSON [{"montant", "minutes"}], ordonnée par montant).
+- Rechargé uniquement après invalidate() (ajout / modification / suppression de groupe ou de grille) :
+  les vues admin (postes physiques, combobox des sorties) et le moteur de tarifs du gérant
+  résolvent les noms en mémoire, sans requête par sortie ou par identifiant.
+- Compteur `queries` pour vérifier le nombre d'accès base.
+
+Usage:
+    from app.group_catalog import GroupCatalog
+    catalog = GroupCatalog(db)
+    catalog.name(2)                # -> "ps4" (chargement au premier accès)
+    catalog.id_for_name("PS4")     # -> 2
+    catalog.invalidate()           # après modification de console_groups
+"""
+
+import threading
+from typing import Any, Dict, Iterable, List, Optional
+
+from app.relational_schema import GROUPS_WITH_TARIFFS_SQL, ensure_relational_schema
+
+
+class GroupCatalog:
+    def __init__(self, db):
+        self.db = db
+        self._lock = threading.Lock()
+        self._by_id: Dict[int, Dict[str, Any]] = {}
+        self._by_name: Dict[str, int] = {}
+        self._ordered: List[Dict[str, Any]] = []
+        self._loaded = False
+        self.queries = 0
+
+    # ---------------- Chargement ----------------
+    def refresh(self, cur=None) -> List[Dict[str, Any]]:
+        """
+        Recharge tous les groupes (une requête). `cur` : curseur de l'appelant (schéma relationnel
+        déjà assuré), sinon connexion dédiée.
+        """
+        if cur is None:
+            rows = []
+            try:
+                with self.db.get_connection() as conn:
+                    c = conn.cursor()
+                    c.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name = 'console_groups'")
+                    if c.fetchone():
+                        ensure_relational_schema(c)
+                        c.execute(GROUPS_WITH_TARIFFS_SQL)
+                        rows = c.fetchall()
+                conn.close()
+            except Exception as e:
+                print("[DEBUG] GroupCatalog.refresh error:", e)
+        else:
+            cur.execute(GROUPS_WITH_TARIFFS_SQL)
+            rows = cur.fetchall()
+        self.queries += 1
+        ordered = [{"id": gid, "name": name or "", "icon": icon or "", "tariffs": tariffs}
+                   for gid, name, icon, tariffs in rows]
+        with self._lock:
+            self._ordered = ordered
+            self._by_id = {g["id"]: g for g in ordered}
+            self._by_name = {g["name"].lower(): g["id"] for g in ordered}
+            self._loaded = True
+        return ordered
+
+    def ensure_loaded(self, cur=None) -> None:
+        if not self._loaded:
+            self.refresh(cur)
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._loaded = False
+
+    # ---------------- Lecture (en mémoire) ----------------
+    def groups(self) -> List[Dict[str, Any]]:
+        """Groupes triés par nom."""
+        self.ensure_loaded()
+        return list(self._ordered)
+
+    def get(self, group_id: Any) -> Optional[Dict[str, Any]]:
+        self.ensure_loaded()
+        try:
+            return self._by_id.get(int(group_id))
+        except (TypeError, ValueError):
+            return None
+
+    def name(self, group_id: Any, default: str = "") -> str:
+        group = self.get(group_id)
+        return group["name"] if group else default
+
+    def names(self, group_ids: Iterable[Any]) -> List[str]:
+        """Noms des groupes connus, dans l'ordre des identifiants (inconnus ignorés)."""
+        return [g["name"] for g in (self.get(gid) for gid in group_ids or []) if g]
+
+    def id_for_name(self, name: str) -> Optional[int]:
+        self.ensure_loaded()
+        return self._by_name.get((name or "").strip().lower())
+
+    def sorted_names(self) -> List[str]:
+        return [g["name"] for g in self.groups()]
@@ -0,0 +1,376 @@
+# app/hdmi_switch.py
+"""
+Pilote asynchrone du switch HDMI (liaison série) + faux switch sur pty pour les essais.
+
+Fonctionnalités :
+- HdmiSwitchDriver : thread d'E/S dédié et file de commandes. request() ne bloque jamais
+  (démarrage de session sans latence, même si le switch est lent ou débranché).
+- Coalescence : pour un même canal (sortie du switch), seule la dernière commande en attente
+  est envoyée ; les précédentes sont rapportées "coalesced".
+- Envoi avec délai d'attente de l'acquittement et nouvelles tentatives (réouverture du port
+  entre deux essais : un câble rebranché est repris automatiquement).
+- Résultats publiés dans une queue.Queue (results) que l'interface vide via root.after().
+- Protocole texte configurable : commande "SW {port}\\r\\n", acquittement "OK ..." (erreur "ERR ...").
+- Transport : pyserial si disponible (optionnel), sinon descripteur POSIX (tty / pty).
+- configure(device, baud) : nouveau port / débit pris en compte au prochain envoi.
+- notify_ports(added, removed) (SerialPortWatcher) : port débranché -> transport fermé et
+  commandes en échec immédiat (sans attendre les délais) ; rebranché -> reprise au prochain envoi.
+- FakeSwitchDevice : switch simulé sur un pseudo-terminal (délai, erreurs, silence).
+
+Usage:
+    from app.hdmi_switch import HdmiSwitchDriver
+    driver = HdmiSwitchDriver("COM1", baud=9600)
+    driver.start()
+    driver.request(poste_id=3, port=12, channel=3)  # immédiat ; canal = sortie pilotée
+    for result in driver.drain_results():
+        print(result["poste_id"], result["status"])
+    driver.stop()
+"""
+
+import itertools
+import os
+import queue
+import select
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+try:
+    import serial  # pyserial (optionnel)
+except Exception:
+    serial = None
+
+try:
+    import termios
+    import tty
+except Exception:
+    termios = None
+    tty = None
+
+STATUS_OK = "ok"
+STATUS_FAILED = "failed"
+STATUS_COALESCED = "coalesced"
+
+
+class SwitchTransportError(Exception):
+    pass
+
+
+class _PosixTransport:
+    """Port série brut via os.open (sans pyserial) ; utilisé aussi pour le faux switch pty."""
+
+    def __init__(self, path: str, baud: int):
+        if termios is None:
+            raise SwitchTransportError("transport POSIX indisponible sur ce système")
+        try:
+            self.fd = os.open(path, os.O_RDWR | os.O_NOCTTY | os.O_NONBLOCK)
+        except OSError as e:
+            raise SwitchTransportError(f"ouverture {path} impossible: {e}")
+        try:
+            tty.setraw(self.fd)
+            speed = getattr(termios, f"B{baud}", None)
+            if speed is not None:
+                attrs = termios.tcgetattr(self.fd)
+                attrs[4] = attrs[5] = speed
+                termios.tcsetattr(self.fd, termios.TCSANOW, attrs)
+        except termios.error:
+            pass
+        self._buffer = b""
+
+    def write(self, data: bytes) -> None:
+        try:
+            os.write(self.fd, data)
+        except OSError as e:
+            raise SwitchTransportError(str(e))
+
+    def readline(self, timeout: float) -> bytes:
+        deadline = time.monotonic() + timeout
+        while b"\n" not in self._buffer:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return b""
+            ready, _, _ = select.select([self.fd], [], [], remaining)
+            if not ready:
+                return b""
+            try:
+                chunk = os.read(self.fd, 256)
+            except BlockingIOError:
+                continue
+            except OSError as e:
+                raise SwitchTransportError(str(e))
+            if not chunk:
+                raise SwitchTransportError("port fermé")
+            self._buffer += chunk
+        line, self._buffer = self._buffer.split(b"\n", 1)
+        return line + b"\n"
+
+    def reset_input(self) -> None:
+        self._buffer = b""
+        try:
+            while select.select([self.fd], [], [], 0)[0]:
+                if not os.read(self.fd, 256):
+                    break
+        except OSError:
+            pass
+
+    def close(self) -> None:
+        try:
+            os.close(self.fd)
+        except OSError:
+            pass
+
+
+class _PySerialTransport:
+    def __init__(self, path: str, baud: int):
+        try:
+            self.ser = serial.Serial(path, baudrate=baud, timeout=0)
+        except Exception as e:
+            raise SwitchTransportError(f"ouverture {path} impossible: {e}")
+
+    def write(self, data: bytes) -> None:
+        try:
+            self.ser.write(data)
+            self.ser.flush()
+        except Exception as e:
+            raise SwitchTransportError(str(e))
+
+    def readline(self, timeout: float) -> bytes:
+        try:
+            self.ser.timeout = timeout
+            return self.ser.readline()
+        except Exception as e:
+            raise SwitchTransportError(str(e))
+
+    def reset_input(self) -> None:
+        try:
+            self.ser.reset_input_buffer()
+        except Exception:
+            pass
+
+    def close(self) -> None:
+        try:
+            self.ser.close()
+        except Exception:
+            pass
+
+
+def open_transport(path: str, baud: int):
+    """pyserial si installé, sinon descripteur POSIX."""
+    if serial is not None:
+        return _PySerialTransport(path, baud)
+    return _PosixTransport(path, baud)
+
+
+class HdmiSwitchDriver:
+    def __init__(self, device: Optional[str], baud: int = 9600, timeout: float = 1.0, retries: int = 2,
+                 command_template: str = "SW {port}\r\n", ack_prefix: str = "OK", transport_factory=open_transport):
+        self.device = device
+        self.baud = int(baud or 9600)
+        self.timeout = timeout
+        self.retries = retries
+        self.command_template = command_template
+        self.ack_prefix = ack_prefix
+        self.transport_factory = transport_factory
+        self.results: "queue.Queue[Dict[str, Any]]" = queue.Queue()
+        self._cond = threading.Condition()
+        self._pending: Dict[Any, Dict[str, Any]] = {}     # canal -> dernière commande
+        self._ids = itertools.count(1)
+        self._transport = None
+        self._thread: Optional[threading.Thread] = None
+        self._running = False
+        self._device_present = True
+        self._reset_transport = False
+        self.sent = 0
+
+    # ---------------- Cycle de vie ----------------
+    def start(self) -> None:
+        with self._cond:
+            if self._running:
+                return
+            self._running = True
+        self._thread = threading.Thread(target=self._run, name="HdmiSwitchIO", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 2.0) -> None:
+        with self._cond:
+            self._running = False
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+        self._close_transport()
+
+    # ---------------- API (thread Tk) ----------------
+    def request(self, poste_id: Any, port: Any, channel: Any = None) -> int:
+        """Programme la commutation vers `port` ; retourne l'identifiant de la demande (non bloquant)."""
+        cmd = {"id": next(self._ids), "poste_id": poste_id, "port": port, "channel": channel,
+               "requested_at": time.monotonic()}
+        with self._cond:
+            previous = self._pending.get(channel)
+            self._pending[channel] = cmd
+            self._cond.notify()
+        if previous is not None:
+            self._report(previous, STATUS_COALESCED, 0, "remplacée par une commande plus récente")
+        return cmd["id"]
+
+    def configure(self, device: Optional[str], baud: int = 9600) -> bool:
+        """Change de port / débit (configuration admin modifiée) ; True si quelque chose a changé."""
+        baud = int(baud or 9600)
+        with self._cond:
+            if device == self.device and baud == self.baud:
+                return False
+            self.device, self.baud = device, baud
+            self._device_present = True
+            self._reset_transport = True     # rouvert au prochain envoi
+            self._cond.notify_all()
+        return True
+
+    def notify_ports(self, added: List[str], removed: List[str]) -> None:
+        """Évènement de branchement (thread du watcher) ; seul le port configuré est concerné."""
+        with self._cond:
+            if self.device in removed:
+                self._device_present = False
+                self._reset_transport = True     # fermé par le thread d'E/S
+            elif self.device in added:
+                self._device_present = True
+                self._reset_transport = True
+            else:
+                return
+            self._cond.notify_all()
+
+    def drain_results(self, max_results: Optional[int] = None) -> List[Dict[str, Any]]:
+        drained = []
+        while max_results is None or len(drained) < max_results:
+            try:
+                drained.append(self.results.get_nowait())
+            except queue.Empty:
+                break
+        return drained
+
+    # ---------------- Thread d'E/S ----------------
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                while self._running and not self._pending:
+                    self._cond.wait()
+                if not self._running:
+                    return
+                channel = next(iter(self._pending))
+                cmd = self._pending.pop(channel)
+            self._execute(cmd)
+
+    def _superseded(self, cmd: Dict[str, Any]) -> bool:
+        with self._cond:
+            return cmd["channel"] in self._pending or not self._running
+
+    def _execute(self, cmd: Dict[str, Any]) -> None:
+        error = None
+        attempts = 0
+        for attempt in range(1, self.retries + 2):
+            if attempt > 1 and self._superseded(cmd):
+                self._report(cmd, STATUS_COALESCED, attempts, "remplacée pendant les tentatives")
+                return
+            attempts = attempt
+            try:
+                reply = self._send(cmd)
+                if reply.startswith(self.ack_prefix):
+                    self._report(cmd, STATUS_OK, attempts, None, reply)
+                    return
+                error = f"réponse inattendue: {reply!r}" if reply else "pas d'acquittement (délai dépassé)"
+            except SwitchTransportError as e:
+                error = str(e)
+                self._close_transport()
+                if not self._device_present:
+                    break       # port débranché : inutile de réessayer
+            # petit délai croissant avant de réessayer
+            with self._cond:
+                self._cond.wait(timeout=0.1 * attempt)
+        self._report(cmd, STATUS_FAILED, attempts, error)
+
+    def _send(self, cmd: Dict[str, Any]) -> str:
+        if not self.device:
+            raise SwitchTransportError("aucun port série configuré")
+        with self._cond:
+            reset, self._reset_transport = self._reset_transport, False
+            present = self._device_present
+        if reset:
+            self._close_transport()
+        if not present:
+            raise SwitchTransportError(f"{self.device} débranché")
+        if self._transport is None:
+            self._transport = self.transport_factory(self.device, self.baud)
+        self._transport.reset_input()
+        self._transport.write(self.command_template.format(port=cmd["port"]).encode("ascii"))
+        self.sent += 1
+        return self._transport.readline(self.timeout).decode("ascii", "replace").strip()
+
+    def _close_transport(self) -> None:
+        if self._transport is not None:
+            self._transport.close()
+            self._transport = None
+
+    def _report(self, cmd: Dict[str, Any], status: str, attempts: int, error: Optional[str], reply: str = "") -> None:
+        self.results.put({
+            "id": cmd["id"], "poste_id": cmd["poste_id"], "port": cmd["port"], "channel": cmd["channel"],
+            "status": status, "attempts": attempts, "error": error, "reply": reply,
+            "latency_s": round(time.monotonic() - cmd["requested_at"], 4),
+        })
+
+
+class FakeSwitchDevice:
+    """
+    Switch simulé sur un pseudo-terminal (POSIX). Le pilote ouvre `device_path`.
+    - delay : délai avant acquittement (s)
+    - fail_every : une commande sur N reçoit "ERR"
+    - silent : aucune réponse (switch débranché / bloqué)
+    """
+
+    def __init__(self, delay: float = 0.0, fail_every: int = 0, silent: bool = False):
+        if termios is None:
+            raise RuntimeError("FakeSwitchDevice nécessite un système POSIX (pty)")
+        self.delay = delay
+        self.fail_every = fail_every
+        self.silent = silent
+        self.received: List[str] = []
+        self._master, self._slave = os.openpty()
+        tty.setraw(self._master)
+        tty.setraw(self._slave)
+        self.device_path = os.ttyname(self._slave)
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name="FakeSwitchDevice", daemon=True)
+        self._thread.start()
+
+    def _run(self) -> None:
+        buffer = b""
+        while self._running:
+            ready, _, _ = select.select([self._master], [], [], 0.05)
+            if not ready:
+                continue
+            try:
+                chunk = os.read(self._master, 256)
+            except OSError:
+                return
+            buffer += chunk
+            while b"\n" in buffer:
+                line, buffer = buffer.split(b"\n", 1)
+                text = line.decode("ascii", "replace").strip()
+                self.received.append(text)
+                if self.silent:
+                    continue
+                if self.delay:
+                    time.sleep(self.delay)
+                failed = self.fail_every and len(self.received) % self.fail_every == 0
+                reply = f"ERR {text}\r\n" if failed else f"OK {text}\r\n"
+                try:
+                    os.write(self._master, reply.encode("ascii"))
+                except OSError:
+                    return
+
+    def close(self) -> None:
+        self._running = False
+        self._thread.join(1.0)
+        for fd in (self._master, self._slave):
+            try:
+                os.close(fd)
+            except OSError:
+                pass
@@ -0,0 +1,112 @@
+# app/paged_query.py
+"""
+Source de données paginée pour les listes virtuelles (historique bonus, utilisateurs, tickets).
+
+Fonctionnalités :
+- La requête de base (SELECT ..., sous-requêtes comprises) est enveloppée :
+  SELECT colonnes FROM (base) ORDER BY <colonne> <sens>, <clé> <sens> LIMIT ?.
+- Tri côté SQL : set_order(colonne, descending) n'accepte que les colonnes déclarées
+  (pas d'injection possible, pas de tri en Python).
+- Pagination par curseur (keyset) : la fin de chaque page lue est mémorisée ; la page suivante
+  reprend par WHERE (colonne, clé) < (?, ?) sans relire les lignes précédentes. Saut direct
+  (barre de défilement) ou valeur de tri NULL : repli sur OFFSET.
+- count() mis en cache jusqu'à invalidate().
+- Utilisable depuis un thread de travail (une connexion par appel, état protégé par un verrou).
+
+Usage:
+    from app.paged_query import PagedQuery
+    q = PagedQuery(db, "SELECT id, username, role FROM users", ("id", "username", "role"),
+                   order=("username", False))
+    q.count()
+    rows = q.fetch(0, 100)           # tuples dans l'ordre des colonnes
+    rows = q.fetch(100, 100)         # curseur : reprend après la dernière ligne lue
+    q.set_order("id", descending=True)
+"""
+
+import threading
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+
+class PagedQuery:
+    def __init__(self, db, base_sql: str, columns: Sequence[str], key: str = "id",
+                 order: Tuple[str, bool] = ("id", False), params: Sequence[Any] = ()):
+        self.db = db
+        self.base_sql = base_sql
+        self.columns = tuple(columns)
+        if key not in self.columns:
+            raise ValueError(f"colonne clé {key!r} absente de {self.columns}")
+        self.key = key
+        self.params = tuple(params)
+        self._lock = threading.Lock()
+        self._count: Optional[int] = None
+        self._cursors: Dict[int, Tuple[Any, Any]] = {}    # offset -> (valeur de tri, clé) de la ligne précédente
+        self.order_column, self.descending = self.key, False
+        self.set_order(*order)
+        self.queries = 0
+        self.keyset_fetches = 0
+
+    # ---------------- Tri ----------------
+    def set_order(self, column: str, descending: bool = False) -> None:
+        if column not in self.columns:
+            raise ValueError(f"tri impossible sur {column!r}")
+        with self._lock:
+            self.order_column, self.descending = column, bool(descending)
+            self._cursors.clear()
+
+    def invalidate(self) -> None:
+        """Données modifiées : nombre de lignes et curseurs à recalculer."""
+        with self._lock:
+            self._count = None
+            self._cursors.clear()
+
+    # ---------------- Lecture ----------------
+    def _execute(self, sql: str, params: Sequence[Any]) -> List[tuple]:
+        with self.db.get_connection() as conn:
+            cur = conn.cursor()
+            cur.execute(sql, tuple(params))
+            rows = cur.fetchall()
+        conn.close()
+        self.queries += 1
+        return rows
+
+    def count(self) -> int:
+        with self._lock:
+            if self._count is not None:
+                return self._count
+        total = self._execute(f"SELECT COUNT(*) FROM ({self.base_sql})", self.params)[0][0]
+        with self._lock:
+            self._count = total
+        return total
+
+    def fetch(self, offset: int, limit: int) -> List[tuple]:
+        """Lignes [offset, offset + limit) dans l'ordre courant."""
+        offset, limit = max(0, int(offset)), max(1, int(limit))
+        with self._lock:
+            column, descending = self.order_column, self.descending
+            cursor = self._cursors.get(offset) if offset else None
+        direction = "DESC" if descending else "ASC"
+        cols = ", ".join(self.columns)
+        sql = f"SELECT {cols} FROM ({self.base_sql})"
+        params = list(self.params)
+        if cursor is not None and cursor[0] is not None:
+            if descending:      # NULL trié en dernier en DESC : à garder après le curseur
+                sql += f" WHERE (({column}, {self.key}) < (?, ?) OR {column} IS NULL)"
+            else:
+                sql += f" WHERE ({column}, {self.key}) > (?, ?)"
+            params += list(cursor)
+            tail, tail_params = " LIMIT ?", [limit]
+            self.keyset_fetches += 1
+        else:
+            tail, tail_params = " LIMIT ? OFFSET ?", [limit, offset]
+        sql += f" ORDER BY {column} {direction}, {self.key} {direction}" + tail
+        rows = self._execute(sql, params + tail_params)
+        if rows:
+            last = rows[-1]
+            with self._lock:
+                if (self.order_column, self.descending) == (column, descending):
+                    self._cursors[offset + len(rows)] = (last[self.columns.index(column)],
+                                                         last[self.columns.index(self.key)])
+        return rows
+
+    def fetch_dicts(self, offset: int, limit: int) -> List[Dict[str, Any]]:
+        return [dict(zip(self.columns, row)) for row in self.fetch(offset, limit)]
@@ -0,0 +1,187 @@
+# app/password_hasher.py
+"""
+Hachage / vérification bcrypt des mots de passe avec coût réglable et cache de vérification.
+
+Fonctionnalités :
+- Coût bcrypt lu dans la config (clé `password_bcrypt_cost`) ; absent ou invalide : calibré
+  sur la machine (un hachage de mesure au coût 8, extrapolé : chaque +1 double la durée) pour
+  la latence cible `password_hash_target_ms` (250 ms par défaut), borné à [MIN_COST, MAX_COST],
+  puis enregistré. MIN_COST prime sur la cible : sur une machine lente, le hachage dépasse la
+  cible plutôt que de descendre sous le plancher de sécurité (un avertissement le signale).
+- verify_and_upgrade(password, hash) : vérification ; si le hash stocké n'a pas le coût courant,
+  un nouveau hash est retourné pour être réécrit (mise à niveau transparente à la connexion).
+- verify_cached(password, hash) : les vérifications réussies récentes (TTL, nombre borné) sont
+  mémorisées sous forme d'empreinte HMAC avec une clé aléatoire du processus (jamais le mot de
+  passe) ; sert aux confirmations répétées par mot de passe administrateur.
+- Classe sans Tk et thread-safe : les interfaces l'appellent depuis un thread de travail
+  (interfaces/task_runner.TaskRunner), un hachage bcrypt ne bloque jamais le thread Tk.
+
+Usage:
+    from app.password_hasher import PasswordHasher
+    hasher = PasswordHasher(ConfigStore(db))
+    stored = hasher.hash("secret")                       # thread de travail
+    ok, upgraded = hasher.verify_and_upgrade("secret", stored)
+    if ok and upgraded:
+        ...  # UPDATE users SET password_hash = upgraded
+"""
+
+import hashlib
+import hmac
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+import bcrypt
+
+COST_CONFIG_KEY = "password_bcrypt_cost"
+TARGET_CONFIG_KEY = "password_hash_target_ms"
+DEFAULT_TARGET_MS = 250
+MIN_COST = 10
+MAX_COST = 16
+PROBE_COST = 8
+
+CACHE_TTL_SECONDS = 300
+CACHE_SIZE = 32
+
+
+def hash_cost(stored: str) -> Optional[int]:
+    """Coût d'un hash bcrypt ('$2b$12$...' -> 12) ; None si le format n'est pas reconnu."""
+    try:
+        prefix, cost = str(stored).split("$")[1:3]
+        return int(cost) if prefix in ("2a", "2b", "2y") else None
+    except (ValueError, IndexError):
+        return None
+
+
+def calibrate_cost(target_ms: float = DEFAULT_TARGET_MS, min_cost: int = MIN_COST, max_cost: int = MAX_COST) -> int:
+    """
+    Coût le plus élevé dont la durée estimée reste sous `target_ms`, borné à [min_cost, max_cost].
+    min_cost l'emporte sur la cible : si même ce coût dépasse `target_ms`, min_cost est retourné
+    quand même (plancher de sécurité) et un avertissement donne la durée estimée.
+    """
+    salt = bcrypt.gensalt(rounds=PROBE_COST)
+    best = None
+    for _ in range(3):
+        t0 = time.perf_counter()
+        bcrypt.hashpw(b"calibration", salt)
+        elapsed = time.perf_counter() - t0
+        best = elapsed if best is None else min(best, elapsed)
+    probe_ms = max(best * 1000.0, 0.01)
+    cost = min_cost
+    floor_ms = probe_ms * 2 ** (min_cost - PROBE_COST)
+    if floor_ms > target_ms:
+        print(f"[WARN] PasswordHasher: coût minimal {min_cost} estimé à {floor_ms:.0f} ms, "
+              f"au-delà de la cible {target_ms:.0f} ms ; le plancher est conservé")
+    while cost < max_cost and probe_ms * 2 ** (cost + 1 - PROBE_COST) <= target_ms:
+        cost += 1
+    return cost
+
+
+class PasswordHasher:
+    def __init__(self, config_store=None, cost: Optional[int] = None,
+                 cache_ttl: float = CACHE_TTL_SECONDS, cache_size: int = CACHE_SIZE):
+        self.config_store = config_store
+        self._cost = cost
+        self._lock = threading.Lock()
+        self.cache_ttl = cache_ttl
+        self.cache_size = cache_size
+        self._recent: "OrderedDict[bytes, float]" = OrderedDict()
+        self._secret = os.urandom(32)
+        self.cache_hits = 0
+
+    # ---------------- Coût ----------------
+    @property
+    def cost(self) -> int:
+        if self._cost is None:
+            self.load_cost()
+        return self._cost
+
+    def load_cost(self) -> int:
+        """Coût configuré ; calibré et enregistré s'il est absent ou hors bornes."""
+        with self._lock:
+            if self._cost is not None:
+                return self._cost
+            cost, target = None, DEFAULT_TARGET_MS
+            if self.config_store is not None:
+                try:
+                    cost = int(self.config_store.get(COST_CONFIG_KEY))
+                except (TypeError, ValueError):
+                    cost = None
+                try:
+                    target = float(self.config_store.get(TARGET_CONFIG_KEY, DEFAULT_TARGET_MS))
+                except (TypeError, ValueError):
+                    target = DEFAULT_TARGET_MS
+            if cost is None or not MIN_COST <= cost <= MAX_COST:
+                cost = calibrate_cost(target)
+                if self.config_store is not None:
+                    try:
+                        self.config_store.set(COST_CONFIG_KEY, cost)
+                    except Exception as e:
+                        print("[DEBUG] PasswordHasher: enregistrement du coût impossible:", e)
+            self._cost = cost
+            return cost
+
+    def recalibrate(self, target_ms: Optional[float] = None) -> int:
+        """Nouvelle mesure (ex. changement de machine) ; les hash existants migrent à la connexion."""
+        with self._lock:
+            self._cost = None
+        if target_ms is not None and self.config_store is not None:
+            self.config_store.set(TARGET_CONFIG_KEY, int(target_ms))
+        if self.config_store is not None:
+            self.config_store.save({}, remove=[COST_CONFIG_KEY])
+        return self.load_cost()
+
+    def needs_rehash(self, stored: str) -> bool:
+        return hash_cost(stored) != self.cost
+
+    # ---------------- Hachage / vérification ----------------
+    def hash(self, password: str) -> str:
+        return bcrypt.hashpw(password.encode("utf-8"), bcrypt.gensalt(rounds=self.cost)).decode("utf-8")
+
+    def verify(self, password: str, stored: Optional[str]) -> bool:
+        if not password or not stored:
+            return False
+        try:
+            return bcrypt.checkpw(password.encode("utf-8"), str(stored).encode("utf-8"))
+        except ValueError:
+            # hash illisible (ancienne colonne en clair, valeur corrompue)
+            return False
+
+    def verify_and_upgrade(self, password: str, stored: Optional[str]) -> Tuple[bool, Optional[str]]:
+        """(mot de passe correct, nouveau hash au coût courant ou None si inchangé)."""
+        if not self.verify(password, stored):
+            return False, None
+        return True, (self.hash(password) if self.needs_rehash(stored) else None)
+
+    # ---------------- Cache des vérifications ----------------
+    def _cache_key(self, password: str, stored: str) -> bytes:
+        return hmac.new(self._secret, str(stored).encode("utf-8") + b"\0" + password.encode("utf-8"),
+                        hashlib.sha256).digest()
+
+    def verify_cached(self, password: str, stored: Optional[str]) -> bool:
+        """Comme verify(), sans nouveau calcul bcrypt si la même vérification a réussi récemment."""
+        if not password or not stored:
+            return False
+        key = self._cache_key(password, stored)
+        now = time.monotonic()
+        with self._lock:
+            expiry = self._recent.get(key)
+            if expiry is not None and expiry > now:
+                self._recent.move_to_end(key)
+                self.cache_hits += 1
+                return True
+            self._recent.pop(key, None)
+        if not self.verify(password, stored):
+            return False
+        with self._lock:
+            self._recent[key] = now + self.cache_ttl
+            while len(self._recent) > self.cache_size:
+                self._recent.popitem(last=False)
+        return True
+
+    def forget(self) -> None:
+        """Vide le cache (déconnexion, changement de mot de passe administrateur)."""
+        with self._lock:
+            self._recent.clear()
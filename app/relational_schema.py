@@ -0,0 +1,200 @@
+# app/relational_schema.py
+"""
+Stockage relationnel des sorties de postes et des grilles tarifaires (remplace les blobs JSON
+physical_postes.outputs et console_groups.tariffs).
+
+Fonctionnalités :
+- poste_outputs(poste_id, output_index, type, switch_port, group_id) :
+  FK physical_postes ON DELETE CASCADE, FK console_groups ON DELETE SET NULL, index sur group_id.
+- group_tariffs(group_id, montant, minutes) : clé (group_id, montant), FK console_groups ON DELETE CASCADE.
+- Suppression d'un groupe = un DELETE (les sorties passent à NULL, les tarifs suivent) ;
+  ajout / modification / suppression d'un tarif = une instruction indexée, plus l'incrément de
+  config_revision (les interfaces gérant invalident alors leur TariffEngine, sans relecture
+  systématique).
+- ensure_relational_schema(cur) : crée les tables et, à leur création seulement, reprend les
+  données JSON existantes (migrate_json_blobs) puis vide les colonnes JSON : un tarif ou une
+  sortie supprimés ensuite ne peuvent pas revenir. Les colonnes JSON ne sont plus lues ni écrites.
+- Les cascades exigent PRAGMA foreign_keys = ON sur la connexion (enable_foreign_keys).
+
+Usage:
+    from app.relational_schema import ensure_relational_schema, add_tariff, set_poste_outputs
+    with db.get_connection() as conn:
+        enable_foreign_keys(conn)
+        cur = conn.cursor()
+        ensure_relational_schema(cur)
+        add_tariff(cur, group_id=2, montant=500, minutes=60)
+"""
+
+import json
+from typing import Any, Dict, Iterable, List, Tuple
+
+from app.config_store import BUMP_REVISION_SQL, CONFIG_DDL
+
+POSTE_OUTPUTS_DDL = """
+    CREATE TABLE IF NOT EXISTS poste_outputs (
+        poste_id INTEGER NOT NULL REFERENCES physical_postes(id) ON DELETE CASCADE,
+        output_index INTEGER NOT NULL,
+        type TEXT NOT NULL DEFAULT 'HDMI',
+        switch_port INTEGER,
+        group_id INTEGER REFERENCES console_groups(id) ON DELETE SET NULL,
+        PRIMARY KEY (poste_id, output_index)
+    ) WITHOUT ROWID
+"""
+
+GROUP_TARIFFS_DDL = """
+    CREATE TABLE IF NOT EXISTS group_tariffs (
+        group_id INTEGER NOT NULL REFERENCES console_groups(id) ON DELETE CASCADE,
+        montant INTEGER NOT NULL CHECK(montant > 0),
+        minutes INTEGER NOT NULL CHECK(minutes > 0),
+        PRIMARY KEY (group_id, montant)
+    ) WITHOUT ROWID
+"""
+
+_INDEXES = (
+    "CREATE INDEX IF NOT EXISTS idx_poste_outputs_group ON poste_outputs(group_id)",
+)
+
+# groupes + grille (JSON agrégé, ordonné par montant via la clé primaire) en une requête
+GROUPS_WITH_TARIFFS_SQL = """
+    SELECT g.id, g.name, g.icon,
+           (SELECT json_group_array(json_object('montant', t.montant, 'minutes', t.minutes))
+              FROM group_tariffs t WHERE t.group_id = g.id)
+      FROM console_groups g
+     ORDER BY g.name
+"""
+
+
+def enable_foreign_keys(conn) -> None:
+    """Active les FK (sans effet dans une transaction ouverte : à appeler juste après la connexion)."""
+    conn.execute("PRAGMA foreign_keys = ON")
+
+
+def _existing_tables(cur) -> set:
+    cur.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name IN "
+                "('poste_outputs', 'group_tariffs', 'physical_postes', 'console_groups')")
+    return {r[0] for r in cur.fetchall()}
+
+
+def ensure_relational_schema(cur) -> bool:
+    """Crée les tables si besoin ; True si les blobs JSON ont été repris à cette occasion."""
+    existing = _existing_tables(cur)
+    created = not {"poste_outputs", "group_tariffs"} <= existing
+    cur.execute(POSTE_OUTPUTS_DDL)
+    cur.execute(GROUP_TARIFFS_DDL)
+    for ddl in _INDEXES:
+        cur.execute(ddl)
+    if created:
+        migrate_json_blobs(cur, existing)
+    return created
+
+
+def _json_list(raw: Any) -> List[Any]:
+    if not raw:
+        return []
+    try:
+        value = json.loads(raw) if isinstance(raw, str) else raw
+    except (TypeError, ValueError):
+        return []
+    if isinstance(value, dict):
+        return [{"montant": k, "minutes": v} for k, v in value.items()]
+    return value if isinstance(value, list) else []
+
+
+def migrate_json_blobs(cur, existing: Iterable[str] = None) -> Tuple[int, int]:
+    """
+    Copie outputs / tariffs JSON dans les tables puis met les colonnes JSON à NULL ; retourne
+    (sorties, tarifs). Appelée par ensure_relational_schema à la création des tables uniquement.
+    """
+    existing = set(existing) if existing is not None else _existing_tables(cur)
+    group_ids = set()
+    tariffs: Dict[Tuple[int, int], int] = {}
+    if "console_groups" in existing:
+        cur.execute("SELECT id, tariffs FROM console_groups")
+        for gid, raw in cur.fetchall():
+            group_ids.add(gid)
+            for item in _json_list(raw):
+                try:
+                    montant, minutes = int(item["montant"]), int(item["minutes"])
+                except (KeyError, TypeError, ValueError):
+                    continue
+                if montant > 0 and minutes > 0:
+                    tariffs[(gid, montant)] = max(minutes, tariffs.get((gid, montant), 0))
+    outputs = []
+    if "physical_postes" in existing:
+        cur.execute("SELECT id, outputs FROM physical_postes")
+        for pid, raw in cur.fetchall():
+            for pos, item in enumerate(_json_list(raw), start=1):
+                if not isinstance(item, dict):
+                    continue
+                try:
+                    idx = int(item.get("output_index", pos))
+                except (TypeError, ValueError):
+                    idx = pos
+                gid = item.get("group_id")
+                outputs.append((pid, idx, item.get("type") or "HDMI", item.get("switch_port"),
+                                gid if gid in group_ids else None))
+    cur.executemany("INSERT OR IGNORE INTO group_tariffs (group_id, montant, minutes) VALUES (?, ?, ?)",
+                    [(g, m, mins) for (g, m), mins in tariffs.items()])
+    cur.executemany("INSERT OR IGNORE INTO poste_outputs (poste_id, output_index, type, switch_port, group_id) "
+                    "VALUES (?, ?, ?, ?, ?)", outputs)
+    # blobs repris : les vider pour qu'une reprise ultérieure ne ressuscite rien
+    if "console_groups" in existing:
+        cur.execute("UPDATE console_groups SET tariffs = NULL WHERE tariffs IS NOT NULL")
+    if "physical_postes" in existing:
+        cur.execute("UPDATE physical_postes SET outputs = NULL WHERE outputs IS NOT NULL")
+    if outputs or tariffs:
+        bump_config_revision(cur)
+    return len(outputs), len(tariffs)
+
+
+# ---------------- Grilles tarifaires ----------------
+def bump_config_revision(cur) -> None:
+    """Signale une modification des grilles / groupes aux autres processus (ConfigStore.revision_changed)."""
+    cur.execute(CONFIG_DDL)
+    cur.execute(BUMP_REVISION_SQL)
+
+
+def list_tariffs(cur, group_id: Any) -> List[Tuple[int, int]]:
+    cur.execute("SELECT montant, minutes FROM group_tariffs WHERE group_id = ? ORDER BY montant", (group_id,))
+    return cur.fetchall()
+
+
+def add_tariff(cur, group_id: Any, montant: int, minutes: int) -> None:
+    """sqlite3.IntegrityError si le montant existe déjà pour ce groupe."""
+    cur.execute("INSERT INTO group_tariffs (group_id, montant, minutes) VALUES (?, ?, ?)",
+                (group_id, int(montant), int(minutes)))
+    bump_config_revision(cur)
+
+
+def update_tariff(cur, group_id: Any, old_montant: int, montant: int, minutes: int) -> int:
+    cur.execute("UPDATE group_tariffs SET montant = ?, minutes = ? WHERE group_id = ? AND montant = ?",
+                (int(montant), int(minutes), group_id, int(old_montant)))
+    changed = cur.rowcount
+    if changed:
+        bump_config_revision(cur)
+    return changed
+
+
+def delete_tariff(cur, group_id: Any, montant: int) -> int:
+    cur.execute("DELETE FROM group_tariffs WHERE group_id = ? AND montant = ?", (group_id, int(montant)))
+    changed = cur.rowcount
+    if changed:
+        bump_config_revision(cur)
+    return changed
+
+
+# ---------------- Sorties des postes ----------------
+def set_poste_outputs(cur, poste_id: Any, outputs: Iterable[Dict[str, Any]]) -> None:
+    """Remplace les sorties d'un poste ({"output_index", "type", "switch_port", "group_id"})."""
+    cur.execute("DELETE FROM poste_outputs WHERE poste_id = ?", (poste_id,))
+    cur.executemany(
+        "INSERT INTO poste_outputs (poste_id, output_index, type, switch_port, group_id) VALUES (?, ?, ?, ?, ?)",
+        [(poste_id, int(o["output_index"]), o.get("type") or "HDMI", o.get("switch_port"), o.get("group_id"))
+         for o in outputs]
+    )
+
+
+def list_poste_outputs(cur, poste_id: Any) -> List[Dict[str, Any]]:
+    cur.execute("SELECT output_index, type, switch_port, group_id FROM poste_outputs "
+                "WHERE poste_id = ? ORDER BY output_index", (poste_id,))
+    return [{"output_index": i, "type": t, "switch_port": sw, "group_id": g} for i, t, sw, g in cur.fetchall()]
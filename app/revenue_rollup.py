@@ -0,0 +1,157 @@
+# app/revenue_rollup.py
+"""
+Agrégats de recette précalculés (table revenue_rollup).
+
+Fonctionnalités :
+- record_payment(cur, ...) : chaque paiement (démarrage / prolongation de session) incrémente,
+  par UPSERT et dans la transaction de l'appelant, les lignes :
+    jour, heure du jour, groupe de console du jour, opérateur du jour, mois, groupe de console du mois.
+  La clé console passe par normalize_console_name ("ps4", "PlayStation 4" -> "PS4") : paiements
+  en direct et reconstruction alimentent les mêmes lignes.
+- Lecture en O(1) : get_total(cur, "2026-10-18") ou get_total(cur, "2026-10", "month").
+- RevenueReports : tuile "Recette du Jour", clôture de journée et rapport mensuel sans
+  parcourir la table sessions.
+- rebuild_revenue_rollup(cur) : reconstruction depuis sessions (migration / contrôle).
+
+Usage:
+    from app.revenue_rollup import RevenueReports
+    reports = RevenueReports(db)
+    reports.day_total()                    # recette du jour
+    reports.day_close("2026-10-18")        # totaux par heure / console / opérateur
+    reports.month_report("2026-10")
+"""
+
+from datetime import date, datetime
+from typing import Any, Dict, Optional
+
+from app.console_names import normalize_console_name
+
+REVENUE_ROLLUP_DDL = """
+    CREATE TABLE IF NOT EXISTS revenue_rollup (
+        period TEXT NOT NULL,
+        dimension TEXT NOT NULL CHECK(dimension IN ('day', 'hour', 'console', 'operator', 'month', 'month_console')),
+        key TEXT NOT NULL DEFAULT '',
+        montant INTEGER NOT NULL DEFAULT 0,
+        payments INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (period, dimension, key)
+    ) WITHOUT ROWID
+"""
+
+_UPSERT_SQL = """
+    INSERT INTO revenue_rollup (period, dimension, key, montant, payments) VALUES (?, ?, ?, ?, 1)
+    ON CONFLICT(period, dimension, key) DO UPDATE SET
+        montant = montant + excluded.montant,
+        payments = payments + 1
+"""
+
+
+def ensure_revenue_schema(cur) -> None:
+    cur.execute(REVENUE_ROLLUP_DDL)
+
+
+def _rollup_rows(at: datetime, montant: int, console: str, operator_id: Any):
+    day = at.strftime("%Y-%m-%d")
+    month = at.strftime("%Y-%m")
+    return [
+        (day, "day", "", montant),
+        (day, "hour", f"{at.hour:02d}", montant),
+        (day, "console", console or "", montant),
+        (day, "operator", "" if operator_id is None else str(operator_id), montant),
+        (month, "month", "", montant),
+        (month, "month_console", console or "", montant),
+    ]
+
+
+def record_payment(cur, at: datetime, montant: int, console: str = "", operator_id: Any = None) -> None:
+    """Ajoute un paiement aux agrégats (pas de commit : même transaction que la session)."""
+    montant = int(montant or 0)
+    if montant <= 0:
+        return
+    cur.executemany(_UPSERT_SQL, _rollup_rows(at, montant, normalize_console_name(console or ""), operator_id))
+
+
+def get_total(cur, period: str, dimension: str = "day", key: str = "") -> int:
+    cur.execute("SELECT montant FROM revenue_rollup WHERE period = ? AND dimension = ? AND key = ?",
+                (period, dimension, key))
+    row = cur.fetchone()
+    return row[0] if row else 0
+
+
+def get_breakdown(cur, period: str, dimension: str) -> Dict[str, Dict[str, int]]:
+    """{clé: {"montant", "payments"}} pour une période et une dimension (heure, console, opérateur...)."""
+    cur.execute("SELECT key, montant, payments FROM revenue_rollup WHERE period = ? AND dimension = ? ORDER BY key",
+                (period, dimension))
+    return {k: {"montant": m, "payments": n} for k, m, n in cur.fetchall()}
+
+
+def rebuild_revenue_rollup(cur) -> int:
+    """Reconstruit les agrégats depuis sessions (paiement unique à `debut`, opérateur inconnu)."""
+    ensure_revenue_schema(cur)
+    cur.execute("DELETE FROM revenue_rollup")
+    cur.execute("""
+        SELECT s.debut, s.montant_paye, COALESCE(p.type_console, '')
+          FROM sessions s LEFT JOIN postes p ON p.id = s.poste_id
+         WHERE s.montant_paye > 0
+    """)
+    count = 0
+    for debut, montant, console in cur.fetchall():
+        try:
+            at = datetime.fromisoformat(str(debut))
+        except ValueError:
+            continue
+        record_payment(cur, at, montant, console)
+        count += 1
+    return count
+
+
+class RevenueReports:
+    def __init__(self, db):
+        self.db = db
+
+    def _read(self, func, *args):
+        conn = self.db.get_connection()
+        try:
+            with conn:
+                cur = conn.cursor()
+                ensure_revenue_schema(cur)
+                return func(cur, *args)
+        finally:
+            conn.close()
+
+    def day_total(self, day: Optional[str] = None) -> int:
+        return self._read(get_total, day or date.today().isoformat(), "day", "")
+
+    def month_total(self, month: Optional[str] = None) -> int:
+        return self._read(get_total, month or date.today().strftime("%Y-%m"), "month", "")
+
+    def day_close(self, day: Optional[str] = None) -> Dict[str, Any]:
+        """Clôture de journée : total et ventilations par heure, console et opérateur."""
+        day = day or date.today().isoformat()
+
+        def read(cur):
+            return {
+                "day": day,
+                "total": get_total(cur, day, "day"),
+                "by_hour": get_breakdown(cur, day, "hour"),
+                "by_console": get_breakdown(cur, day, "console"),
+                "by_operator": get_breakdown(cur, day, "operator"),
+            }
+        return self._read(read)
+
+    def month_report(self, month: Optional[str] = None) -> Dict[str, Any]:
+        month = month or date.today().strftime("%Y-%m")
+
+        def read(cur):
+            cur.execute(
+                "SELECT period, montant, payments FROM revenue_rollup "
+                "WHERE dimension = 'day' AND period >= ? AND period < ? ORDER BY period",
+                (f"{month}-01", f"{month}-32")
+            )
+            by_day = {d: {"montant": m, "payments": n} for d, m, n in cur.fetchall()}
+            return {
+                "month": month,
+                "total": get_total(cur, month, "month"),
+                "by_day": by_day,
+                "by_console": get_breakdown(cur, month, "month_console"),
+            }
+        return self._read(read)
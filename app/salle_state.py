@@ -0,0 +1,336 @@
+# app/salle_state.py
+"""
+État de la salle (postes + sessions) indépendant de Tk.
+
+Fonctionnalités :
+- SalleState possède l'état des postes et des sessions ; toutes les opérations sont atomiques
+  (verrou unique) : start_session / stop_session / extend_session / set_statut.
+- Les sessions stockent une échéance monotone absolue (fin_monotonic) ; le temps restant est
+  calculé à la demande.
+- Un thread d'ordonnancement attend sur une Condition jusqu'à la prochaine échéance
+  (DeadlineScheduler) : alerte 2 minutes et expiration, sans tick par seconde.
+- Chaque changement est publié dans une queue.Queue thread-safe ; l'interface la vide via
+  root.after() (aucun appel Tk depuis un thread étranger).
+- add_listener(fn) : fn(event) est appelé de façon synchrone à chaque publication (sous le
+  verrou, donc non bloquant : ex. SessionStore.record qui ne fait qu'empiler).
+- Index type de console -> postes et compteurs (libres, occupés, maintenance, recette) tenus à
+  jour à chaque transition : postes_by_console() en O(résultat), stats() en O(1).
+- Utilisable sans affichage (tests de charge, benchmarks/bench_salle_state.py).
+
+Usage:
+    from app.salle_state import SalleState
+    state = SalleState()
+    state.load_postes([{"id": 1, "nom": "Poste 1", "type_console": "PS4", "statut": "libre"}])
+    state.start()                                   # thread des échéances
+    state.start_session(1, "Awa", 200, 30 * 60)
+    for event in state.drain_events():
+        print(event["type"], event["poste_id"])
+    state.stop()
+"""
+
+import math
+import queue
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+from app.console_names import normalize_console_name
+from app.deadline_scheduler import DeadlineScheduler
+
+STATUTS = ("libre", "occupe", "maintenance")
+_COUNTER_BY_STATUT = {"libre": "libres", "occupe": "occupes", "maintenance": "maintenance"}
+
+# Types d'évènements publiés
+EVENT_POSTE_LOADED = "poste_loaded"
+EVENT_SESSION_STARTED = "session_started"
+EVENT_SESSION_STOPPED = "session_stopped"
+EVENT_SESSION_EXTENDED = "session_extended"
+EVENT_SESSION_WARNING = "session_warning"
+EVENT_SESSION_EXPIRED = "session_expired"
+EVENT_STATUT_CHANGED = "statut_changed"
+
+
+class SalleState:
+    def __init__(self, warning_seconds: int = 120, clock: Callable[[], float] = time.monotonic):
+        self.warning_seconds = warning_seconds
+        self.clock = clock
+        self._lock = threading.RLock()
+        self._cond = threading.Condition(self._lock)
+        self._postes: Dict[int, Dict[str, Any]] = {}
+        self._scheduler = DeadlineScheduler(clock=clock)
+        self.events: "queue.Queue[Dict[str, Any]]" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._running = False
+        self._listeners: List[Callable[[Dict[str, Any]], None]] = []
+        # type de console normalisé -> {poste_id: None} (ensemble ordonné)
+        self._by_console: Dict[str, Dict[int, None]] = {}
+        self._counters = {"libres": 0, "occupes": 0, "maintenance": 0, "recette": 0}
+
+    # ---------------- Cycle de vie ----------------
+    def start(self) -> None:
+        """Démarre le thread des échéances (idempotent)."""
+        with self._cond:
+            if self._running:
+                return
+            self._running = True
+        self._thread = threading.Thread(target=self._run, name="SalleStateDeadlines", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 2.0) -> None:
+        with self._cond:
+            self._running = False
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def _run(self) -> None:
+        with self._cond:
+            while self._running:
+                delay = self._scheduler.time_until_next()
+                if delay is None or delay > 0:
+                    self._cond.wait(timeout=delay)
+                    if not self._running:
+                        break
+                self._process_due_locked(self.clock())
+
+    # ---------------- Chargement / lecture ----------------
+    def load_postes(self, postes: Iterable[Dict[str, Any]]) -> None:
+        """
+        Charge (ou recharge) les postes. Clés attendues : id, nom, type_console (normalisé ici),
+        statut ; optionnelles pour un poste occupé : client_nom, montant_paye, remaining_seconds.
+        """
+        now = self.clock()
+        with self._cond:
+            self._postes.clear()
+            self._scheduler.clear()
+            self._by_console.clear()
+            for k in self._counters:
+                self._counters[k] = 0
+            for p in postes:
+                poste = {
+                    "id": p["id"],
+                    "nom": p.get("nom") or f"Poste {p['id']}",
+                    "type_console": normalize_console_name(p.get("type_console") or ""),
+                    "statut": p.get("statut") if p.get("statut") in STATUTS else "libre",
+                    "client_nom": "",
+                    "montant_paye": 0,
+                    "fin_monotonic": None,
+                }
+                for k, v in p.items():
+                    if k not in poste and k != "remaining_seconds":
+                        poste[k] = v
+                if poste["statut"] == "occupe":
+                    poste["client_nom"] = p.get("client_nom") or ""
+                    poste["montant_paye"] = int(p.get("montant_paye") or 0)
+                    poste["fin_monotonic"] = now + max(0, float(p.get("remaining_seconds") or 0))
+                    self._schedule_locked(poste)
+                self._postes[poste["id"]] = poste
+                self._by_console.setdefault(poste["type_console"], {})[poste["id"]] = None
+                self._count_locked(poste, +1)
+                self._publish(EVENT_POSTE_LOADED, poste)
+            self._cond.notify_all()
+
+    def get_poste(self, poste_id: int) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            poste = self._postes.get(poste_id)
+            return dict(poste) if poste else None
+
+    def snapshot(self) -> Dict[int, Dict[str, Any]]:
+        """Copie cohérente de tous les postes (lecture sans verrou côté appelant)."""
+        with self._lock:
+            return {pid: dict(p) for pid, p in self._postes.items()}
+
+    def remaining_seconds(self, poste_id: int, now: Optional[float] = None) -> int:
+        with self._lock:
+            poste = self._postes.get(poste_id)
+            return remaining_seconds(poste, self.clock() if now is None else now) if poste else 0
+
+    def stats(self) -> Dict[str, int]:
+        """Compteurs courants (O(1)) : libres, occupes, maintenance, recette des sessions en cours."""
+        with self._lock:
+            return dict(self._counters)
+
+    def postes_by_console(self, console: str) -> List[int]:
+        """Identifiants des postes d'un type de console (ordre de chargement)."""
+        with self._lock:
+            return list(self._by_console.get(normalize_console_name(console or ""), ()))
+
+    def console_types(self) -> List[str]:
+        with self._lock:
+            return [c for c, ids in self._by_console.items() if ids]
+
+    def _count_locked(self, poste: Dict[str, Any], sign: int) -> None:
+        """Ajoute (+1) ou retire (-1) la contribution d'un poste aux compteurs."""
+        self._counters[_COUNTER_BY_STATUT[poste["statut"]]] += sign
+        self._counters["recette"] += sign * poste["montant_paye"]
+
+    # ---------------- Opérations atomiques ----------------
+    def _get_locked(self, poste_id: int) -> Dict[str, Any]:
+        poste = self._postes.get(poste_id)
+        if poste is None:
+            raise KeyError(f"Poste inconnu: {poste_id}")
+        return poste
+
+    def start_session(self, poste_id: int, client_nom: str, montant: int, duree_secondes: int) -> Dict[str, Any]:
+        if duree_secondes <= 0:
+            raise ValueError("duree_secondes doit être > 0")
+        with self._cond:
+            poste = self._get_locked(poste_id)
+            if poste["statut"] != "libre":
+                raise ValueError(f"{poste['nom']} n'est pas libre")
+            self._count_locked(poste, -1)
+            poste["statut"] = "occupe"
+            poste["client_nom"] = client_nom
+            poste["montant_paye"] = int(montant)
+            self._count_locked(poste, +1)
+            poste["fin_monotonic"] = self.clock() + duree_secondes
+            self._schedule_locked(poste)
+            self._cond.notify_all()
+            return self._publish(EVENT_SESSION_STARTED, poste, paid=int(montant))
+
+    def stop_session(self, poste_id: int) -> Dict[str, Any]:
+        with self._cond:
+            poste = self._get_locked(poste_id)
+            if poste["statut"] != "occupe":
+                raise ValueError(f"Aucune session en cours sur {poste['nom']}")
+            self._release_locked(poste)
+            self._cond.notify_all()
+            return self._publish(EVENT_SESSION_STOPPED, poste)
+
+    def extend_session(self, poste_id: int, secondes: int, montant: int = 0) -> Dict[str, Any]:
+        """Prolonge la session ; `montant` (FCFA) est le paiement de la prolongation."""
+        if secondes <= 0:
+            raise ValueError("secondes doit être > 0")
+        if montant < 0:
+            raise ValueError("montant doit être >= 0")
+        with self._cond:
+            poste = self._get_locked(poste_id)
+            if poste["statut"] != "occupe":
+                raise ValueError(f"Aucune session en cours sur {poste['nom']}")
+            poste["fin_monotonic"] = max(poste["fin_monotonic"] or self.clock(), self.clock()) + secondes
+            if montant:
+                self._count_locked(poste, -1)
+                poste["montant_paye"] += int(montant)
+                self._count_locked(poste, +1)
+            self._schedule_locked(poste)
+            self._cond.notify_all()
+            return self._publish(EVENT_SESSION_EXTENDED, poste, added_seconds=secondes, paid=int(montant))
+
+    def set_statut(self, poste_id: int, statut: str) -> Dict[str, Any]:
+        """Passe un poste en maintenance / libre (hors session)."""
+        if statut not in ("libre", "maintenance"):
+            raise ValueError(f"Statut invalide: {statut}")
+        with self._cond:
+            poste = self._get_locked(poste_id)
+            if poste["statut"] == "occupe":
+                self._release_locked(poste)
+            self._count_locked(poste, -1)
+            poste["statut"] = statut
+            self._count_locked(poste, +1)
+            self._cond.notify_all()
+            return self._publish(EVENT_STATUT_CHANGED, poste)
+
+    def apply_remote(self, poste_id: int, event_type: str, statut: str, client_nom: str = "", montant_paye: int = 0,
+                     remaining: Optional[float] = None, **extra) -> Optional[Dict[str, Any]]:
+        """
+        Applique l'état absolu d'un poste reçu d'une autre station (app/station_sync.py).
+        L'évènement publié porte remote=True (les listeners de persistance ne le réécrivent pas).
+        Retourne None si le poste est inconnu ou déjà dans cet état (ex: expiration vue des deux côtés).
+        """
+        if statut not in STATUTS:
+            return None
+        with self._cond:
+            poste = self._postes.get(poste_id)
+            if poste is None:
+                return None
+            if statut != "occupe" and poste["statut"] == statut:
+                return None
+            self._count_locked(poste, -1)
+            if statut == "occupe":
+                poste["statut"] = "occupe"
+                poste["client_nom"] = client_nom or poste["client_nom"]
+                poste["montant_paye"] = int(montant_paye or poste["montant_paye"])
+                poste["fin_monotonic"] = self.clock() + max(0.0, float(remaining or 0))
+                self._schedule_locked(poste)
+            else:
+                self._scheduler.cancel(poste_id)
+                poste["statut"] = statut
+                poste["client_nom"] = ""
+                poste["montant_paye"] = 0
+                poste["fin_monotonic"] = None
+            self._count_locked(poste, +1)
+            self._cond.notify_all()
+            return self._publish(event_type, poste, remote=True, **extra)
+
+    # ---------------- Échéances ----------------
+    def process_due(self, now: Optional[float] = None) -> int:
+        """Traite les échéances dues (utilisé par le thread ; appelable directement sans thread)."""
+        with self._cond:
+            return self._process_due_locked(self.clock() if now is None else now)
+
+    def _process_due_locked(self, now: float) -> int:
+        handled = 0
+        for pid, kind, _ in self._scheduler.pop_due(now):
+            poste = self._postes.get(pid)
+            if not poste or poste["statut"] != "occupe":
+                continue
+            handled += 1
+            if kind == "warning":
+                self._publish(EVENT_SESSION_WARNING, poste)
+            elif kind == "expire":
+                self._release_locked(poste)
+                self._publish(EVENT_SESSION_EXPIRED, poste)
+        return handled
+
+    def _schedule_locked(self, poste: Dict[str, Any]) -> None:
+        pid = poste["id"]
+        fin = poste["fin_monotonic"]
+        self._scheduler.cancel(pid)
+        if fin - self.clock() > self.warning_seconds:
+            self._scheduler.schedule(pid, "warning", fin - self.warning_seconds)
+        self._scheduler.schedule(pid, "expire", fin)
+
+    def _release_locked(self, poste: Dict[str, Any]) -> None:
+        self._scheduler.cancel(poste["id"])
+        self._count_locked(poste, -1)
+        poste["statut"] = "libre"
+        poste["client_nom"] = ""
+        poste["montant_paye"] = 0
+        poste["fin_monotonic"] = None
+        self._count_locked(poste, +1)
+
+    # ---------------- Évènements ----------------
+    def add_listener(self, listener: Callable[[Dict[str, Any]], None]) -> None:
+        with self._lock:
+            self._listeners.append(listener)
+
+    def _publish(self, event_type: str, poste: Dict[str, Any], **extra) -> Dict[str, Any]:
+        snap = dict(poste)
+        event = {"type": event_type, "poste_id": poste["id"], "poste": snap, "at": self.clock()}
+        event.update(extra)
+        self.events.put(event)
+        for listener in self._listeners:
+            try:
+                listener(event)
+            except Exception as e:
+                print("[DEBUG] SalleState listener error:", e)
+        return snap
+
+    def drain_events(self, max_events: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Vide la file d'évènements sans bloquer (appelé depuis root.after côté Tk)."""
+        drained = []
+        while max_events is None or len(drained) < max_events:
+            try:
+                drained.append(self.events.get_nowait())
+            except queue.Empty:
+                break
+        return drained
+
+
+def remaining_seconds(poste: Dict[str, Any], now: float) -> int:
+    """Temps restant (s) d'un poste (dict ou snapshot) à l'instant monotone `now`."""
+    fin = poste.get("fin_monotonic")
+    if poste.get("statut") != "occupe" or fin is None:
+        return 0
+    return max(0, int(math.ceil(fin - now)))
@@ -0,0 +1,197 @@
+# app/serial_ports.py
+"""
+Énumération des ports série et surveillance des branchements / débranchements à chaud.
+
+Fonctionnalités :
+- list_serial_ports() : une seule lecture de /dev (os.scandir) filtrée par préfixes
+  (ttyUSB, ttyACM, ttyS réels, cu.*), dédoublonnage O(n) ; pyserial (optionnel) là où
+  /dev n'existe pas (Windows), sinon liste par défaut.
+- SerialPortWatcher : thread de fond qui garde l'ensemble courant en cache. Changement détecté
+  à moindre coût : on ne relit /dev que si sa date de modification (st_mtime_ns) a changé
+  (création / suppression d'un nœud de périphérique) ; sans /dev, comparaison de l'énumération.
+- Évènements {"added": [...], "removed": [...], "ports": [...]} : listeners (thread du watcher,
+  ex. HdmiSwitchDriver.notify_ports) et file `events` vidée par l'interface via root.after.
+
+Usage:
+    from app.serial_ports import SerialPortWatcher
+    watcher = SerialPortWatcher(interval=1.0)
+    watcher.add_listener(hdmi_driver.notify_ports)
+    watcher.start()
+    watcher.ports()                     # cache, sans E/S
+    for event in watcher.drain_events():
+        print(event["added"], event["removed"])
+    watcher.stop()
+"""
+
+import os
+import platform
+import queue
+import re
+import threading
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+try:
+    import serial.tools.list_ports as list_ports  # pyserial (optionnel)
+except Exception:
+    list_ports = None
+
+DEV_DIR = "/dev"
+SYSFS_TTY = "/sys/class/tty"
+_DEV_PREFIXES = ("ttyUSB", "ttyACM", "ttyS", "cu.")
+_NUM = re.compile(r"(\d+)")
+
+
+def _natural_key(name: str):
+    return [int(part) if part.isdigit() else part for part in _NUM.split(name)]
+
+
+def _is_real_ttyS(name: str) -> bool:
+    # les 32 ttyS* existent toujours sous Linux ; seuls ceux rattachés à un périphérique comptent
+    if not os.path.isdir(SYSFS_TTY):
+        return True
+    return os.path.exists(os.path.join(SYSFS_TTY, name, "device"))
+
+
+def _default_ports() -> List[str]:
+    system = platform.system().lower()
+    if system == "windows":
+        return [f"COM{i}" for i in range(1, 13)]
+    if system == "darwin":
+        return ["/dev/cu.usbserial", "/dev/cu.usbmodem"]
+    return ["/dev/ttyUSB0", "/dev/ttyACM0"]
+
+
+def list_dev_ports(dev_dir: str = DEV_DIR) -> List[str]:
+    """Ports trouvés dans `dev_dir` (une lecture du répertoire), triés par préfixe puis numéro."""
+    found: Dict[str, None] = {}
+    try:
+        with os.scandir(dev_dir) as entries:
+            names = [e.name for e in entries]
+    except OSError:
+        return []
+    for prefix in _DEV_PREFIXES:
+        for name in sorted((n for n in names if n.startswith(prefix)), key=_natural_key):
+            if prefix == "ttyS" and dev_dir == DEV_DIR and not _is_real_ttyS(name):
+                continue
+            found[os.path.join(dev_dir, name)] = None
+    return list(found)
+
+
+def list_serial_ports(fallback: bool = True) -> List[str]:
+    """Énumération complète (ports dédoublonnés, ordre stable)."""
+    if os.path.isdir(DEV_DIR):
+        ports = list_dev_ports()
+    elif list_ports is not None:
+        try:
+            ports = list(dict.fromkeys(p.device for p in list_ports.comports()))
+        except Exception:
+            ports = []
+    else:
+        ports = []
+    if not ports and fallback:
+        return _default_ports()
+    return ports
+
+
+class SerialPortWatcher:
+    def __init__(self, interval: float = 1.0, dev_dir: str = DEV_DIR,
+                 lister: Optional[Callable[[], List[str]]] = None):
+        self.interval = interval
+        self.dev_dir = dev_dir
+        if lister is None:
+            lister = (lambda: list_dev_ports(dev_dir)) if os.path.isdir(dev_dir) else (lambda: list_serial_ports(False))
+        self.lister = lister
+        self.events: "queue.Queue[Dict[str, Any]]" = queue.Queue()
+        self._listeners: List[Callable[[List[str], List[str]], None]] = []
+        self._lock = threading.Lock()
+        self._poll_lock = threading.Lock()     # watcher et refresh() peuvent se croiser
+        self._ports: Tuple[str, ...] = ()
+        self._stamp = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.scans = 0
+
+    # ---------------- Cycle de vie ----------------
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self.poll()     # cache initial (évènement "added" avec les ports présents)
+        self._thread = threading.Thread(target=self._run, name="SerialPortWatcher", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 2.0) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            try:
+                self.poll()
+            except Exception as e:
+                print("[DEBUG] SerialPortWatcher.poll error:", e)
+
+    # ---------------- API ----------------
+    def add_listener(self, listener: Callable[[List[str], List[str]], None]) -> None:
+        """listener(added, removed), appelé depuis le thread du watcher."""
+        self._listeners.append(listener)
+
+    def ports(self) -> List[str]:
+        with self._lock:
+            return list(self._ports)
+
+    def drain_events(self) -> List[Dict[str, Any]]:
+        drained = []
+        while True:
+            try:
+                drained.append(self.events.get_nowait())
+            except queue.Empty:
+                return drained
+
+    def _directory_stamp(self):
+        try:
+            st = os.stat(self.dev_dir)
+        except OSError:
+            return None
+        return st.st_mtime_ns, st.st_ino
+
+    def poll(self, force: bool = False) -> bool:
+        """Un tour de surveillance ; True si l'ensemble des ports a changé."""
+        with self._poll_lock:
+            return self._poll(force)
+
+    def _poll(self, force: bool) -> bool:
+        stamp = self._directory_stamp()
+        if not force and stamp is not None and stamp == self._stamp:
+            return False
+        self._stamp = stamp
+        self.scans += 1
+        current = tuple(self.lister())
+        with self._lock:
+            previous = self._ports
+            if current == previous:
+                return False
+            self._ports = current
+        before, after = set(previous), set(current)
+        added = [p for p in current if p not in before]
+        removed = [p for p in previous if p not in after]
+        if not added and not removed:
+            return False        # même ensemble, ordre différent
+        self.events.put({"added": added, "removed": removed, "ports": list(current)})
+        for listener in list(self._listeners):
+            try:
+                listener(added, removed)
+            except Exception as e:
+                print("[DEBUG] SerialPortWatcher listener error:", e)
+        return True
+
+    def refresh(self) -> List[str]:
+        """Relecture forcée (bouton "Détecter") ; retourne les ports courants."""
+        self.poll(force=True)
+        return self.ports()
@@ -0,0 +1,356 @@
+# app/session_store.py
+"""
+Persistance durable des sessions de la salle (table `sessions`) avec reprise après crash.
+
+Fonctionnalités :
+- Horodatages absolus : `debut` (démarrage) et `fin` (échéance prévue tant que la session est
+  'en_cours', heure réelle d'arrêt ensuite), au format local 'YYYY-MM-DD HH:MM:SS'.
+- Écriture différée (write-behind) : record(event) est branché sur SalleState.add_listener ;
+  il ne fait qu'empiler l'évènement. Un thread d'écriture applique le lot toutes les
+  `flush_interval` secondes dans UNE transaction. Le décompte lui-même ne coûte aucune E/S.
+- restore() : synchronise `postes` depuis `physical_postes` (postes créés par l'admin) puis lit
+  postes + session ouverte + client en une seule requête. Les sessions échues pendant l'arrêt
+  passent en 'expire' ; les autres reprennent avec leur temps restant réel.
+- Chaque paiement (démarrage, prolongation) alimente revenue_rollup (app/revenue_rollup.py) dans
+  la même transaction ; la recette du jour est lue en O(1) au démarrage puis tenue en mémoire.
+- Un lot qui clôt des sessions rattrape aussi les agrégats du tableau de bord admin
+  (app/dashboard_rollup.py, par marque d'eau) dans la même transaction.
+- Flux de changements multi-postes : chaque écriture ajoute, dans la même transaction, une ligne
+  à la table append-only `events` (id croissant, station émettrice, état absolu du poste en JSON).
+  Les autres stations la lisent via app/station_sync.py. Les évènements reçus d'une autre station
+  (event["remote"]) ne sont pas réécrits : seule la correspondance poste -> session est mise à jour.
+
+Usage:
+    from app.session_store import SessionStore
+    store = SessionStore(db)
+    postes = store.restore()                 # à passer à SalleState.load_postes
+    state.load_postes(postes)
+    state.add_listener(store.record)
+    store.start()
+    ...
+    store.stop()                             # vide le dernier lot
+"""
+
+import json
+import threading
+import time
+import uuid
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+from app.dashboard_rollup import catch_up as catch_up_dashboard
+from app.relational_schema import ensure_relational_schema
+from app.revenue_rollup import ensure_revenue_schema, get_total, record_payment
+from app.salle_state import (
+    EVENT_SESSION_STARTED, EVENT_SESSION_STOPPED, EVENT_SESSION_EXTENDED,
+    EVENT_SESSION_EXPIRED, EVENT_STATUT_CHANGED,
+)
+
+TS_FORMAT = "%Y-%m-%d %H:%M:%S"
+ANONYMOUS_CLIENT = "Client anonyme"
+
+# Évènements qui modifient la base (alerte / chargement : rien à écrire)
+_PERSISTED_EVENTS = (
+    EVENT_SESSION_STARTED, EVENT_SESSION_STOPPED, EVENT_SESSION_EXTENDED,
+    EVENT_SESSION_EXPIRED, EVENT_STATUT_CHANGED,
+)
+
+# Évènements qui peuvent clore une session (agrégats du tableau de bord à rattraper)
+CLOSING_EVENTS = (EVENT_SESSION_STARTED, EVENT_SESSION_STOPPED, EVENT_SESSION_EXPIRED, EVENT_STATUT_CHANGED)
+
+# postes créés par l'admin (physical_postes) absents de `postes` ;
+# type_console = groupe de la 1re sortie (poste_outputs), sinon 1er groupe de console_group_ids
+_SYNC_POSTES_SQL = """
+    INSERT INTO postes (numero, nom, type_console, statut, switch_port)
+    SELECT pp.numero, pp.nom,
+           COALESCE((SELECT UPPER(cg.name)
+                       FROM poste_outputs o JOIN console_groups cg ON cg.id = o.group_id
+                      WHERE o.poste_id = pp.id
+                      ORDER BY o.output_index LIMIT 1),
+                    (SELECT UPPER(cg.name)
+                       FROM json_each(CASE WHEN json_valid(pp.console_group_ids) THEN pp.console_group_ids ELSE '[]' END) j
+                       JOIN console_groups cg ON cg.id = j.value
+                      LIMIT 1), ''),
+           'libre', pp.switch_port
+      FROM physical_postes pp
+     WHERE NOT EXISTS (SELECT 1 FROM postes p WHERE p.numero = pp.numero)
+"""
+
+EVENTS_DDL = """
+    CREATE TABLE IF NOT EXISTS events (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        station_id TEXT NOT NULL,
+        type TEXT NOT NULL,
+        poste_id INTEGER NOT NULL,
+        payload TEXT,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+"""
+EVENTS_RETENTION_DAYS = 2
+
+_RESTORE_SQL = """
+    SELECT p.id, p.numero, p.nom, p.type_console, p.statut, p.switch_port,
+           s.id, s.debut, s.fin, s.montant_paye, c.nom
+      FROM postes p
+      LEFT JOIN sessions s
+             ON s.id = (SELECT MAX(s2.id) FROM sessions s2
+                         WHERE s2.poste_id = p.id AND s2.statut = 'en_cours')
+      LEFT JOIN clients c ON c.id = s.client_id
+     ORDER BY p.numero
+"""
+
+
+def format_ts(dt: datetime) -> str:
+    """Horodatage local arrondi à la seconde la plus proche (reprise à ±0,5 s près)."""
+    return (dt + timedelta(microseconds=500000)).strftime(TS_FORMAT)
+
+
+def parse_ts(value: Any) -> Optional[datetime]:
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(str(value))
+    except ValueError:
+        return None
+
+
+class SessionStore:
+    def __init__(self, db, flush_interval: float = 0.5, clock=time.monotonic, wall_clock=datetime.now,
+                 station_id: Optional[str] = None, operator_id: Any = None):
+        self.db = db
+        self.operator_id = operator_id
+        self.station_id = station_id or uuid.uuid4().hex[:12]
+        self.flush_interval = flush_interval
+        self.clock = clock
+        self.wall_clock = wall_clock
+        self._cond = threading.Condition(threading.Lock())
+        self._pending: List[Dict[str, Any]] = []
+        self._thread: Optional[threading.Thread] = None
+        self._running = False
+        # état propre au thread d'écriture (ou à restore(), avant le démarrage du thread)
+        self._open_sessions: Dict[int, int] = {}     # poste_id -> sessions.id
+        self._client_ids: Dict[str, int] = {}
+        self._recette_day: Optional[date] = None
+        self._recette = 0
+        self.flush_count = 0
+        self.last_error: Optional[Exception] = None
+        self.last_event_id = 0      # dernier évènement déjà reflété par restore()
+
+    # ---------------- Schéma / reprise ----------------
+    def ensure_schema(self, cur) -> None:
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_sessions_poste_statut ON sessions(poste_id, statut)")
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_sessions_debut ON sessions(debut)")
+        cur.execute(EVENTS_DDL)
+        ensure_revenue_schema(cur)
+
+    def restore(self) -> List[Dict[str, Any]]:
+        """
+        Retourne les postes (format SalleState.load_postes) avec leurs sessions ouvertes reprises.
+        Liste vide si aucun poste n'est configuré en base.
+        """
+        now = self.wall_clock()
+        postes, expired, released = [], [], []
+        with self.db.get_connection() as conn:
+            cur = conn.cursor()
+            self.ensure_schema(cur)
+            cur.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'physical_postes'")
+            if cur.fetchone():
+                ensure_relational_schema(cur)
+                cur.execute(_SYNC_POSTES_SQL)
+            cur.execute("DELETE FROM events WHERE created_at < datetime('now', ?)", (f"-{EVENTS_RETENTION_DAYS} days",))
+            cur.execute("SELECT COALESCE(MAX(id), 0) FROM events")
+            self.last_event_id = cur.fetchone()[0]
+            cur.execute(_RESTORE_SQL)
+            for pid, numero, nom, type_console, statut, switch_port, sid, debut, fin, montant, client_nom in cur.fetchall():
+                poste = {"id": pid, "numero": numero, "nom": nom, "type_console": type_console or "",
+                         "statut": statut or "libre", "switch_port": switch_port}
+                fin_dt = parse_ts(fin)
+                if sid is not None and fin_dt is not None and fin_dt > now:
+                    poste["statut"] = "occupe"
+                    poste["client_nom"] = client_nom or ANONYMOUS_CLIENT
+                    poste["montant_paye"] = montant or 0
+                    poste["remaining_seconds"] = (fin_dt - now).total_seconds()
+                    self._open_sessions[pid] = sid
+                else:
+                    if sid is not None:
+                        expired.append((sid,))
+                    if poste["statut"] == "occupe":
+                        poste["statut"] = "libre"
+                        released.append((pid,))
+                postes.append(poste)
+            if expired:
+                cur.executemany("UPDATE sessions SET statut = 'expire' WHERE id = ?", expired)
+            if released:
+                cur.executemany("UPDATE postes SET statut = 'libre' WHERE id = ?", released)
+            self._recette_day = now.date()
+            self._recette = get_total(cur, now.date().isoformat(), "day")
+            conn.commit()
+        conn.close()
+        return postes
+
+    def recette_du_jour(self) -> int:
+        with self._cond:
+            if self._recette_day != self.wall_clock().date():
+                return 0
+            return self._recette
+
+    # ---------------- Écriture différée ----------------
+    def record(self, event: Dict[str, Any]) -> None:
+        """
+        Listener SalleState (appelé sous le verrou de l'état) : ne fait que convertir les
+        échéances monotones en heures absolues et empiler l'évènement.
+        """
+        if event["type"] not in _PERSISTED_EVENTS:
+            return
+        snap = event["poste"]
+        now = self.wall_clock()
+        if event.get("remote"):
+            # déjà écrit par la station d'origine : on suit seulement la session ouverte du poste
+            op = {"type": "remote", "poste_id": event["poste_id"], "statut": snap["statut"],
+                  "session_id": event.get("session_id")}
+            with self._cond:
+                self._add_recette_locked(now, int(event.get("paid") or 0))
+                self._pending.append(op)
+                self._cond.notify()
+            return
+        op = {"type": event["type"], "poste_id": event["poste_id"], "statut": snap["statut"], "at": now}
+        if event["type"] in (EVENT_SESSION_STARTED, EVENT_SESSION_EXTENDED):
+            op["fin"] = now + timedelta(seconds=max(0.0, snap["fin_monotonic"] - self.clock()))
+            op["client_nom"] = snap.get("client_nom") or ANONYMOUS_CLIENT
+            op["montant"] = int(snap.get("montant_paye") or 0)
+            op["paid"] = int(event.get("paid") or 0)
+            op["console"] = snap.get("type_console") or ""
+        if event["type"] == EVENT_SESSION_EXTENDED:
+            op["added_seconds"] = int(event.get("added_seconds") or 0)
+        with self._cond:
+            self._add_recette_locked(now, op.get("paid", 0))
+            self._pending.append(op)
+            self._cond.notify()
+
+    def _add_recette_locked(self, now: datetime, paid: int) -> None:
+        if self._recette_day != now.date():
+            self._recette_day, self._recette = now.date(), 0
+        self._recette += paid
+
+    def start(self) -> None:
+        with self._cond:
+            if self._running:
+                return
+            self._running = True
+        self._thread = threading.Thread(target=self._run, name="SessionStoreWriter", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 5.0) -> None:
+        """Arrête le thread et écrit le dernier lot."""
+        with self._cond:
+            self._running = False
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+        self.flush()
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                while self._running and not self._pending:
+                    self._cond.wait()
+                if not self._running:
+                    return
+            # laisse le lot se remplir : une transaction pour tous les évènements de la fenêtre
+            time.sleep(self.flush_interval)
+            self.flush()
+
+    def flush(self) -> int:
+        """Écrit les évènements en attente dans une seule transaction ; retourne leur nombre."""
+        with self._cond:
+            batch, self._pending = self._pending, []
+        if not batch:
+            return 0
+        try:
+            with self.db.get_connection() as conn:
+                cur = conn.cursor()
+                for op in batch:
+                    self._apply(cur, op)
+                if any(op["type"] in CLOSING_EVENTS for op in batch):
+                    catch_up_dashboard(cur)
+                conn.commit()
+            conn.close()
+            self.flush_count += 1
+        except Exception as e:
+            # on remet le lot en tête pour le prochain essai
+            self.last_error = e
+            print("[DEBUG] SessionStore.flush error:", e)
+            with self._cond:
+                self._pending = batch + self._pending
+            return 0
+        return len(batch)
+
+    def _client_id(self, cur, nom: str) -> int:
+        cid = self._client_ids.get(nom)
+        if cid is None:
+            cur.execute("SELECT id FROM clients WHERE nom = ? ORDER BY id LIMIT 1", (nom,))
+            row = cur.fetchone()
+            if row:
+                cid = row[0]
+            else:
+                cur.execute("INSERT INTO clients (nom) VALUES (?)", (nom,))
+                cid = cur.lastrowid
+            self._client_ids[nom] = cid
+        return cid
+
+    def _close_session(self, cur, poste_id: int, statut: str, fin: Optional[datetime]) -> None:
+        sid = self._open_sessions.pop(poste_id, None)
+        if sid is None:
+            return
+        if fin is None:
+            cur.execute("UPDATE sessions SET statut = ? WHERE id = ?", (statut, sid))
+        else:
+            cur.execute("UPDATE sessions SET statut = ?, fin = ? WHERE id = ?", (statut, format_ts(fin), sid))
+
+    def _apply(self, cur, op: Dict[str, Any]) -> None:
+        pid, kind = op["poste_id"], op["type"]
+        if kind == "remote":
+            if op["statut"] == "occupe" and op.get("session_id"):
+                self._open_sessions[pid] = op["session_id"]
+            elif op["statut"] != "occupe":
+                self._open_sessions.pop(pid, None)
+            return
+        if kind == EVENT_SESSION_STARTED:
+            # une session encore ouverte sur ce poste (lot précédent perdu) est close d'abord
+            self._close_session(cur, pid, "termine", op["at"])
+            duree = max(1, int(round((op["fin"] - op["at"]).total_seconds() / 60.0)))
+            cur.execute(
+                "INSERT INTO sessions (client_id, poste_id, debut, fin, duree_payee, montant_paye, statut) "
+                "VALUES (?, ?, ?, ?, ?, ?, 'en_cours')",
+                (self._client_id(cur, op["client_nom"]), pid, format_ts(op["at"]), format_ts(op["fin"]), duree, op["montant"])
+            )
+            self._open_sessions[pid] = cur.lastrowid
+            record_payment(cur, op["at"], op["paid"], op["console"], self.operator_id)
+        elif kind == EVENT_SESSION_EXTENDED:
+            sid = self._open_sessions.get(pid)
+            if sid is not None:
+                cur.execute(
+                    "UPDATE sessions SET fin = ?, duree_payee = duree_payee + ?, montant_paye = montant_paye + ? WHERE id = ?",
+                    (format_ts(op["fin"]), int(round(op["added_seconds"] / 60.0)), op["paid"], sid)
+                )
+            record_payment(cur, op["at"], op["paid"], op["console"], self.operator_id)
+        elif kind == EVENT_SESSION_STOPPED:
+            self._close_session(cur, pid, "termine", op["at"])
+        elif kind == EVENT_SESSION_EXPIRED:
+            # fin = échéance déjà enregistrée
+            self._close_session(cur, pid, "expire", None)
+        elif kind == EVENT_STATUT_CHANGED:
+            self._close_session(cur, pid, "termine", op["at"])
+        cur.execute("UPDATE postes SET statut = ? WHERE id = ?", (op["statut"], pid))
+        # état absolu du poste pour les autres stations (app/station_sync.py)
+        payload = {"statut": op["statut"], "session_id": self._open_sessions.get(pid)}
+        if "fin" in op:
+            payload["fin"] = format_ts(op["fin"])
+        if kind in (EVENT_SESSION_STARTED, EVENT_SESSION_EXTENDED):
+            payload["client_nom"], payload["montant_paye"] = op["client_nom"], op["montant"]
+            payload["paid"] = op["paid"]
+        cur.execute(
+            "INSERT INTO events (station_id, type, poste_id, payload) VALUES (?, ?, ?, ?)",
+            (self.station_id, kind, pid, json.dumps(payload))
+        )
@@ -0,0 +1,59 @@
+# app/startup_timer.py
+"""
+Chronométrage du démarrage d'une interface (rapport "où est passé le temps").
+
+- mark(label) : durée écoulée depuis le repère précédent.
+- measure(label) : context manager pour une étape isolée (ex. construction d'un onglet à la demande).
+- report() : texte multi-lignes (étape, durée, cumul) ; total() : ms depuis la création.
+
+Usage:
+    from app.startup_timer import StartupTimer
+    timer = StartupTimer("Admin")
+    ...
+    timer.mark("widgets")
+    with timer.measure("onglet Utilisateurs"):
+        build_users_tab()
+    print(timer.report())
+"""
+
+import time
+from contextlib import contextmanager
+from typing import Callable, List, Tuple
+
+
+class StartupTimer:
+    def __init__(self, name: str, clock: Callable[[], float] = time.perf_counter):
+        self.name = name
+        self.clock = clock
+        self.started = clock()
+        self._last = self.started
+        self.steps: List[Tuple[str, float, float]] = []    # (étape, durée ms, cumul ms)
+
+    def _add(self, label: str, duration_s: float) -> float:
+        ms = duration_s * 1000.0
+        self.steps.append((label, ms, self.total()))
+        return ms
+
+    def mark(self, label: str) -> float:
+        """Enregistre la durée depuis le repère précédent ; retourne des ms."""
+        now = self.clock()
+        duration, self._last = now - self._last, now
+        return self._add(label, duration)
+
+    @contextmanager
+    def measure(self, label: str):
+        start = self.clock()
+        try:
+            yield
+        finally:
+            self._add(label, self.clock() - start)
+            self._last = self.clock()
+
+    def total(self) -> float:
+        return (self.clock() - self.started) * 1000.0
+
+    def report(self) -> str:
+        lines = [f"[{self.name}] démarrage : {self.total():.1f} ms"]
+        for label, ms, cumul in self.steps:
+            lines.append(f"  {label:<34} {ms:8.1f} ms   (à {cumul:8.1f} ms)")
+        return "\n".join(lines)
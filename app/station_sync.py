@@ -0,0 +1,132 @@
+# app/station_sync.py
+"""
+Synchronisation entre postes gérants partageant la même base SQLite (réseau local).
+
+Fonctionnalités :
+- Lecture du flux append-only `events` (écrit par SessionStore dans la transaction de chaque lot).
+- Sondage peu coûteux : PRAGMA data_version sur une connexion dédiée et persistante ; la requête
+  `WHERE id > last_seen` n'est exécutée que si une autre connexion a modifié la base.
+- Deltas appliqués à SalleState.apply_remote (état absolu du poste : statut, client, échéance
+  en heure absolue), sans rechargement complet ; les évènements de la station locale sont ignorés.
+- Convergence < 1 s avec l'intervalle par défaut (0,25 s).
+
+Usage:
+    from app.station_sync import StationSync
+    sync = StationSync(db, state, station_id=store.station_id, last_event_id=store.last_event_id)
+    sync.start()
+    ...
+    sync.stop()
+"""
+
+import json
+import threading
+from datetime import datetime
+from typing import Any, Callable, Dict, Optional
+
+from app.salle_state import (
+    EVENT_SESSION_STARTED, EVENT_SESSION_STOPPED, EVENT_SESSION_EXTENDED,
+    EVENT_SESSION_EXPIRED, EVENT_STATUT_CHANGED,
+)
+from app.session_store import parse_ts
+
+_SYNCED_EVENTS = (
+    EVENT_SESSION_STARTED, EVENT_SESSION_STOPPED, EVENT_SESSION_EXTENDED,
+    EVENT_SESSION_EXPIRED, EVENT_STATUT_CHANGED,
+)
+
+
+class StationSync:
+    def __init__(self, db, state, station_id: str, last_event_id: int = 0, interval: float = 0.25,
+                 wall_clock: Callable[[], datetime] = datetime.now):
+        self.db = db
+        self.state = state
+        self.station_id = station_id
+        self.last_event_id = last_event_id
+        self.interval = interval
+        self.wall_clock = wall_clock
+        self._conn = None
+        self._data_version = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.polls = 0
+        self.queries = 0
+        self.applied = 0
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="StationSync", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 2.0) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def _run(self) -> None:
+        try:
+            while not self._stop.wait(self.interval):
+                try:
+                    self.poll()
+                except Exception as e:
+                    print("[DEBUG] StationSync.poll error:", e)
+                    self._close()
+        finally:
+            self._close()
+
+    def _close(self) -> None:
+        if self._conn is not None:
+            try:
+                self._conn.close()
+            except Exception:
+                pass
+            self._conn = None
+            self._data_version = None
+
+    def poll(self) -> int:
+        """Un tour de sondage ; retourne le nombre d'évènements distants appliqués."""
+        if self._conn is None:
+            # data_version n'est significatif que sur une connexion qui reste ouverte
+            self._conn = self.db.get_connection()
+        self.polls += 1
+        version = self._conn.execute("PRAGMA data_version").fetchone()[0]
+        if version == self._data_version:
+            return 0
+        self._data_version = version
+        self.queries += 1
+        rows = self._conn.execute(
+            "SELECT id, station_id, type, poste_id, payload FROM events WHERE id > ? ORDER BY id",
+            (self.last_event_id,)
+        ).fetchall()
+        applied = 0
+        for event_id, station_id, event_type, poste_id, payload in rows:
+            self.last_event_id = event_id
+            if station_id == self.station_id or event_type not in _SYNCED_EVENTS:
+                continue
+            if self._apply(event_type, poste_id, payload):
+                applied += 1
+        self.applied += applied
+        return applied
+
+    def _apply(self, event_type: str, poste_id: int, payload: Optional[str]) -> bool:
+        try:
+            data: Dict[str, Any] = json.loads(payload) if payload else {}
+        except ValueError:
+            return False
+        statut = data.get("statut")
+        remaining = None
+        if statut == "occupe":
+            fin = parse_ts(data.get("fin"))
+            if fin is None:
+                return False
+            remaining = (fin - self.wall_clock()).total_seconds()
+            if remaining <= 0:
+                statut, event_type = "libre", EVENT_SESSION_EXPIRED
+        snap = self.state.apply_remote(
+            poste_id, event_type, statut,
+            client_nom=data.get("client_nom", ""), montant_paye=data.get("montant_paye", 0),
+            remaining=remaining, session_id=data.get("session_id"), paid=int(data.get("paid") or 0),
+        )
+        return snap is not None
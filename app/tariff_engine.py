@@ -0,0 +1,246 @@
+# app/tariff_engine.py
+"""
+Moteur de tarification : grilles des groupes de consoles (table group_tariffs) compilées
+en tables de paliers triées.
+
+Fonctionnalités :
+- TariffTable.compile(entries) : [{"montant": 100, "minutes": 5}, ...] -> table des meilleurs
+  temps par montant (programmation dynamique "sac à dos non borné" au pas du PGCD des montants),
+  donc un montant situé entre deux paliers est décomposé au mieux (ex: 300 = 200 + 100).
+- quote_minutes(montant) / quote_amount(minutes) : recherche dichotomique (bisect) dans la table ;
+  au-delà du plafond compilé, on ajoute des paliers au meilleur rapport minutes/FCFA.
+- decompose(montant) : détail des paliers utilisés (affichage / reçu).
+- TariffEngine : une table par groupe, compilée une seule fois ; reload() relit les groupes et
+  leurs grilles via le GroupCatalog partagé (une requête) et ne recompile que les grilles
+  modifiées. Repli sur TARIFS_DEFAULT (config/settings.py) puis sur le tarif standard
+  (config 'standard_tariff_fcfa_per_6min').
+
+Usage:
+    from app.tariff_engine import TariffEngine
+    engine = TariffEngine(db)
+    table = engine.table_for("PS4")
+    table.quote_minutes(250)      # minutes pour 250 FCFA
+    table.quote_amount(30)        # montant minimal pour 30 minutes
+"""
+
+import json
+from bisect import bisect_left, bisect_right
+from functools import reduce
+from math import gcd
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from app.console_names import normalize_console_name
+from app.group_catalog import GroupCatalog
+from app.relational_schema import ensure_relational_schema
+
+try:
+    from config.settings import TARIFS_DEFAULT
+except Exception:
+    TARIFS_DEFAULT = {}
+
+DEFAULT_STANDARD_FCFA_PER_6MIN = 50
+MIN_COMPILED_AMOUNT = 10000    # plafond minimal de la table compilée (FCFA)
+
+
+def parse_tariff_entries(raw: Any) -> List[Tuple[int, int]]:
+    """JSON / liste de {"montant", "minutes"} (ou dict {montant: minutes}) -> [(montant, minutes)] valides."""
+    if raw is None:
+        return []
+    if isinstance(raw, str):
+        try:
+            raw = json.loads(raw)
+        except (ValueError, TypeError):
+            return []
+    if isinstance(raw, dict):
+        raw = [{"montant": k, "minutes": v} for k, v in raw.items()]
+    entries = []
+    for item in raw or []:
+        try:
+            montant, minutes = int(item["montant"]), int(item["minutes"])
+        except (KeyError, TypeError, ValueError):
+            continue
+        if montant > 0 and minutes > 0:
+            entries.append((montant, minutes))
+    return entries
+
+
+class TariffTable:
+    def __init__(self, entries: Iterable[Tuple[int, int]], label: str = "", source: str = ""):
+        # pour un même montant on garde le meilleur temps
+        best: Dict[int, int] = {}
+        for montant, minutes in entries:
+            best[montant] = max(minutes, best.get(montant, 0))
+        self.tiers: List[Tuple[int, int]] = sorted(best.items())
+        self.label = label
+        self.source = source
+        if not self.tiers:
+            raise ValueError("grille tarifaire vide")
+        self.step = reduce(gcd, (m for m, _ in self.tiers))
+        self.base_montant, self.base_minutes = self.tiers[0]
+        # palier au meilleur rapport minutes / FCFA (utilisé au-delà du plafond)
+        self.best_tier = max(self.tiers, key=lambda t: (t[1] / t[0], t[0]))
+        self.cap = max(MIN_COMPILED_AMOUNT, 4 * self.tiers[-1][0])
+        self.cap -= self.cap % self.step
+        self._compile()
+
+    def _compile(self) -> None:
+        n = self.cap // self.step
+        units = [(m // self.step, mins) for m, mins in self.tiers]
+        best = [0] * (n + 1)
+        choice = [-1] * (n + 1)
+        for a in range(1, n + 1):
+            # par défaut : même temps qu'au montant inférieur (reste non dépensé)
+            best[a], choice[a] = best[a - 1], -1
+            for idx, (u, mins) in enumerate(units):
+                if u <= a and best[a - u] + mins > best[a]:
+                    best[a], choice[a] = best[a - u] + mins, idx
+        self.amounts = [a * self.step for a in range(n + 1)]
+        self.minutes = best           # non décroissant : recherche dichotomique possible
+        self._choice = choice
+
+    # ---------------- Devis ----------------
+    def _split_overflow(self, montant: int) -> Tuple[int, int]:
+        """(nombre de paliers 'best_tier' ajoutés, reste <= cap)."""
+        if montant <= self.cap:
+            return 0, montant
+        bm = self.best_tier[0]
+        k = -(-(montant - self.cap) // bm)
+        return k, montant - k * bm
+
+    def quote_minutes(self, montant: int) -> int:
+        """Minutes obtenues pour `montant` FCFA (reste inférieur au pas : prorata du plus petit palier)."""
+        if montant <= 0:
+            return 0
+        k, rest = self._split_overflow(int(montant))
+        i = bisect_right(self.amounts, rest) - 1
+        minutes = k * self.best_tier[1] + self.minutes[i]
+        leftover = rest - self.amounts[i]
+        if leftover > 0:
+            minutes += leftover * self.base_minutes // self.base_montant
+        return max(minutes, 1)
+
+    def quote_amount(self, minutes: int) -> int:
+        """Montant minimal (multiple du pas) donnant au moins `minutes` minutes."""
+        if minutes <= 0:
+            return 0
+        minutes = int(minutes)
+        k = 0
+        if minutes > self.minutes[-1]:
+            bm, bmin = self.best_tier
+            k = -(-(minutes - self.minutes[-1]) // bmin)
+            minutes -= k * bmin
+            if minutes <= 0:
+                return k * bm
+        i = bisect_left(self.minutes, minutes)
+        return k * self.best_tier[0] + self.amounts[i]
+
+    def decompose(self, montant: int) -> List[Dict[str, int]]:
+        """Paliers utilisés pour `montant` : [{"montant", "minutes", "count"}] (hors prorata du reste)."""
+        k, rest = self._split_overflow(int(montant))
+        counts: Dict[Tuple[int, int], int] = {}
+        if k:
+            counts[self.best_tier] = k
+        a = bisect_right(self.amounts, max(0, rest)) - 1
+        while a > 0:
+            idx = self._choice[a]
+            if idx < 0:
+                a -= 1
+                continue
+            tier = self.tiers[idx]
+            counts[tier] = counts.get(tier, 0) + 1
+            a -= tier[0] // self.step
+        return [{"montant": m, "minutes": mins, "count": c} for (m, mins), c in sorted(counts.items())]
+
+    def describe(self, limit: int = 4) -> str:
+        parts = [f"{m}F={mins}min" for m, mins in self.tiers[:limit]]
+        if len(self.tiers) > limit:
+            parts.append("…")
+        return ", ".join(parts)
+
+
+class TariffEngine:
+    def __init__(self, db, catalog: Optional[GroupCatalog] = None):
+        self.db = db
+        self.catalog = catalog or GroupCatalog(db)
+        self._tables: Dict[str, TariffTable] = {}
+        self._fingerprints: Dict[str, str] = {}
+        self._standard: Optional[TariffTable] = None
+        self._standard_fcfa = None
+        self._loaded = False
+        self.compilations = 0
+
+    def reload(self) -> None:
+        """Relit les groupes et leurs grilles (une requête) ; seules les grilles modifiées sont recompilées."""
+        rows, std = [], None
+        try:
+            with self.db.get_connection() as conn:
+                cur = conn.cursor()
+                cur.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name = 'console_groups'")
+                if cur.fetchone():
+                    ensure_relational_schema(cur)
+                    rows = [(g["name"], g["tariffs"]) for g in self.catalog.refresh(cur)]
+                cur.execute("SELECT valeur FROM config WHERE cle = 'standard_tariff_fcfa_per_6min'")
+                row = cur.fetchone()
+                std = row[0] if row else None
+            conn.close()
+        except Exception as e:
+            print("[DEBUG] TariffEngine.reload error:", e)
+        seen = set()
+        for name, raw in rows:
+            key = normalize_console_name(name or "")
+            if not key:
+                continue
+            seen.add(key)
+            fingerprint = raw if isinstance(raw, str) else json.dumps(raw)
+            if self._fingerprints.get(key) == fingerprint and key in self._tables:
+                continue
+            entries = parse_tariff_entries(raw)
+            self._fingerprints[key] = fingerprint
+            if entries:
+                self._tables[key] = TariffTable(entries, label=f"Grille {name}", source="group_tariffs")
+                self.compilations += 1
+            else:
+                self._tables.pop(key, None)
+        for key in [k for k in self._tables if k not in seen and not k.startswith("_default:")]:
+            self._tables.pop(key, None)
+            self._fingerprints.pop(key, None)
+        try:
+            std_fcfa = int(std) if std else DEFAULT_STANDARD_FCFA_PER_6MIN
+        except ValueError:
+            std_fcfa = DEFAULT_STANDARD_FCFA_PER_6MIN
+        if std_fcfa <= 0:
+            std_fcfa = DEFAULT_STANDARD_FCFA_PER_6MIN
+        if std_fcfa != self._standard_fcfa:
+            self._standard_fcfa = std_fcfa
+            self._standard = TariffTable([(std_fcfa, 6)], label=f"Standard - {std_fcfa} FCFA = 6 min", source="config")
+            self.compilations += 1
+        self._loaded = True
+
+    def invalidate(self, console: Optional[str] = None) -> None:
+        """Oublie une grille (ou toutes) : recompilée au prochain reload()."""
+        if console is None:
+            self._fingerprints.clear()
+            self._loaded = False
+        else:
+            self._fingerprints.pop(normalize_console_name(console), None)
+
+    def table_for(self, console: str) -> TariffTable:
+        """Grille du groupe de la console, sinon TARIFS_DEFAULT, sinon tarif standard."""
+        if not self._loaded:
+            self.reload()
+        key = normalize_console_name(console or "")
+        table = self._tables.get(key)
+        if table is not None:
+            return table
+        default_key = "_default:" + key
+        table = self._tables.get(default_key)
+        if table is None and TARIFS_DEFAULT.get(key):
+            table = TariffTable(parse_tariff_entries(TARIFS_DEFAULT[key]), label=f"Grille par défaut {key}", source="settings")
+            self._tables[default_key] = table
+            self.compilations += 1
+        return table or self.standard_table()
+
+    def standard_table(self) -> TariffTable:
+        if not self._loaded:
+            self.reload()
+        return self._standard
@@ -23,6 +23,7 @@ import json
 import sqlite3
 import os
 import math
+import uuid
 from typing import Optional, List, Dict, Any
 
 # Try to import project's DatabaseManager and BonusManager; if unavailable, use fallbacks.
@@ -36,6 +37,60 @@ try:
 except Exception:
     BonusManager = None
 
+from app.fidelity_helpers import TICKETS_FIDELITE_DDL, FIDELITY_GRANTS_DDL, migrate_to_canonical_schema, insert_grant_if_absent
+from app.config_store import BUMP_REVISION_SQL
+from app.paged_query import PagedQuery
+
+TICKET_COLUMNS = ("id", "user_id", "ticket_date", "created_at", "source", "session_id", "amount_fcfa",
+                  "sequence_id", "expired", "notes")
+GRANT_COLUMNS = ("id", "user_id", "grant_type", "tickets_count", "minutes_awarded", "created_at", "expiry_at",
+                 "source_reference", "used", "notes")
+
+
+# ----------- Barèmes de récompense (clés config) -----------
+REWARD_CONFIG_KEYS = (
+    "fidelity_rewards_7d",
+    "fidelity_rewards_14d",
+    "fidelity_jf30_min_tickets",
+    "fidelity_jf30_per_ticket_minutes",
+    "fidelity_jf30_expiry_days",
+)
+
+
+def parse_reward_config(raw: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Normalise les valeurs brutes de la table config (chaînes JSON / entiers en texte)
+    en un dict exploitable par _process_rewards_for_user et par le simulateur :
+        {"rewards_7d": [...], "rewards_14d": [...], "jf30_min_tickets": int,
+         "jf30_per_ticket_minutes": int, "jf30_expiry_days": int}
+    Les valeurs déjà décodées (listes, int) sont acceptées telles quelles.
+    """
+    def _json_list(value):
+        if value is None:
+            return []
+        if isinstance(value, (list, tuple)):
+            return list(value)
+        try:
+            parsed = json.loads(value)
+            return parsed if isinstance(parsed, list) else []
+        except Exception:
+            return []
+
+    try:
+        threshold30 = int(raw.get("fidelity_jf30_min_tickets") or 12)
+        per_ticket_min = int(raw.get("fidelity_jf30_per_ticket_minutes") or 2)
+        expiry_days = int(raw.get("fidelity_jf30_expiry_days") or 10)
+    except Exception:
+        threshold30, per_ticket_min, expiry_days = 12, 2, 10
+
+    return {
+        "rewards_7d": _json_list(raw.get("fidelity_rewards_7d")),
+        "rewards_14d": _json_list(raw.get("fidelity_rewards_14d")),
+        "jf30_min_tickets": threshold30,
+        "jf30_per_ticket_minutes": per_ticket_min,
+        "jf30_expiry_days": expiry_days,
+    }
+
 
 # ----------- Fallback simple DB manager if project's DatabaseManager is absent -----------
 class _SimpleDBManager:
@@ -103,20 +158,6 @@ class TicketsManager:
         Crée les tables nécessaires (tickets_fidelite, fidelity_sequences, fidelity_reward_grants)
         et insère les configurations par défaut dans la table 'config' (si elle existe ou sera créée).
         """
-        create_tickets = """
-        CREATE TABLE IF NOT EXISTS tickets_fidelite (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            user_id INTEGER NOT NULL,
-            ticket_date TEXT NOT NULL,
-            created_at TEXT NOT NULL,
-            source TEXT NOT NULL,
-            session_id TEXT,
-            amount_fcfa INTEGER,
-            sequence_id INTEGER,
-            expired INTEGER DEFAULT 0,
-            notes TEXT
-        );
-        """
         create_seq = """
         CREATE TABLE IF NOT EXISTS fidelity_sequences (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -127,22 +168,13 @@ class TicketsManager:
             updated_at TEXT NOT NULL
         );
         """
-        create_grants = """
-        CREATE TABLE IF NOT EXISTS fidelity_reward_grants (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            user_id INTEGER NOT NULL,
-            grant_type TEXT NOT NULL,
-            tickets_count INTEGER NOT NULL,
-            minutes_awarded INTEGER NOT NULL,
-            created_at TEXT NOT NULL,
-            expiry_at TEXT,
-            source_reference TEXT,
-            used INTEGER DEFAULT 0,
-            notes TEXT
-        );
-        """
         idx_tickets = "CREATE INDEX IF NOT EXISTS idx_tickets_user_date ON tickets_fidelite(user_id, ticket_date);"
         idx_grants = "CREATE INDEX IF NOT EXISTS idx_reward_user ON fidelity_reward_grants(user_id);"
+        # listes paginées par curseur (created_at, id)
+        idx_listing = (
+            "CREATE INDEX IF NOT EXISTS idx_tickets_created ON tickets_fidelite(created_at, id)",
+            "CREATE INDEX IF NOT EXISTS idx_reward_created ON fidelity_reward_grants(created_at, id)",
+        )
         default_configs = {
             "fidelity_enabled": "1",
             "fidelity_threshold_fcfa": "100",
@@ -160,11 +192,15 @@ class TicketsManager:
                 cur = conn.cursor()
                 # ensure config table exists
                 cur.execute("CREATE TABLE IF NOT EXISTS config (cle TEXT PRIMARY KEY, valeur TEXT)")
-                cur.execute(create_tickets)
+                # converge les tables legacy (001_create_fidelity_tables.sql) vers le schéma canonique
+                migrate_to_canonical_schema(conn)
+                cur.execute(TICKETS_FIDELITE_DDL)
                 cur.execute(create_seq)
-                cur.execute(create_grants)
+                cur.execute(FIDELITY_GRANTS_DDL)
                 cur.execute(idx_tickets)
                 cur.execute(idx_grants)
+                for ddl in idx_listing:
+                    cur.execute(ddl)
                 # insert defaults if absent
                 for k, v in default_configs.items():
                     cur.execute("SELECT valeur FROM config WHERE cle = ?", (k,))
@@ -192,6 +228,7 @@ class TicketsManager:
         with self.db.get_connection() as conn:
             cur = conn.cursor()
             cur.execute("INSERT OR REPLACE INTO config (cle, valeur) VALUES (?, ?)", (key, value))
+            cur.execute(BUMP_REVISION_SQL)     # caches ConfigStore des autres processus
             conn.commit()
 
     def _get_config_json(self, key: str, default=None):
@@ -203,6 +240,14 @@ class TicketsManager:
         except Exception:
             return default if default is not None else []
 
+    def get_reward_config(self) -> Dict[str, Any]:
+        """
+        Retourne les barèmes de récompense (7j, 14j, JF30) lus dans la table config,
+        sous la forme normalisée produite par parse_reward_config().
+        """
+        raw = {k: self._get_config(k, None) for k in REWARD_CONFIG_KEYS}
+        return parse_reward_config(raw)
+
     # ---------------- Date util ----------------
     def _today_local_str(self) -> str:
         """Return local date string 'YYYY-MM-DD' using local_tz if possible."""
@@ -316,8 +361,10 @@ class TicketsManager:
             start = end - timedelta(days=days - 1)
             return sum(1 for d in ticket_dates if start <= datetime.fromisoformat(d).date() <= end)
 
+        reward_cfg = self.get_reward_config()
+
         # ---- 7-day reward ----
-        rewards_7d = self._get_config_json("fidelity_rewards_7d", [])
+        rewards_7d = reward_cfg["rewards_7d"]
         # consider last ticket_date as window end
         last_date = ticket_dates[-1]
         cnt7 = count_in_window(last_date, 7)
@@ -333,14 +380,10 @@ class TicketsManager:
             with self.db.get_connection() as conn:
                 cur = conn.cursor()
                 src_ref = f"7d_window_end:{last_date}"
-                cur.execute("SELECT COUNT(1) FROM fidelity_reward_grants WHERE user_id = ? AND grant_type = '7d' AND source_reference = ?", (user_id, src_ref))
-                row = cur.fetchone()
-                exists = int(row[0]) if row else 0
-                if exists == 0:
-                    now = datetime.utcnow().isoformat()
-                    cur.execute("INSERT INTO fidelity_reward_grants (user_id, grant_type, tickets_count, minutes_awarded, created_at, expiry_at, source_reference, used, notes) VALUES (?, ?, ?, ?, ?, ?, ?, 0, ?)",
-                                (user_id, '7d', tickets_req, minutes, now, None, src_ref, f"7d reward for {tickets_req} tickets"))
-                    conn.commit()
+                now = datetime.utcnow().isoformat()
+                grant_id = insert_grant_if_absent(cur, user_id, '7d', tickets_req, minutes, now, None, src_ref, f"7d reward for {tickets_req} tickets")
+                conn.commit()
+                if grant_id is not None:
                     # credit via BonusManager if available
                     try:
                         if self.bonus_manager:
@@ -349,13 +392,12 @@ class TicketsManager:
                         pass
 
         # ---- 14-day extension rewards ----
-        rewards_14d = self._get_config_json("fidelity_rewards_14d", [])
+        rewards_14d = reward_cfg["rewards_14d"]
         # Check if user has at least one 7d grant ever
         with self.db.get_connection() as conn:
             cur = conn.cursor()
-            cur.execute("SELECT COUNT(1) FROM fidelity_reward_grants WHERE user_id = ? AND grant_type = '7d'", (user_id,))
-            row = cur.fetchone()
-            has_7d = int(row[0]) if row else 0
+            cur.execute("SELECT 1 FROM fidelity_reward_grants WHERE user_id = ? AND grant_type = '7d' LIMIT 1", (user_id,))
+            has_7d = cur.fetchone() is not None
 
         if has_7d:
             last_date_for_14 = ticket_dates[-1]
@@ -368,14 +410,10 @@ class TicketsManager:
                     src_ref = f"14d_window_end:{last_date_for_14}:req{tickets_req}"
                     with self.db.get_connection() as conn:
                         cur = conn.cursor()
-                        cur.execute("SELECT COUNT(1) FROM fidelity_reward_grants WHERE user_id = ? AND grant_type = '14d' AND source_reference = ?", (user_id, src_ref))
-                        row = cur.fetchone()
-                        exists = int(row[0]) if row else 0
-                        if exists == 0:
-                            now = datetime.utcnow().isoformat()
-                            cur.execute("INSERT INTO fidelity_reward_grants (user_id, grant_type, tickets_count, minutes_awarded, created_at, expiry_at, source_reference, used, notes) VALUES (?, ?, ?, ?, ?, ?, ?, 0, ?)",
-                                        (user_id, '14d', tickets_req, add_minutes, now, None, src_ref, f"14d add {add_minutes} min for {tickets_req} tickets"))
-                            conn.commit()
+                        now = datetime.utcnow().isoformat()
+                        grant_id = insert_grant_if_absent(cur, user_id, '14d', tickets_req, add_minutes, now, None, src_ref, f"14d add {add_minutes} min for {tickets_req} tickets")
+                        conn.commit()
+                        if grant_id is not None:
                             try:
                                 if self.bonus_manager:
                                     self.bonus_manager.admin_credit(user_id, add_minutes, operator_id=None, notes=f"Fidelity 14d add {add_minutes} min for {tickets_req} tickets")
@@ -383,12 +421,9 @@ class TicketsManager:
                                 pass
 
         # ---- JF30 reward (30 days) ----
-        try:
-            threshold30 = int(self._get_config("fidelity_jf30_min_tickets", "12") or 12)
-            per_ticket_min = int(self._get_config("fidelity_jf30_per_ticket_minutes", "2") or 2)
-            expiry_days = int(self._get_config("fidelity_jf30_expiry_days", "10") or 10)
-        except Exception:
-            threshold30, per_ticket_min, expiry_days = 12, 2, 10
+        threshold30 = reward_cfg["jf30_min_tickets"]
+        per_ticket_min = reward_cfg["jf30_per_ticket_minutes"]
+        expiry_days = reward_cfg["jf30_expiry_days"]
 
         # compute tickets in last 30 days (ending at last_date)
         def count_last_n(end_date_str: str, n: int):
@@ -401,16 +436,12 @@ class TicketsManager:
             src_ref = f"jf30_window_end:{last_date}:cnt{cnt30}"
             with self.db.get_connection() as conn:
                 cur = conn.cursor()
-                cur.execute("SELECT COUNT(1) FROM fidelity_reward_grants WHERE user_id = ? AND grant_type = 'jf30' AND source_reference = ?", (user_id, src_ref))
-                row = cur.fetchone()
-                exists = int(row[0]) if row else 0
-                if exists == 0:
-                    minutes = cnt30 * per_ticket_min
-                    now = datetime.utcnow().isoformat()
-                    expiry_at = (datetime.utcnow() + timedelta(days=expiry_days)).isoformat()
-                    cur.execute("INSERT INTO fidelity_reward_grants (user_id, grant_type, tickets_count, minutes_awarded, created_at, expiry_at, source_reference, used, notes) VALUES (?, ?, ?, ?, ?, ?, ?, 0, ?)",
-                                (user_id, 'jf30', cnt30, minutes, now, expiry_at, src_ref, f"JF30 reward {cnt30} tickets"))
-                    conn.commit()
+                minutes = cnt30 * per_ticket_min
+                now = datetime.utcnow().isoformat()
+                expiry_at = (datetime.utcnow() + timedelta(days=expiry_days)).isoformat()
+                grant_id = insert_grant_if_absent(cur, user_id, 'jf30', cnt30, minutes, now, expiry_at, src_ref, f"JF30 reward {cnt30} tickets")
+                conn.commit()
+                if grant_id is not None:
                     try:
                         if self.bonus_manager:
                             self.bonus_manager.admin_credit(user_id, minutes, operator_id=None, notes=f"JF30 reward {cnt30} tickets")
@@ -484,7 +515,7 @@ class TicketsManager:
         with self.db.get_connection() as conn:
             cur = conn.cursor()
             cur.execute("INSERT INTO fidelity_reward_grants (user_id, grant_type, tickets_count, minutes_awarded, created_at, expiry_at, source_reference, used, notes) VALUES (?, ?, ?, ?, ?, ?, ?, 0, ?)",
-                        (user_id, grant_type, tickets_count, minutes, now, expiry, "admin_force", notes or "admin manual grant"))
+                        (user_id, grant_type, tickets_count, minutes, now, expiry, f"admin_force:{uuid.uuid4().hex}", notes or "admin manual grant"))
             conn.commit()
             gid = cur.lastrowid
         try:
@@ -495,49 +526,23 @@ class TicketsManager:
         return gid
 
     # ---------------- Listing / Query ----------------
-    def _rows_to_dicts(self, cur, rows):
-        """
-        Convertit la liste de rows (qui peuvent être tuples ou sqlite3.Row) en liste de dicts
-        en utilisant cur.description pour les noms de colonnes si nécessaire.
-        """
-        if not rows:
-            return []
-        # If row is sqlite3.Row, it supports keys()
-        first = rows[0]
-        if isinstance(first, sqlite3.Row):
-            return [dict(r) for r in rows]
-        # else build dicts using description
-        colnames = [c[0] for c in cur.description] if cur.description else []
-        dicts = []
-        for r in rows:
-            d = {}
-            for i, col in enumerate(colnames):
-                try:
-                    d[col] = r[i]
-                except Exception:
-                    d[col] = None
-            dicts.append(d)
-        return dicts
+    def tickets_query(self, user_id: Optional[int] = None) -> PagedQuery:
+        """Source paginée (curseur created_at, id) des tickets, pour les listes virtuelles."""
+        where, params = ("WHERE user_id = ?", (user_id,)) if user_id is not None else ("", ())
+        return PagedQuery(self.db, f"SELECT {', '.join(TICKET_COLUMNS)} FROM tickets_fidelite {where}",
+                          TICKET_COLUMNS, order=("created_at", True), params=params)
+
+    def grants_query(self, user_id: Optional[int] = None) -> PagedQuery:
+        """Source paginée (curseur created_at, id) des récompenses attribuées."""
+        where, params = ("WHERE user_id = ?", (user_id,)) if user_id is not None else ("", ())
+        return PagedQuery(self.db, f"SELECT {', '.join(GRANT_COLUMNS)} FROM fidelity_reward_grants {where}",
+                          GRANT_COLUMNS, order=("created_at", True), params=params)
 
     def list_tickets(self, user_id: Optional[int] = None, limit: int = 200, offset: int = 0) -> List[Dict[str, Any]]:
-        with self.db.get_connection() as conn:
-            cur = conn.cursor()
-            if user_id is None:
-                cur.execute("SELECT id, user_id, ticket_date, created_at, source, session_id, amount_fcfa, sequence_id, expired, notes FROM tickets_fidelite ORDER BY created_at DESC LIMIT ? OFFSET ?", (limit, offset))
-            else:
-                cur.execute("SELECT id, user_id, ticket_date, created_at, source, session_id, amount_fcfa, sequence_id, expired, notes FROM tickets_fidelite WHERE user_id = ? ORDER BY created_at DESC LIMIT ? OFFSET ?", (user_id, limit, offset))
-            rows = cur.fetchall()
-            return self._rows_to_dicts(cur, rows)
+        return self.tickets_query(user_id).fetch_dicts(offset, limit)
 
     def list_grants(self, user_id: Optional[int] = None, limit: int = 200, offset: int = 0) -> List[Dict[str, Any]]:
-        with self.db.get_connection() as conn:
-            cur = conn.cursor()
-            if user_id is None:
-                cur.execute("SELECT id, user_id, grant_type, tickets_count, minutes_awarded, created_at, expiry_at, source_reference, used, notes FROM fidelity_reward_grants ORDER BY created_at DESC LIMIT ? OFFSET ?", (limit, offset))
-            else:
-                cur.execute("SELECT id, user_id, grant_type, tickets_count, minutes_awarded, created_at, expiry_at, source_reference, used, notes FROM fidelity_reward_grants WHERE user_id = ? ORDER BY created_at DESC LIMIT ? OFFSET ?", (user_id, limit, offset))
-            rows = cur.fetchall()
-            return self._rows_to_dicts(cur, rows)
+        return self.grants_query(user_id).fetch_dicts(offset, limit)
 
     def get_user_progress(self, user_id: int, reference_date: Optional[str] = None) -> Dict[str, int]:
         """
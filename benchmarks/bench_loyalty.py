@@ -0,0 +1,243 @@
+# benchmarks/bench_loyalty.py
+"""
+Benchmark reproductible des sous-systèmes fidélité et bonus.
+
+- Génère une base synthétique temporaire (benchmarks/synthetic_db.py), jamais data/rdm_gsalle.db.
+- Mesure chaque opération appel par appel :
+    record_ticket_if_eligible, get_user_progress (TicketsManager)
+    grant_bonus_on_payment, get_bonus_balance, list_bonus_history (BonusManager)
+- Sortie JSON : p50 / p99 (ms) et ops/s par opération, médiane de `--repeats` exécutions
+  complètes (base reconstruite à chaque fois).
+- Opération d'étalonnage (lecture SQLite indexée sur une connexion neuve, le motif de base de
+  toutes les opérations mesurées) : chaque latence est aussi exprimée en multiple de sa p50
+  (p50_rel / p99_rel), ce qui rend la baseline indépendante de la vitesse de la machine.
+- Comparaison avec une baseline (benchmarks/baseline.json) sur ces ratios (ms absolues si la
+  baseline n'en a pas) : code retour 1 si une opération régresse au-delà de la tolérance.
+
+Usage:
+    python benchmarks/bench_loyalty.py                       # compare à benchmarks/baseline.json
+    python benchmarks/bench_loyalty.py --clients 500 --months 12 --out result.json
+    python benchmarks/bench_loyalty.py --save-baseline       # remplace la baseline
+    python benchmarks/bench_loyalty.py --repeats 9           # médiane plus stable
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import platform
+import random
+import sqlite3
+import statistics
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.append(str(ROOT))
+
+from benchmarks.synthetic_db import build_synthetic_db
+from models.database import DatabaseManager
+from app.bonus_simple import BonusManager
+from app.tickets_fidelite import TicketsManager
+
+BASELINE_PATH = Path(__file__).resolve().parent / "baseline.json"
+
+
+def _percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    k = max(0, min(len(sorted_values) - 1, int(round(pct / 100.0 * (len(sorted_values) - 1)))))
+    return sorted_values[k]
+
+
+def _measure(func, args_list):
+    """Exécute func(*args) pour chaque args et retourne les statistiques de latence."""
+    durations = []
+    t_start = time.perf_counter()
+    for args in args_list:
+        t0 = time.perf_counter_ns()
+        func(*args)
+        durations.append((time.perf_counter_ns() - t0) / 1e6)
+    elapsed = time.perf_counter() - t_start
+    durations.sort()
+    return {
+        "n": len(durations),
+        "p50_ms": round(_percentile(durations, 50), 4),
+        "p99_ms": round(_percentile(durations, 99), 4),
+        "ops_per_s": round(len(durations) / elapsed, 1) if elapsed > 0 else 0.0,
+    }
+
+
+def _calibration_op(path, user_id):
+    """Unité de mesure : connexion neuve + lecture indexée, sans logique applicative."""
+    conn = sqlite3.connect(path)
+    try:
+        conn.execute("SELECT id, username FROM users WHERE id = ?", (user_id,)).fetchone()
+    finally:
+        conn.close()
+
+
+def _run_once(clients, months, ops, seed, keep_db):
+    """Une exécution complète sur une base fraîche : (chemin, infos, durée de build, résultats)."""
+    t0 = time.perf_counter()
+    # les messages d'init (création admin...) vont sur stderr pour garder une sortie JSON propre
+    with contextlib.redirect_stdout(sys.stderr):
+        path, info = build_synthetic_db(clients=clients, months=months, seed=seed)
+        db = DatabaseManager(path)
+    build_s = time.perf_counter() - t0
+    try:
+        bm = BonusManager(db)
+        tm = TicketsManager(db=db, bonus_manager=bm)
+        rng = random.Random(seed)
+        users = list(range(1, clients + 1))
+
+        # hors de rng : les arguments des opérations restent ceux des baselines précédentes
+        calibration_args = [(path, users[i % len(users)]) for i in range(ops)]
+        # record_ticket_if_eligible : un ticket du jour par utilisateur distinct
+        ticket_users = rng.sample(users, min(ops, len(users)))
+        plan = [
+            ("record_ticket_if_eligible", tm.record_ticket_if_eligible, [(u, 200) for u in ticket_users]),
+            ("get_user_progress", tm.get_user_progress, [(rng.choice(users),) for _ in range(ops)]),
+            ("grant_bonus_on_payment", bm.grant_bonus_on_payment,
+             [(rng.choice(users), rng.choice([100, 200, 500]), f"bench_pay_{i}") for i in range(ops)]),
+            ("get_bonus_balance", bm.get_bonus_balance, [(rng.choice(users),) for _ in range(ops)]),
+            ("list_bonus_history", bm.list_bonus_history, [(rng.choice(users), 50, 0) for _ in range(ops)]),
+        ]
+
+        results = {}
+        calibrations = []
+        for op, func, args_list in plan:
+            # étalonnage mesuré juste avant chaque opération : même état de charge de la machine
+            unit = _measure(_calibration_op, calibration_args)
+            calibrations.append(unit)
+            stats = _measure(func, args_list)
+            stats["p50_rel"] = round(stats["p50_ms"] / unit["p50_ms"], 3) if unit["p50_ms"] else None
+            stats["p99_rel"] = round(stats["p99_ms"] / unit["p50_ms"], 3) if unit["p50_ms"] else None
+            results[op] = stats
+        results["calibration"] = {
+            "n": sum(c["n"] for c in calibrations),
+            "p50_ms": round(statistics.median(c["p50_ms"] for c in calibrations), 4),
+            "p99_ms": round(statistics.median(c["p99_ms"] for c in calibrations), 4),
+            "ops_per_s": round(statistics.median(c["ops_per_s"] for c in calibrations), 1),
+        }
+    finally:
+        if not keep_db:
+            for suffix in ("", "-journal", "-wal", "-shm"):
+                try:
+                    os.remove(path + suffix)
+                except OSError:
+                    pass
+    return path, info, build_s, results
+
+
+def _median_results(runs):
+    """Médiane, opération par opération, des statistiques de plusieurs exécutions."""
+    merged = {}
+    for op, first in runs[0].items():
+        merged[op] = {"n": first["n"]}
+        for key, digits in (("p50_ms", 4), ("p99_ms", 4), ("ops_per_s", 1), ("p50_rel", 3), ("p99_rel", 3)):
+            values = [run[op][key] for run in runs if run[op].get(key) is not None]
+            if values:
+                merged[op][key] = round(statistics.median(values), digits)
+    return merged
+
+
+def run_benchmarks(clients=200, months=6, ops=200, seed=42, keep_db=False, repeats=5):
+    """Exécute `repeats` fois toutes les opérations et retourne le rapport médian (dict)."""
+    repeats = max(1, repeats)
+    runs, build_times = [], []
+    path, info = None, {}
+    for i in range(repeats):
+        # seule la dernière base est conservée avec --keep-db
+        path, info, build_s, results = _run_once(clients, months, ops, seed, keep_db and i == repeats - 1)
+        runs.append(results)
+        build_times.append(build_s)
+    merged = _median_results(runs)
+
+    return {
+        "meta": {
+            **info,
+            "ops": ops,
+            "repeats": repeats,
+            "build_seconds": round(statistics.median(build_times), 3),
+            "calibration_ms": merged["calibration"]["p50_ms"],
+            "python": platform.python_version(),
+            "sqlite": sqlite3.sqlite_version,
+            "db_path": path if keep_db else None,
+        },
+        "results": merged,
+    }
+
+
+def compare_to_baseline(report, baseline, tolerance=0.25):
+    """
+    Compare p50/p99 de chaque opération à la baseline.
+    Les ratios à l'étalonnage (p50_rel / p99_rel) sont comparés quand les deux rapports en ont,
+    sinon les ms absolues (ancienne baseline). Retourne (regressions, comparaison) ; une
+    régression = p50 > baseline * (1 + tolerance), ou p99 > baseline * (1 + 2 * tolerance)
+    (la queue de distribution est plus bruitée). L'étalonnage lui-même n'est jamais une régression.
+    """
+    comparison = {}
+    regressions = []
+    for op, cur in report["results"].items():
+        if op == "calibration":
+            continue
+        base = baseline.get("results", {}).get(op)
+        if not base:
+            comparison[op] = {"status": "new"}
+            continue
+        relative = base.get("p50_rel") is not None and cur.get("p50_rel") is not None
+        entry = {"basis": "calibration" if relative else "ms"}
+        for metric, tol in (("p50", tolerance), ("p99", 2 * tolerance)):
+            key = f"{metric}_rel" if relative else f"{metric}_ms"
+            b = base.get(key) or 0
+            ratio = (cur[key] / b) if b else None
+            entry[key] = {"baseline": b, "current": cur[key], "ratio": round(ratio, 3) if ratio is not None else None}
+            if ratio is not None and ratio > 1 + tol:
+                regressions.append(f"{op}.{key}")
+        entry["status"] = "regression" if any(r.startswith(op + ".") for r in regressions) else "ok"
+        comparison[op] = entry
+    return regressions, comparison
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark fidélité / bonus sur base synthétique.")
+    parser.add_argument("--clients", type=int, default=200)
+    parser.add_argument("--months", type=int, default=6)
+    parser.add_argument("--ops", type=int, default=200, help="appels mesurés par opération")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--repeats", type=int, default=5, help="exécutions complètes ; la médiane est retenue")
+    parser.add_argument("--baseline", default=str(BASELINE_PATH))
+    parser.add_argument("--tolerance", type=float, default=0.25, help="régression si p50 > baseline * (1 + tolérance), p99 avec 2x la tolérance")
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--out", default=None, help="écrit aussi le rapport JSON dans ce fichier")
+    parser.add_argument("--keep-db", action="store_true", help="conserve la base synthétique générée")
+    args = parser.parse_args()
+
+    report = run_benchmarks(clients=args.clients, months=args.months, ops=args.ops, seed=args.seed,
+                            keep_db=args.keep_db, repeats=args.repeats)
+
+    exit_code = 0
+    if args.save_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+            f.write("\n")
+        report["baseline"] = {"saved_to": args.baseline}
+    elif os.path.exists(args.baseline):
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        if baseline.get("meta", {}).get("clients") != args.clients or baseline.get("meta", {}).get("months") != args.months:
+            print("[WARN] baseline générée avec d'autres paramètres (clients/months) : comparaison indicative.", file=sys.stderr)
+        regressions, comparison = compare_to_baseline(report, baseline, args.tolerance)
+        report["baseline"] = {"path": args.baseline, "tolerance": args.tolerance, "regressions": regressions, "comparison": comparison}
+        if regressions:
+            exit_code = 1
+
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    sys.exit(exit_code)
@@ -0,0 +1,71 @@
+# benchmarks/bench_salle_state.py
+"""
+Test de charge de SalleState (sans affichage) pour une salle de N postes.
+
+- Opérations atomiques : start_session / extend_session / stop_session / snapshot / stats.
+- Échéances : N sessions expirant au même instant, traitées par le thread de SalleState ;
+  mesure du retard entre l'échéance et la publication de l'évènement.
+- Sortie JSON (p50 / p99 en ms, ops/s), même format que bench_loyalty.py.
+
+Usage:
+    python benchmarks/bench_salle_state.py --postes 200
+"""
+
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.append(str(ROOT))
+
+from app.salle_state import SalleState, EVENT_SESSION_EXPIRED
+from benchmarks.bench_loyalty import _measure, _percentile
+
+
+def run_benchmarks(postes=200):
+    state = SalleState()
+    state.load_postes([{"id": i, "nom": f"Poste {i}", "type_console": "PS4", "statut": "libre"} for i in range(1, postes + 1)])
+    state.drain_events()
+    ids = list(range(1, postes + 1))
+
+    results = {}
+    results["start_session"] = _measure(state.start_session, [(pid, f"Client {pid}", 200, 1800) for pid in ids])
+    results["extend_session"] = _measure(state.extend_session, [(pid, 300) for pid in ids])
+    results["snapshot"] = _measure(state.snapshot, [() for _ in range(200)])
+    results["stats"] = _measure(state.stats, [() for _ in range(200)])
+    results["stop_session"] = _measure(state.stop_session, [(pid,) for pid in ids])
+    state.drain_events()
+
+    # expiration simultanée de toutes les sessions, traitée par le thread d'échéances
+    state.start()
+    for pid in ids:
+        state.start_session(pid, f"Client {pid}", 200, 1)
+        state.extend_session(pid, 1)   # reprogrammation : l'ancienne échéance doit être ignorée
+    state.drain_events()
+    fins = {pid: state.get_poste(pid)["fin_monotonic"] for pid in ids}
+    lags = []
+    deadline = max(fins.values()) + 5
+    while len(lags) < postes and time.monotonic() < deadline:
+        for event in state.drain_events():
+            if event["type"] == EVENT_SESSION_EXPIRED:
+                lags.append((event["at"] - fins[event["poste_id"]]) * 1000)
+        time.sleep(0.01)
+    state.stop()
+    lags.sort()
+    results["expiry_lag"] = {
+        "n": len(lags),
+        "p50_ms": round(_percentile(lags, 50), 4),
+        "p99_ms": round(_percentile(lags, 99), 4),
+        "ops_per_s": None,
+    }
+    return {"meta": {"postes": postes}, "results": results}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Charge SalleState (headless).")
+    parser.add_argument("--postes", type=int, default=200)
+    args = parser.parse_args()
+    print(json.dumps(run_benchmarks(postes=args.postes), indent=2))
@@ -0,0 +1,106 @@
+# benchmarks/synthetic_db.py
+"""
+Génération de bases SQLite synthétiques pour les benchmarks (fidélité + bonus).
+
+- Schéma créé par le code de l'application (DatabaseManager.init_database, BonusManager.run_migrations,
+  TicketsManager.run_migrations) : la base benchmarkée a exactement les tables/index de production.
+- N clients, M mois d'historique : sessions, paiements (bonus_transactions 'payment'),
+  tickets de fidélité (1 par jour joué avec paiement >= seuil).
+- Déterministe (seed) et toujours écrit dans un fichier temporaire : data/rdm_gsalle.db n'est jamais touchée.
+
+Usage:
+    from benchmarks.synthetic_db import build_synthetic_db
+    path, info = build_synthetic_db(clients=200, months=6, seed=42)
+"""
+
+import os
+import random
+import sys
+import tempfile
+from datetime import date, datetime, timedelta
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.append(str(ROOT))
+
+from models.database import DatabaseManager
+from app.bonus_simple import BonusManager
+from app.tickets_fidelite import TicketsManager
+
+# profils de fréquentation : probabilité de venir un jour donné
+PLAYER_PROFILES = [0.05, 0.15, 0.35, 0.6, 0.85]
+AMOUNTS_FCFA = [50, 100, 100, 200, 200, 300, 500]
+
+
+def build_synthetic_db(path=None, clients=200, months=6, seed=42, postes=6):
+    """
+    Crée la base synthétique et retourne (path, info).
+    L'historique se termine la veille, pour que record_ticket_if_eligible puisse encore créer
+    le ticket du jour pendant le benchmark.
+    """
+    if path is None:
+        fd, path = tempfile.mkstemp(prefix="rdm_bench_", suffix=".db")
+        os.close(fd)
+        os.remove(path)
+    rng = random.Random(seed)
+
+    db = DatabaseManager(path)
+    bm = BonusManager(db)
+    bm.run_migrations()
+    tm = TicketsManager(db=db, bonus_manager=bm)
+    tm.run_migrations()
+
+    end_day = date.today() - timedelta(days=1)
+    start_day = end_day - timedelta(days=30 * months)
+    n_days = (end_day - start_day).days + 1
+
+    sessions, payments, tickets = [], [], []
+    with db.get_connection() as conn:
+        cur = conn.cursor()
+        cur.executemany(
+            "INSERT INTO clients (id, nom, telephone) VALUES (?, ?, ?)",
+            [(cid, f"Client {cid}", f"+226{cid:08d}") for cid in range(1, clients + 1)]
+        )
+        cur.executemany(
+            "INSERT OR IGNORE INTO postes (numero, nom, type_console, statut) VALUES (?, ?, ?, 'libre')",
+            [(p, f"Poste {p}", rng.choice(["PS3", "PS4", "PS5"])) for p in range(1, postes + 1)]
+        )
+        for cid in range(1, clients + 1):
+            p_visit = rng.choice(PLAYER_PROFILES)
+            for k in range(n_days):
+                if rng.random() >= p_visit:
+                    continue
+                day = start_day + timedelta(days=k)
+                start = datetime.combine(day, datetime.min.time()) + timedelta(minutes=rng.randint(9 * 60, 22 * 60))
+                amount = rng.choice(AMOUNTS_FCFA)
+                minutes = max(3, amount * 6 // 100)
+                stop = start + timedelta(minutes=minutes)
+                sessions.append((cid, rng.randint(1, postes), start.isoformat(" "), stop.isoformat(" "), minutes, 0, amount, "termine"))
+                payments.append((cid, max(1, amount // 50), "payment", f"bench_{cid}_{k}", start.isoformat(), None, None))
+                if amount >= 100:
+                    tickets.append((cid, day.isoformat(), start.isoformat(), "auto", None, amount, None, 0, None))
+        cur.executemany(
+            "INSERT INTO sessions (client_id, poste_id, debut, fin, duree_payee, duree_bonus, montant_paye, statut) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            sessions
+        )
+        cur.executemany(
+            "INSERT INTO bonus_transactions (user_id, minutes_delta, source, reference, created_at, operator_id, notes) VALUES (?, ?, ?, ?, ?, ?, ?)",
+            payments
+        )
+        cur.executemany(
+            "INSERT INTO tickets_fidelite (user_id, ticket_date, created_at, source, session_id, amount_fcfa, sequence_id, expired, notes) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            tickets
+        )
+        conn.commit()
+    conn.close()
+
+    info = {
+        "clients": clients,
+        "months": months,
+        "seed": seed,
+        "sessions": len(sessions),
+        "payments": len(payments),
+        "tickets": len(tickets),
+    }
+    return path, info
@@ -29,3 +29,10 @@ TARIFS_DEFAULT = {
     "PS4": {50: 4, 100: 10, 200: 25},
     "PS5": {50: 3, 100: 8, 200: 20}
 }
+
+# Journal des alertes de l'interface gérant (écrit en tâche de fond)
+ALERT_JOURNAL_PATH = BASE_DIR / "data" / "alerts.log"
+ALERT_CAPACITY = 200  # alertes conservées en mémoire / affichées
+
+# Cache des analyses NumPy (app/analytics.py) : tableaux .npy relus en mmap
+ANALYTICS_CACHE_DIR = BASE_DIR / "data" / "analytics_cache"
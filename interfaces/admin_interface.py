@@ -5,23 +5,41 @@ from tkinter import ttk, messagebox, simpledialog, filedialog
 from models.database import DatabaseManager
 from config.settings import DATABASE_PATH
 import os
-import bcrypt
 import json
 import sys
-import glob
-import platform
 import sqlite3
 import math
 
+from app.config_store import ConfigStore, format_diff
+from app.dashboard_rollup import DashboardData
+from app.password_hasher import PasswordHasher
+from app.group_catalog import GroupCatalog
+from app.paged_query import PagedQuery
+from app.serial_ports import SerialPortWatcher, list_serial_ports
+from app.startup_timer import StartupTimer
+from interfaces.task_runner import TaskRunner, LOADING_TEXT, set_tree_loading, clear_tree, is_loading_row
+from interfaces.virtual_list import VirtualTreeview
+from interfaces.charts import BarChart
+from app.relational_schema import (
+    ensure_relational_schema, enable_foreign_keys, list_tariffs, add_tariff, update_tariff, delete_tariff,
+    bump_config_revision,
+    set_poste_outputs, list_poste_outputs,
+)
+
 # Bonus manager (optionnel — protège l'import si le fichier n'existe pas)
 try:
-    from app.bonus_simple import BonusManager
+    from app.bonus_simple import BonusManager, HISTORY_COLUMNS
 except Exception:
     BonusManager = None
 
 
 class AdminInterface:
+    PORT_POLL_MS = 500
+
     def __init__(self, user_id):
+        # seul l'onglet visible est construit avant le premier affichage ; migrations et scan
+        # des ports série viennent après (_deferred_init), les autres onglets à leur 1re ouverture
+        self.startup = StartupTimer("AdminInterface")
         self.user_id = user_id
         self.root = tk.Tk()
         self.root.title("RDM gSalle - Interface Administrateur")
@@ -31,7 +49,19 @@ class AdminInterface:
             pass
 
         self.db = DatabaseManager(DATABASE_PATH)
+        self.group_catalog = GroupCatalog(self.db)
+        # table config en cache ; écritures groupées (une transaction, clés modifiées seulement)
+        self.config_store = ConfigStore(self.db)
+        # agrégats du tableau de bord (rattrapage incrémental, séries en cache)
+        self.dashboard_data = DashboardData(self.db)
+        # bcrypt (ajout / modification d'utilisateur) sur le pool de self.tasks
+        self.hasher = PasswordHasher(self.config_store)
+        # chargements de listes hors du thread Tk (résultats rapatriés via root.after)
+        self.tasks = TaskRunner(self.root)
+        self.port_watcher = SerialPortWatcher(interval=1.0)
+        self._port_poll_id = None
         self.current_user_info = self.get_user_info()
+        self.startup.mark("base de données + utilisateur")
 
         self.setup_styles()
         self.settings_entries = {}
@@ -42,50 +72,83 @@ class AdminInterface:
         self.serial_ports = []
 
         # placeholders
+        self.users_tree = None
+        # (id, username) de l'utilisateur choisi : la liste recycle ses lignes, la sélection
+        # du Treeview disparaît quand la ligne sort de la vue
+        self.selected_user = None
         self.console_groups_tree = None
         self.tariffs_tree = None
         self.physical_postes_tree = None
         self.poste_console_groups_listbox = None
+        self._lazy_tabs = {}
+        self._deferred_done = False
 
-        # Bonus manager (si disponible)
+        # Bonus manager (si disponible) ; ses migrations sont différées
         try:
-            if BonusManager:
-                # on passe l'instance de DatabaseManager pour réutiliser la même connexion/config
-                self.bonus_manager = BonusManager(self.db)
-                try:
-                    # tenter d'exécuter la migration (idempotent)
-                    self.bonus_manager.run_migrations()
-                except Exception:
-                    pass
-            else:
-                self.bonus_manager = None
+            self.bonus_manager = BonusManager(self.db) if BonusManager else None
         except Exception:
             self.bonus_manager = None
 
         self.create_widgets()
-        self.load_users()
+        self.startup.mark("onglet visible")
+
+        self.root.protocol("WM_DELETE_WINDOW", self.on_closing)
+        # after_idle passe après le rendu de la fenêtre déjà planifié
+        self.root.after_idle(self._on_first_paint)
 
+    # ---------------- Démarrage différé ----------------
+    def _on_first_paint(self):
+        self.startup.mark("premier affichage")
+        self.root.after(1, self._deferred_init)
+
+    def _deferred_init(self):
+        """Schéma, listes de configuration, migrations bonus et ports série (après le 1er affichage)."""
+        if self._deferred_done:
+            return
+        self._deferred_done = True
         self._ensure_config_table()
         self._load_lists_from_config()
-
         # migration / ensure schema for physical_postes supports outputs field
         self._ensure_physical_postes_schema()
+        self.startup.mark("schéma + listes config")
+        self.load_dashboard()
+        if self.bonus_manager:
+            # migration idempotente, en arrière-plan
+            self.tasks.submit("bonus_migrations", self.bonus_manager.run_migrations, on_done=lambda _: None,
+                              on_error=lambda e: print("[DEBUG] bonus run_migrations:", e))
+        # ports série : surveillance en fond (cache + évènements branché / débranché)
+        self._start_port_watcher()
+        self.startup.mark("tâches de fond lancées")
+        print("[DEBUG]", self.startup.report())
+        try:
+            self.status_label.config(text=f"✅ Interface Administrateur chargée ({self.startup.total():.0f} ms)")
+        except Exception:
+            pass
 
-        # detect serial ports & merge
-        detected = self.detect_serial_ports()
-        for p in detected:
-            if p not in self.serial_ports:
-                self.serial_ports.append(p)
-        self._set_config_json("serial_ports", self.serial_ports)
-
-        # ensure UI comboboxes updated
-        self._refresh_currency_combobox()
-        self._refresh_serialport_combobox()
-
-        # initial load settings
-        self.load_settings_for_current_section()
+    def _add_lazy_tab(self, text, builder):
+        """Onglet vide ; builder(frame) n'est appelé qu'à sa première sélection."""
+        frame = ttk.Frame(self.notebook, style="Light.TFrame")
+        self.notebook.add(frame, text=text)
+        self._lazy_tabs[str(frame)] = (text, frame, builder)
+        return frame
 
-        self.root.protocol("WM_DELETE_WINDOW", self.on_closing)
+    def _on_tab_changed(self, event=None):
+        try:
+            key = self.notebook.select()
+        except Exception:
+            return
+        entry = self._lazy_tabs.pop(key, None)
+        if entry is None:
+            return
+        text, frame, builder = entry
+        self._deferred_init()     # si l'onglet est ouvert avant la fin du démarrage
+        with self.startup.measure(f"construction {text}"):
+            builder(frame)
+        print(f"[DEBUG] onglet '{text}' construit en {self.startup.steps[-1][1]:.1f} ms")
+
+    def _build_users_tab(self, frame):
+        self.create_users_tab(frame)
+        self.load_users()
 
     # ---------------- Styles ----------------
     def setup_styles(self):
@@ -123,83 +186,63 @@ class AdminInterface:
     # ---------------- DB helpers ----------------
     def _ensure_config_table(self):
         try:
-            with self.db.get_connection() as conn:
-                cursor = conn.cursor()
-                cursor.execute("CREATE TABLE IF NOT EXISTS config (cle TEXT PRIMARY KEY, valeur TEXT)")
-                conn.commit()
+            self.config_store.load()
         except Exception as e:
             messagebox.showerror("Erreur BD", f"Impossible de garantir la table config: {e}")
 
     def _get_config(self, key, default=None):
         try:
-            with self.db.get_connection() as conn:
-                cursor = conn.cursor()
-                cursor.execute("SELECT valeur FROM config WHERE cle = ?", (key,))
-                row = cursor.fetchone()
-                return row[0] if row else default
+            return self.config_store.get(key, default)
         except Exception as e:
             print(f"[DEBUG] Erreur lecture config {key}: {e}")
             return default
 
-    def _set_config(self, key, value):
+    def _save_config(self, changes, remove=()):
+        """Écrit les clés modifiées de `changes` en une transaction ; None si l'écriture a échoué."""
         try:
-            with self.db.get_connection() as conn:
-                cursor = conn.cursor()
-                cursor.execute("INSERT OR REPLACE INTO config (cle, valeur) VALUES (?, ?)", (key, value))
-                conn.commit()
+            return self.config_store.save(changes, remove=remove)
         except Exception as e:
-            messagebox.showerror("Erreur BD", f"Impossible d'enregistrer la configuration {key}: {e}")
+            messagebox.showerror("Erreur BD", f"Impossible d'enregistrer la configuration {', '.join(changes)}: {e}")
+            return None
+
+    def _set_config(self, key, value):
+        self._save_config({key: value})
 
     def _get_config_json(self, key, default=None):
-        raw = self._get_config(key, None)
-        if raw is None:
-            return default if default is not None else []
+        fallback = default if default is not None else []
         try:
-            return json.loads(raw)
+            value = self.config_store.get_json(key)
         except Exception:
-            return default if default is not None else []
+            return fallback
+        return fallback if value is None else value
 
     def _set_config_json(self, key, obj):
-        try:
-            self._set_config(key, json.dumps(obj))
-        except Exception as e:
-            messagebox.showerror("Erreur BD", f"Impossible d'enregistrer la configuration {key}: {e}")
+        self._save_config({key: obj})
 
     # ---------------- Serial port detection ----------------
     def detect_serial_ports(self):
-        ports = []
-        try:
-            import serial.tools.list_ports as list_ports
-            for p in list_ports.comports():
-                ports.append(p.device)
-            seen = []
-            res = []
-            for p in ports:
-                if p not in seen:
-                    seen.append(p)
-                    res.append(p)
-            return res
-        except Exception:
-            pass
-        system = platform.system().lower()
-        if system == "windows":
-            return [f"COM{i}" for i in range(1, 13)]
-        else:
-            patterns = ["/dev/ttyUSB*", "/dev/ttyACM*", "/dev/ttyS*", "/dev/cu.*"]
-            found = []
-            for pat in patterns:
-                found.extend(glob.glob(pat))
-            if found:
-                seen = []
-                res = []
-                for p in found:
-                    if p not in seen:
-                        seen.append(p)
-                        res.append(p)
-                return res
-            if system == "darwin":
-                return ["/dev/cu.usbserial", "/dev/cu.usbmodem"]
-            return ["/dev/ttyUSB0", "/dev/ttyACM0"]
+        """Relecture forcée via le watcher (hors thread Tk) ; ports par défaut si rien n'est branché."""
+        return self.port_watcher.refresh() or list_serial_ports()
+
+    def _poll_port_events(self):
+        """Évènements du watcher de ports (branchement / débranchement), sur le thread Tk."""
+        self._port_poll_id = None
+        for event in self.port_watcher.drain_events():
+            if event["added"]:
+                self._merge_detected_ports(event["added"])
+            if event["removed"]:
+                try:
+                    self.status_label.config(text="🔌 Port retiré : " + ", ".join(event["removed"]))
+                except Exception:
+                    pass
+        if self.port_watcher.running:
+            self._port_poll_id = self.root.after(self.PORT_POLL_MS, self._poll_port_events)
+
+    def _start_port_watcher(self):
+        if self.port_watcher.running:
+            return
+        # le scan initial (dans start) tourne hors du thread Tk ; ses évènements arrivent par la file
+        self.tasks.submit("port_watcher", self.port_watcher.start, on_done=lambda _: self._poll_port_events())
 
     # ---------------- Ensure physical_postes schema (migration/support outputs) ----------------
     def _ensure_physical_postes_schema(self):
@@ -216,6 +259,13 @@ class AdminInterface:
                         outputs TEXT
                     )
                 """)
+                # sorties et grilles tarifaires relationnelles (reprise des anciens blobs JSON)
+                cursor.execute(
+                    "CREATE TABLE IF NOT EXISTS console_groups "
+                    "(id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT UNIQUE NOT NULL, icon TEXT, tariffs TEXT)"
+                )
+                if ensure_relational_schema(cursor):
+                    self.group_catalog.invalidate()
                 conn.commit()
         except Exception as e:
             print("[DEBUG] _ensure_physical_postes_schema error:", e)
@@ -223,10 +273,7 @@ class AdminInterface:
     # ---------------- Export / Import ----------------
     def export_config_to_file(self):
         try:
-            with self.db.get_connection() as conn:
-                cursor = conn.cursor()
-                cursor.execute("SELECT cle, valeur FROM config")
-                data = {row[0]: row[1] for row in cursor.fetchall()}
+            data = self.config_store.load()
         except Exception as e:
             messagebox.showerror("Erreur BD", f"Impossible de lire la configuration: {e}")
             return
@@ -247,6 +294,9 @@ class AdminInterface:
         try:
             with open(path, "r", encoding="utf-8") as f:
                 data = json.load(f)
+            if not isinstance(data, dict):
+                raise ValueError("objet JSON {clé: valeur} attendu")
+            self.config_store.load()     # diff calculé sur l'état actuel de la base
         except Exception as e:
             messagebox.showerror("Erreur", f"Impossible de lire le fichier : {e}")
             return
@@ -256,35 +306,44 @@ class AdminInterface:
         preview.transient(self.root)
         frm = ttk.Frame(preview, padding=10)
         frm.pack(fill=tk.BOTH, expand=True)
-        ttk.Label(frm, text="Prévisualisation des clés chargées (cliquez sur 'Confirmer' pour importer) :", style="Light.TLabel").pack(anchor=tk.W)
+        summary_var = tk.StringVar()
+        ttk.Label(frm, textvariable=summary_var, style="Light.TLabel").pack(anchor=tk.W)
+        remove_var = tk.BooleanVar(value=False)
         text = tk.Text(frm, wrap=tk.NONE)
+        state = {}
+
+        def render():
+            plan = self.config_store.diff(data, remove_missing=remove_var.get())
+            state["plan"] = plan
+            summary_var.set(f"Ajoutées : {len(plan['added'])}   Modifiées : {len(plan['changed'])}   "
+                            f"Supprimées : {len(plan['removed'])}   (+ ajout, ~ modification, - suppression)")
+            text.config(state=tk.NORMAL)
+            text.delete("1.0", tk.END)
+            lines = format_diff(plan)
+            text.insert(tk.END, "\n".join(lines) if lines else "Aucune différence avec la configuration actuelle.")
+            text.config(state=tk.DISABLED)
+
+        ttk.Checkbutton(frm, text="Supprimer les clés absentes du fichier", variable=remove_var,
+                        command=render).pack(anchor=tk.W, pady=(4,0))
         text.pack(fill=tk.BOTH, expand=True, pady=(6,6))
-        for k, v in data.items():
-            display = v
-            if isinstance(display, (list, dict)):
-                display = json.dumps(display)
-            if len(display) > 350:
-                display = display[:350] + " ... (truncated)"
-            text.insert(tk.END, f"{k} : {display}\n\n")
+        render()
 
         def do_import():
-            try:
-                with self.db.get_connection() as conn:
-                    cursor = conn.cursor()
-                    for k, v in data.items():
-                        val = v
-                        if isinstance(v, (list, dict)):
-                            val = json.dumps(v)
-                        cursor.execute("INSERT OR REPLACE INTO config (cle, valeur) VALUES (?, ?)", (k, str(val)))
-                    conn.commit()
-                messagebox.showinfo("Importé", "Configuration importée avec succès.")
-                self._load_lists_from_config()
-                self._refresh_currency_combobox()
-                self._refresh_serialport_combobox()
-                self.load_settings_for_current_section()
+            plan = state["plan"]
+            if not (plan["added"] or plan["changed"] or plan["removed"]):
                 preview.destroy()
+                return
+            try:
+                self.config_store.apply_diff(plan)
             except Exception as e:
                 messagebox.showerror("Erreur BD", f"Impossible d'importer la configuration : {e}")
+                return
+            messagebox.showinfo("Importé", "Configuration importée avec succès.")
+            self._load_lists_from_config()
+            self._refresh_currency_combobox()
+            self._refresh_serialport_combobox()
+            self.load_settings_for_current_section()
+            preview.destroy()
 
         btn_frame = ttk.Frame(frm)
         btn_frame.pack(fill=tk.X, pady=(6,0))
@@ -323,15 +382,13 @@ class AdminInterface:
 
         reports_tab = ttk.Frame(self.notebook, style="Light.TFrame")
         self.notebook.add(reports_tab, text="📊 Rapports")
-        ttk.Label(reports_tab, text="Section Rapports (en développement)", font=("Arial", 14), style="Light.TLabel").pack(pady=50)
+        # widgets seulement : les séries sont chargées après le premier affichage (_deferred_init)
+        self.create_dashboard_tab(reports_tab)
 
-        settings_main_tab = ttk.Frame(self.notebook, style="Light.TFrame")
-        self.notebook.add(settings_main_tab, text="⚙️ Paramètres Généraux")
-        self.create_settings_main_tab(settings_main_tab)
-
-        users_tab = ttk.Frame(self.notebook, style="Light.TFrame")
-        self.notebook.add(users_tab, text="👥 Gestion des Utilisateurs")
-        self.create_users_tab(users_tab)
+        # construits à la première ouverture
+        self._add_lazy_tab("⚙️ Paramètres Généraux", self.create_settings_main_tab)
+        self._add_lazy_tab("👥 Gestion des Utilisateurs", self._build_users_tab)
+        self.notebook.bind("<<NotebookTabChanged>>", self._on_tab_changed)
 
         status_bar = tk.Frame(self.root, bg="#34495E", height=24)
         status_bar.pack(side=tk.BOTTOM, fill=tk.X)
@@ -341,6 +398,69 @@ class AdminInterface:
         logout_btn = tk.Button(status_bar, text="🚪 Déconnexion", command=self.logout, font=("Arial", 9, "bold"), bg="#E74C3C", fg="white", relief="flat", bd=0, padx=10, pady=2)
         logout_btn.pack(side=tk.RIGHT, padx=15, pady=2)
 
+    # ---------------- Tableau de bord (Rapports) ----------------
+    def create_dashboard_tab(self, parent_tab):
+        top = ttk.Frame(parent_tab, style="Light.TFrame")
+        top.pack(fill=tk.X, padx=10, pady=(10,0))
+        ttk.Label(top, text="Période :", style="Light.TLabel").pack(side=tk.LEFT)
+        self.dashboard_days_var = tk.StringVar(value="30 jours")
+        period_combo = ttk.Combobox(top, textvariable=self.dashboard_days_var, state="readonly", width=10,
+                                    values=["7 jours", "30 jours", "90 jours", "365 jours"])
+        period_combo.pack(side=tk.LEFT, padx=(6,6))
+        period_combo.bind("<<ComboboxSelected>>", lambda e: self.load_dashboard(catch_up=False))
+        ttk.Button(top, text="🔄 Actualiser", command=self.load_dashboard).pack(side=tk.LEFT)
+        self.dashboard_status = ttk.Label(top, text=LOADING_TEXT, style="Light.TLabel")
+        self.dashboard_status.pack(side=tk.LEFT, padx=(12,0))
+        grid = ttk.Frame(parent_tab, style="Light.TFrame")
+        grid.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
+        specs = (
+            ("occupancy_poste", "Occupation par poste (minutes)", ("#3498DB",), ()),
+            ("occupancy_hour", "Occupation par heure (minutes)", ("#1ABC9C",), ()),
+            ("revenue_console", "Recette par groupe de consoles (FCFA)", ("#27AE60",), ()),
+            ("grant_cost", "Coût fidélité par semaine (minutes offertes)", ("#E67E22",), ()),
+            ("bonus", "Minutes bonus émises / consommées", ("#9B59B6", "#E74C3C"), ("émises", "consommées")),
+        )
+        self.dashboard_charts = {}
+        for i, (name, title, colors, series) in enumerate(specs):
+            canvas = tk.Canvas(grid, bg="white", highlightthickness=1, highlightbackground="#D5DBDB", height=180)
+            row, col = divmod(i, 2)
+            span = 2 if name == "bonus" else 1
+            canvas.grid(row=row, column=col, columnspan=span, sticky="nsew", padx=4, pady=4)
+            self.dashboard_charts[name] = BarChart(canvas, title, colors=colors, series=series)
+        for col in range(2):
+            grid.columnconfigure(col, weight=1)
+        for row in range(3):
+            grid.rowconfigure(row, weight=1)
+
+    def _dashboard_days(self):
+        try:
+            return int(self.dashboard_days_var.get().split()[0])
+        except Exception:
+            return 30
+
+    def load_dashboard(self, catch_up=True):
+        """Rattrapage incrémental des agrégats puis séries (cache) ; tout hors du thread Tk."""
+        days = self._dashboard_days()
+
+        def fetch():
+            counts = self.dashboard_data.catch_up() if catch_up else {}
+            return counts, self.dashboard_data.series(days)
+
+        def on_error(e):
+            self.dashboard_status.config(text=f"❗ Tableau de bord indisponible : {e}")
+        self.dashboard_status.config(text=LOADING_TEXT)
+        self.tasks.submit("dashboard", fetch, on_done=self._show_dashboard, on_error=on_error)
+
+    def _show_dashboard(self, result):
+        counts, series = result
+        if not self.dashboard_status.winfo_exists():
+            return
+        for name, chart in self.dashboard_charts.items():
+            chart.set_data(series[name])
+        new_rows = sum(counts.values())
+        self.dashboard_status.config(
+            text=f"Du {series['start']} au {series['end']}" + (f" — {new_rows} nouvelle(s) ligne(s) intégrée(s)" if new_rows else ""))
+
     # ---------------- Users tab ----------------
     def create_users_tab(self, parent_tab):
         form_frame = ttk.LabelFrame(parent_tab, text="Ajouter / Modifier Utilisateur", style="Light.TLabelFrame")
@@ -357,8 +477,10 @@ class AdminInterface:
         self.role_combo.pack(fill=tk.X, pady=(0,10))
         btn_frame = ttk.Frame(form_frame, style="Light.TFrame")
         btn_frame.pack(fill=tk.X, pady=(10,0))
-        ttk.Button(btn_frame, text="➕ Ajouter", command=self.add_user).pack(side=tk.LEFT, padx=(0,5))
-        ttk.Button(btn_frame, text="💾 Modifier", command=self.update_user).pack(side=tk.LEFT, padx=(0,5))
+        self.add_user_btn = ttk.Button(btn_frame, text="➕ Ajouter", command=self.add_user)
+        self.add_user_btn.pack(side=tk.LEFT, padx=(0,5))
+        self.update_user_btn = ttk.Button(btn_frame, text="💾 Modifier", command=self.update_user)
+        self.update_user_btn.pack(side=tk.LEFT, padx=(0,5))
         ttk.Button(btn_frame, text="🗑️ Supprimer", command=self.delete_user).pack(side=tk.LEFT, padx=(0,5))
         ttk.Button(btn_frame, text="✖️ Annuler", command=self.clear_user_form).pack(side=tk.LEFT)
         list_frame = ttk.LabelFrame(parent_tab, text="Liste des Utilisateurs", style="Light.TLabelFrame")
@@ -370,8 +492,17 @@ class AdminInterface:
         self.users_tree.column("ID", width=50, stretch=tk.NO)
         self.users_tree.column("Nom d'utilisateur", width=150, stretch=tk.YES)
         self.users_tree.column("Rôle", width=100, stretch=tk.NO)
+        users_scroll = ttk.Scrollbar(list_frame, orient="vertical")
+        users_scroll.pack(side=tk.RIGHT, fill=tk.Y)
         self.users_tree.pack(fill=tk.BOTH, expand=True)
         self.users_tree.bind("<<TreeviewSelect>>", self.on_user_select)
+        # seules les lignes visibles sont dans le Treeview ; tri par clic sur l'en-tête (ORDER BY)
+        self.users_list = VirtualTreeview(
+            self.users_tree, users_scroll,
+            PagedQuery(self.db, "SELECT id, username, role FROM users", ("id", "username", "role"),
+                       order=("username", False)),
+            runner=self.tasks, name="users",
+            sort_columns={"ID": "id", "Nom d'utilisateur": "username", "Rôle": "role"})
 
     # ---------------- Settings main tab ----------------
     def create_settings_main_tab(self, parent_tab):
@@ -411,6 +542,7 @@ class AdminInterface:
             self.show_settings_section(first_section_name)
 
     def show_settings_section(self, section_name):
+        self.tasks.cancel_scope("section")
         for widget in self.settings_content_frame.winfo_children():
             widget.destroy()
         self.settings_entries = {}
@@ -452,6 +584,7 @@ class AdminInterface:
             self.show_tarification_sub_section(sub_menu_items[0][1])
 
     def show_tarification_sub_section(self, sub_section_name):
+        self.tasks.cancel_scope("section")
         for widget in self.tariff_sub_section_content_frame.winfo_children():
             widget.destroy()
         self.settings_entries = {}
@@ -508,10 +641,18 @@ class AdminInterface:
         self._refresh_serialport_combobox()
 
     def toggle_bg_scan(self):
-        messagebox.showinfo("Scanner", "Fonction de scan de ports en fond (prototype).")
+        if self.port_watcher.running:
+            self.port_watcher.stop()
+            if self._port_poll_id is not None:
+                self.root.after_cancel(self._port_poll_id)
+                self._port_poll_id = None
+            self.status_label.config(text="⏸ Scan des ports série en fond arrêté")
+        else:
+            self._start_port_watcher()
+            self.status_label.config(text="🔄 Scan des ports série en fond actif")
 
-    def _detect_and_refresh_ports(self):
-        new_ports = self.detect_serial_ports()
+    def _merge_detected_ports(self, new_ports):
+        """Fusionne les ports détectés (thread Tk) ; retourne le nombre de ports ajoutés."""
         added = 0
         for p in new_ports:
             if p not in self.serial_ports:
@@ -520,7 +661,13 @@ class AdminInterface:
         if added:
             self._set_config_json("serial_ports", self.serial_ports)
         self._refresh_serialport_combobox()
-        messagebox.showinfo("Détection terminée", f"{len(new_ports)} ports détectés, {added} ajoutés à la liste.")
+        return added
+
+    def _detect_and_refresh_ports(self):
+        def done(new_ports):
+            added = self._merge_detected_ports(new_ports)
+            messagebox.showinfo("Détection terminée", f"{len(new_ports)} ports détectés, {added} ajoutés à la liste.")
+        self.tasks.submit("serial_ports", self.detect_serial_ports, on_done=done)
 
     # ---------------- Currency manager ----------------
     def open_currency_manager(self):
@@ -662,30 +809,23 @@ class AdminInterface:
         ttk.Button(btns_frame, text="Fermer", command=dlg.destroy).pack(side=tk.RIGHT)
 
     def _do_detect_fill_listbox(self, listbox_widget):
-        new_ports = self.detect_serial_ports()
-        added = 0
-        for p in new_ports:
-            if p not in self.serial_ports:
-                self.serial_ports.append(p)
-                added += 1
-        self._set_config_json("serial_ports", self.serial_ports)
-        listbox_widget.delete(0, tk.END)
-        for p in self.serial_ports:
-            listbox_widget.insert(tk.END, p)
-        self._refresh_serialport_combobox()
-        messagebox.showinfo("Détecter", f"{len(new_ports)} détectés, {added} nouveaux ajoutés.")
+        listbox_widget.insert(tk.END, LOADING_TEXT)
+
+        def done(new_ports):
+            added = self._merge_detected_ports(new_ports)
+            if not listbox_widget.winfo_exists():
+                return
+            listbox_widget.delete(0, tk.END)
+            for p in self.serial_ports:
+                listbox_widget.insert(tk.END, p)
+            messagebox.showinfo("Détecter", f"{len(new_ports)} détectés, {added} nouveaux ajoutés.")
+        self.tasks.submit("serial_ports", self.detect_serial_ports, on_done=done)
 
     def _refresh_serialport_combobox(self):
         try:
             if not self.serial_ports:
-                detected = self.detect_serial_ports()
-                if detected:
-                    self.serial_ports = detected
-                else:
-                    if platform.system().lower() == "windows":
-                        self.serial_ports = [f"COM{i}" for i in range(1,9)]
-                    else:
-                        self.serial_ports = ["/dev/ttyUSB0", "/dev/ttyACM0"]
+                # cache du watcher (sans E/S) ; sinon une lecture de /dev ou les ports par défaut
+                self.serial_ports = self.port_watcher.ports() or list_serial_ports()
                 self._set_config_json("serial_ports", self.serial_ports)
             if getattr(self, "serial_port_combo", None):
                 self.serial_port_combo['values'] = self.serial_ports
@@ -796,53 +936,38 @@ class AdminInterface:
         # Chargement des données
         self.load_console_groups()
 
-    def load_console_groups(self):
-        try:
-            with self.db.get_connection() as conn:
-                cursor = conn.cursor()
-                cursor.execute(
-                    "CREATE TABLE IF NOT EXISTS console_groups "
-                    "(id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT UNIQUE NOT NULL, icon TEXT, tariffs TEXT)"
-                )
-                cursor.execute("SELECT id, name, icon, tariffs FROM console_groups ORDER BY name")
-                rows = cursor.fetchall()
-
-                if self.console_groups_tree and self.console_groups_tree.winfo_exists():
-                    for item in self.console_groups_tree.get_children():
-                        self.console_groups_tree.delete(item)
-
-                for row in rows:
-                    raw_tariffs = row[3]
-                    if raw_tariffs is None:
-                        tariffs_text = json.dumps([])
-                    elif isinstance(raw_tariffs, str):
-                        try:
-                            json.loads(raw_tariffs)
-                            tariffs_text = raw_tariffs
-                        except Exception:
-                            tariffs_text = json.dumps([])
-                    else:
-                        try:
-                            tariffs_text = json.dumps(raw_tariffs)
-                        except Exception:
-                            tariffs_text = json.dumps([])
+    def load_console_groups(self, select_id=None):
+        """Recharge le catalogue en arrière-plan puis la liste des groupes (sélection : select_id ou 1er)."""
+        self.group_catalog.invalidate()
+        set_tree_loading(self.console_groups_tree)
 
-                    icon_text = row[2] if row[2] is not None else ""
-                    if self.console_groups_tree and self.console_groups_tree.winfo_exists():
-                        self.console_groups_tree.insert("", tk.END, values=(row[0], row[1], icon_text), tags=(tariffs_text,))
-
-                # auto-select first item (if any)
-                if self.console_groups_tree and self.console_groups_tree.get_children():
-                    first = self.console_groups_tree.get_children()[0]
-                    try:
-                        self.console_groups_tree.selection_set(first)
-                        self.console_groups_tree.focus(first)
-                        self.on_console_group_select(None)
-                    except Exception as e:
-                        print(f"[DEBUG] error auto-selecting first console group: {e}")
-        except Exception as e:
+        def on_error(e):
             messagebox.showerror("Erreur BD", f"Impossible de charger les groupes de consoles: {e}")
             print("[DEBUG] load_console_groups exception:", e)
+        self.tasks.submit("console_groups", self.group_catalog.refresh,
+                          on_done=lambda groups: self._fill_console_groups_tree(groups, select_id),
+                          on_error=on_error, scope="section")
+
+    def _fill_console_groups_tree(self, groups, select_id=None):
+        self.load_console_group_names_for_combo()
+        if not (self.console_groups_tree and self.console_groups_tree.winfo_exists()):
+            return
+        clear_tree(self.console_groups_tree)
+        target = None
+        for group in groups:
+            iid = self.console_groups_tree.insert("", tk.END, values=(group["id"], group["name"], group["icon"]))
+            if target is None and select_id is not None and str(group["id"]) == str(select_id):
+                target = iid
+        children = self.console_groups_tree.get_children()
+        if target is None and children:
+            target = children[0]
+        if target is not None:
+            try:
+                self.console_groups_tree.selection_set(target)
+                self.console_groups_tree.focus(target)
+                self.on_console_group_select(None)
+            except Exception as e:
+                print(f"[DEBUG] error auto-selecting console group: {e}")
 
     def add_console_group(self):
         name = self.group_name_entry.get().strip()
@@ -857,15 +982,11 @@ class AdminInterface:
                 if cursor.fetchone()[0] > 0:
                     messagebox.showerror("Erreur", f"Le groupe '{name}' existe déjà.")
                     return
-                cursor.execute(
-                    "INSERT INTO console_groups (name, icon, tariffs) VALUES (?, ?, ?)",
-                    (name, icon, json.dumps([]))
-                )
+                cursor.execute("INSERT INTO console_groups (name, icon) VALUES (?, ?)", (name, icon))
                 conn.commit()
             messagebox.showinfo("Succès", f"Groupe '{name}' ajouté.")
-            self.load_console_groups()
             self.clear_console_group_form()
-            self.load_console_group_names_for_combo()
+            self.load_console_groups()
         except sqlite3.IntegrityError:
             messagebox.showerror("Erreur BD", f"Impossible d'ajouter le groupe '{name}' : nom déjà existant (contrainte UNIQUE).")
         except Exception as e:
@@ -896,22 +1017,13 @@ class AdminInterface:
                     messagebox.showerror("Erreur", f"Impossible de renommer : le nom '{name}' est déjà utilisé par un autre groupe.")
                     return
                 cursor.execute("UPDATE console_groups SET name = ?, icon = ? WHERE id = ?", (name, icon, group_id))
+                # grilles indexées par nom de groupe côté gérant
+                bump_config_revision(cursor)
                 conn.commit()
             messagebox.showinfo("Succès", f"Groupe '{name}' modifié.")
-            self.load_console_groups()
-            # reselect same id if present
-            for iid in self.console_groups_tree.get_children():
-                vals = self.console_groups_tree.item(iid, 'values')
-                if str(vals[0]) == str(group_id):
-                    try:
-                        self.console_groups_tree.selection_set(iid)
-                        self.console_groups_tree.focus(iid)
-                        self.on_console_group_select(None)
-                    except:
-                        pass
-                    break
             self.clear_console_group_form()
-            self.load_console_group_names_for_combo()
+            # recharge puis resélectionne le même groupe
+            self.load_console_groups(select_id=group_id)
         except sqlite3.IntegrityError:
             messagebox.showerror("Erreur BD", "Impossible de modifier le groupe : conflit de nom (contrainte UNIQUE).")
         except Exception as e:
@@ -932,32 +1044,15 @@ class AdminInterface:
         if messagebox.askyesno("Confirmer Suppression", f"Êtes-vous sûr de vouloir supprimer le groupe '{group_name}' ?"):
             try:
                 with self.db.get_connection() as conn:
+                    # FK : sorties du groupe -> group_id NULL, tarifs du groupe supprimés
+                    enable_foreign_keys(conn)
                     cursor = conn.cursor()
-                    # remove group references from physical_postes.outputs if present
-                    cursor.execute("SELECT id, outputs FROM physical_postes")
-                    physicals = cursor.fetchall()
-                    for p in physicals:
-                        pid = p[0]
-                        outs_raw = p[1]
-                        if not outs_raw:
-                            continue
-                        try:
-                            outs = json.loads(outs_raw)
-                        except Exception:
-                            outs = []
-                        modified = False
-                        for o in outs:
-                            if o.get('group_id') == int(group_id):
-                                o['group_id'] = None
-                                modified = True
-                        if modified:
-                            cursor.execute("UPDATE physical_postes SET outputs = ? WHERE id = ?", (json.dumps(outs), pid))
                     cursor.execute("DELETE FROM console_groups WHERE id = ?", (group_id,))
+                    bump_config_revision(cursor)
                     conn.commit()
                     messagebox.showinfo("Succès", f"Groupe '{group_name}' supprimé.")
-                    self.load_console_groups()
                     self.clear_console_group_form()
-                    self.load_console_group_names_for_combo()
+                    self.load_console_groups()
             except Exception as e:
                 messagebox.showerror("Erreur BD", f"Impossible de supprimer le groupe: {e}")
                 print("[DEBUG] delete_console_group exception:", e)
@@ -980,6 +1075,8 @@ class AdminInterface:
                 sel = self.console_groups_tree.selection()
             except Exception:
                 sel = []
+            if sel and is_loading_row(self.console_groups_tree, sel[0]):
+                return
             if sel:
                 selected_item = sel[0]
                 values = self.console_groups_tree.item(selected_item, 'values')
@@ -998,16 +1095,11 @@ class AdminInterface:
                             self.group_icon_custom_entry.insert(0, icon_value)
                 except Exception:
                     pass
-                tariffs_json = None
-                try:
-                    tags = self.console_groups_tree.item(selected_item, 'tags')
-                    tariffs_json = tags[0] if tags else None
-                except Exception:
-                    tariffs_json = None
+                group_id = values[0]
                 if hasattr(self, 'tariffs_tree') and self.tariffs_tree and self.tariffs_tree.winfo_exists():
-                    self.load_tariffs_for_group(tariffs_json)
+                    self.load_tariffs_for_group(group_id)
                 else:
-                    self.root.after(50, lambda: self._safe_load_tariffs_after_widget_ready(tariffs_json))
+                    self.root.after(50, lambda: self._safe_load_tariffs_after_widget_ready(group_id))
             else:
                 self.clear_console_group_form()
                 self.clear_tariffs_tree()
@@ -1015,10 +1107,10 @@ class AdminInterface:
             messagebox.showerror("Erreur", f"Erreur sélection groupe: {e}")
             print("[DEBUG] on_console_group_select exception:", e)
 
-    def _safe_load_tariffs_after_widget_ready(self, tariffs_json):
+    def _safe_load_tariffs_after_widget_ready(self, group_id):
         try:
             if hasattr(self, 'tariffs_tree') and self.tariffs_tree and self.tariffs_tree.winfo_exists():
-                self.load_tariffs_for_group(tariffs_json)
+                self.load_tariffs_for_group(group_id)
             else:
                 print("[DEBUG] tariffs_tree not ready yet in _safe_load_tariffs_after_widget_ready")
         except Exception as e:
@@ -1041,33 +1133,17 @@ class AdminInterface:
             del self.selected_group_id
         self.clear_tariffs_tree()
 
-    def load_tariffs_for_group(self, tariffs_json):
+    def load_tariffs_for_group(self, group_id):
+        """Affiche la grille du groupe (group_tariffs, déjà triée par montant)."""
         self.clear_tariffs_tree()
+        if group_id is None:
+            return
         try:
-            tariffs = []
-            if tariffs_json is None:
-                tariffs = []
-            elif isinstance(tariffs_json, list):
-                tariffs = tariffs_json
-            elif isinstance(tariffs_json, str):
-                try:
-                    tariffs = json.loads(tariffs_json)
-                    if not isinstance(tariffs, list):
-                        tariffs = []
-                except Exception:
-                    tariffs = []
-            else:
-                try:
-                    tariffs = json.loads(json.dumps(tariffs_json))
-                    if not isinstance(tariffs, list):
-                        tariffs = []
-                except Exception:
-                    tariffs = []
-            tariffs_sorted = sorted(tariffs, key=lambda x: x.get('montant', 0) if isinstance(x, dict) else 0)
-            for tariff in tariffs_sorted:
-                montant = tariff.get('montant', 0) if isinstance(tariff, dict) else 0
-                minutes = tariff.get('minutes', 0) if isinstance(tariff, dict) else 0
-                if hasattr(self, 'tariffs_tree') and self.tariffs_tree and self.tariffs_tree.winfo_exists():
+            with self.db.get_connection() as conn:
+                rows = list_tariffs(conn.cursor(), group_id)
+            conn.close()
+            if hasattr(self, 'tariffs_tree') and self.tariffs_tree and self.tariffs_tree.winfo_exists():
+                for montant, minutes in rows:
                     self.tariffs_tree.insert("", tk.END, values=(montant, minutes))
         except Exception as e:
             messagebox.showerror("Erreur", f"Erreur chargement tarifs: {e}")
@@ -1092,28 +1168,15 @@ class AdminInterface:
             messagebox.showerror("Erreur", "Montant et minutes doivent être > 0.")
             return
         group_id = self.console_groups_tree.item(selected_item, 'values')[0]
-        try:
-            tags = self.console_groups_tree.item(selected_item, 'tags')
-            tariffs_json = tags[0] if tags else json.dumps([])
-        except Exception:
-            tariffs_json = json.dumps([])
-        try:
-            tariffs = json.loads(tariffs_json) if tariffs_json else []
-        except Exception:
-            tariffs = []
-        if any(isinstance(t, dict) and t.get('montant') == montant for t in tariffs):
-            messagebox.showerror("Erreur", "Ce montant existe déjà dans la grille tarifaire.")
-            return
-        tariffs.append({"montant": montant, "minutes": minutes})
-        tariffs.sort(key=lambda x: x['montant'])
         try:
             with self.db.get_connection() as conn:
-                cursor = conn.cursor()
-                cursor.execute("UPDATE console_groups SET tariffs = ? WHERE id = ?", (json.dumps(tariffs), group_id))
+                add_tariff(conn.cursor(), group_id, montant, minutes)
                 conn.commit()
-            self.console_groups_tree.item(selected_item, tags=(json.dumps(tariffs),))
-            self.load_tariffs_for_group(json.dumps(tariffs))
+            self.group_catalog.invalidate()
+            self.load_tariffs_for_group(group_id)
             messagebox.showinfo("Succès", "Tarif ajouté.")
+        except sqlite3.IntegrityError:
+            messagebox.showerror("Erreur", "Ce montant existe déjà dans la grille tarifaire.")
         except Exception as e:
             messagebox.showerror("Erreur BD", f"Impossible d'ajouter le tarif: {e}")
             print("[DEBUG] add_tariff_entry exception:", e)
@@ -1151,29 +1214,15 @@ class AdminInterface:
             messagebox.showerror("Erreur", "Montant et minutes doivent être > 0.")
             return
         group_id = self.console_groups_tree.item(group_item, 'values')[0]
-        try:
-            tags = self.console_groups_tree.item(group_item, 'tags')
-            tariffs_json = tags[0] if tags else json.dumps([])
-        except Exception:
-            tariffs_json = json.dumps([])
-        try:
-            tariffs = json.loads(tariffs_json) if tariffs_json else []
-        except Exception:
-            tariffs = []
-        tariffs = [t for t in tariffs if not (isinstance(t, dict) and t.get('montant') == old_montant)]
-        if any(isinstance(t, dict) and t.get('montant') == new_montant for t in tariffs):
-            messagebox.showerror("Erreur", "Le nouveau montant existe déjà dans la grille tarifaire.")
-            return
-        tariffs.append({"montant": new_montant, "minutes": new_minutes})
-        tariffs.sort(key=lambda x: x['montant'])
         try:
             with self.db.get_connection() as conn:
-                cursor = conn.cursor()
-                cursor.execute("UPDATE console_groups SET tariffs = ? WHERE id = ?", (json.dumps(tariffs), group_id))
+                update_tariff(conn.cursor(), group_id, old_montant, new_montant, new_minutes)
                 conn.commit()
-            self.console_groups_tree.item(group_item, tags=(json.dumps(tariffs),))
-            self.load_tariffs_for_group(json.dumps(tariffs))
+            self.group_catalog.invalidate()
+            self.load_tariffs_for_group(group_id)
             messagebox.showinfo("Succès", "Tarif modifié.")
+        except sqlite3.IntegrityError:
+            messagebox.showerror("Erreur", "Le nouveau montant existe déjà dans la grille tarifaire.")
         except Exception as e:
             messagebox.showerror("Erreur BD", f"Impossible de modifier le tarif: {e}")
             print("[DEBUG] update_tariff_entry exception:", e)
@@ -1195,23 +1244,12 @@ class AdminInterface:
         montant_to_delete = self.tariffs_tree.item(tariff_item, 'values')[0]
         if messagebox.askyesno("Confirmer Suppression", f"Supprimer le tarif de {montant_to_delete} FCFA ?"):
             group_id = self.console_groups_tree.item(group_item, 'values')[0]
-            try:
-                tags = self.console_groups_tree.item(group_item, 'tags')
-                tariffs_json = tags[0] if tags else json.dumps([])
-            except Exception:
-                tariffs_json = json.dumps([])
-            try:
-                tariffs = json.loads(tariffs_json) if tariffs_json else []
-            except Exception:
-                tariffs = []
-            tariffs = [t for t in tariffs if not (isinstance(t, dict) and t.get('montant') == montant_to_delete)]
             try:
                 with self.db.get_connection() as conn:
-                    cursor = conn.cursor()
-                    cursor.execute("UPDATE console_groups SET tariffs = ? WHERE id = ?", (json.dumps(tariffs), group_id))
+                    delete_tariff(conn.cursor(), group_id, montant_to_delete)
                     conn.commit()
-                self.console_groups_tree.item(group_item, tags=(json.dumps(tariffs),))
-                self.load_tariffs_for_group(json.dumps(tariffs))
+                self.group_catalog.invalidate()
+                self.load_tariffs_for_group(group_id)
                 messagebox.showinfo("Succès", "Tarif supprimé.")
             except Exception as e:
                 messagebox.showerror("Erreur BD", f"Impossible de supprimer le tarif: {e}")
@@ -1229,6 +1267,7 @@ class AdminInterface:
             print("[DEBUG] clear_tariffs_tree exception:", e)
 
     def reorder_tariffs_current_group(self):
+        """La grille est lue triée par montant (clé de group_tariffs) : simple rechargement."""
         try:
             sel = self.console_groups_tree.selection()
         except Exception:
@@ -1236,28 +1275,8 @@ class AdminInterface:
         if not sel:
             messagebox.showerror("Erreur", "Sélectionnez un groupe d'abord.")
             return
-        selected_item = sel[0]
-        try:
-            tags = self.console_groups_tree.item(selected_item, 'tags')
-            tariffs_json = tags[0] if tags else json.dumps([])
-        except Exception:
-            tariffs_json = json.dumps([])
-        try:
-            tariffs = json.loads(tariffs_json) if tariffs_json else []
-        except Exception:
-            tariffs = []
-        tariffs.sort(key=lambda x: x.get('montant', 0) if isinstance(x, dict) else 0)
-        try:
-            with self.db.get_connection() as conn:
-                cursor = conn.cursor()
-                cursor.execute("UPDATE console_groups SET tariffs = ? WHERE id = ?", (json.dumps(tariffs), self.console_groups_tree.item(selected_item, 'values')[0]))
-                conn.commit()
-            self.console_groups_tree.item(selected_item, tags=(json.dumps(tariffs),))
-            self.load_tariffs_for_group(json.dumps(tariffs))
-            messagebox.showinfo("Réordonné", "Tarifs réordonnés par montant.")
-        except Exception as e:
-            messagebox.showerror("Erreur BD", f"Impossible de réordonner : {e}")
-            print("[DEBUG] reorder_tariffs_current_group exception:", e)
+        self.load_tariffs_for_group(self.console_groups_tree.item(sel[0], 'values')[0])
+        messagebox.showinfo("Réordonné", "Tarifs réordonnés par montant.")
 
     # ---------------- Physical postes ----------------
     def create_physical_postes_section(self, parent):
@@ -1370,86 +1389,75 @@ class AdminInterface:
             except Exception:
                 pass
 
+    def _fetch_physical_postes(self):
+        """Thread de chargement : [(id, numero, nom, libellé des sorties)]."""
+        with self.db.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("CREATE TABLE IF NOT EXISTS physical_postes (id INTEGER PRIMARY KEY AUTOINCREMENT, numero INTEGER UNIQUE NOT NULL, nom TEXT NOT NULL, console_group_ids TEXT, switch_port INTEGER, outputs TEXT)")
+            # au plus 2 requêtes quel que soit le nombre de postes / sorties :
+            # groupes (si le catalogue a été invalidé) + postes ; noms résolus en mémoire
+            self.group_catalog.ensure_loaded(cursor)
+            cursor.execute("""
+                SELECT pp.id, pp.numero, pp.nom, o.type, o.switch_port, o.group_id
+                  FROM physical_postes pp
+                  LEFT JOIN poste_outputs o ON o.poste_id = pp.id
+                 ORDER BY pp.numero, o.output_index
+            """)
+            rows = cursor.fetchall()
+        conn.close()
+        postes = {}
+        for pid, numero, nom, typ, sw, gid in rows:
+            entry = postes.setdefault(pid, (numero, nom, []))
+            if typ is not None:
+                gname = self.group_catalog.name(gid)
+                entry[2].append(f"[{typ} port:{sw if sw is not None else '?'} groupe:{gname}]")
+        return [(pid, numero, nom, " ".join(outs) if outs else "(aucune sortie configurée)")
+                for pid, (numero, nom, outs) in postes.items()]
+
     def load_physical_postes(self, select_id=None):
-        try:
-            for item in self.physical_postes_tree.get_children():
-                self.physical_postes_tree.delete(item)
-            with self.db.get_connection() as conn:
-                cursor = conn.cursor()
-                cursor.execute("CREATE TABLE IF NOT EXISTS physical_postes (id INTEGER PRIMARY KEY AUTOINCREMENT, numero INTEGER UNIQUE NOT NULL, nom TEXT NOT NULL, console_group_ids TEXT, switch_port INTEGER, outputs TEXT)")
-                cursor.execute("SELECT id, numero, nom, outputs FROM physical_postes ORDER BY numero")
-                rows = cursor.fetchall()
-                for row in rows:
-                    pid, numero, nom, outputs_raw = row
-                    try:
-                        outputs = json.loads(outputs_raw) if outputs_raw else []
-                    except Exception:
-                        outputs = []
-                    out_strings = []
-                    for o in outputs:
-                        typ = o.get('type', '?')
-                        sw = o.get('switch_port', '?')
-                        gid = o.get('group_id', None)
-                        gname = ''
-                        if gid:
-                            try:
-                                cursor.execute("SELECT name FROM console_groups WHERE id = ?", (gid,))
-                                r = cursor.fetchone()
-                                gname = r[0] if r else ''
-                            except Exception:
-                                gname = ''
-                        out_strings.append(f"[{typ} port:{sw} groupe:{gname}]")
-                    if not out_strings:
-                        out_strings = ["(aucune sortie configurée)"]
-                    self.physical_postes_tree.insert("", tk.END, values=(pid, numero, nom, " ".join(out_strings)), tags=(outputs_raw if outputs_raw else json.dumps([]),))
-            if select_id:
-                for iid in self.physical_postes_tree.get_children():
-                    vals = self.physical_postes_tree.item(iid, 'values')
-                    if vals and str(vals[0]) == str(select_id):
-                        self.physical_postes_tree.selection_set(iid)
-                        self.physical_postes_tree.focus(iid)
-                        try:
-                            self.physical_postes_tree.see(iid)
-                        except Exception:
-                            pass
-                        break
-            # ensure delete/edit button disabled if nothing selected
-            cur_sel = self.physical_postes_tree.selection()
-            if not cur_sel:
+        set_tree_loading(self.physical_postes_tree)
+
+        def on_error(e):
+            messagebox.showerror("Erreur BD", f"Impossible de charger les postes physiques: {e}")
+            print("[DEBUG] load_physical_postes exception:", e)
+        self.tasks.submit("physical_postes", self._fetch_physical_postes,
+                          on_done=lambda rows: self._fill_physical_postes_tree(rows, select_id),
+                          on_error=on_error, scope="section")
+
+    def _fill_physical_postes_tree(self, rows, select_id=None):
+        if not (self.physical_postes_tree and self.physical_postes_tree.winfo_exists()):
+            return
+        clear_tree(self.physical_postes_tree)
+        for values in rows:
+            iid = self.physical_postes_tree.insert("", tk.END, values=values)
+            if select_id and str(values[0]) == str(select_id):
+                self.physical_postes_tree.selection_set(iid)
+                self.physical_postes_tree.focus(iid)
                 try:
-                    self.delete_poste_btn.state(['disabled'])
-                    self.edit_poste_btn.state(['disabled'])
+                    self.physical_postes_tree.see(iid)
                 except Exception:
                     pass
-        except Exception as e:
-            messagebox.showerror("Erreur BD", f"Impossible de charger les postes physiques: {e}")
-            print("[DEBUG] load_physical_postes exception:", e)
+        # ensure delete/edit button disabled if nothing selected
+        if not self.physical_postes_tree.selection():
+            try:
+                self.delete_poste_btn.state(['disabled'])
+                self.edit_poste_btn.state(['disabled'])
+            except Exception:
+                pass
 
     def _get_console_group_names_from_ids(self, group_ids):
-        names = []
         try:
-            with self.db.get_connection() as conn:
-                cursor = conn.cursor()
-                for gid in group_ids:
-                    cursor.execute("SELECT name FROM console_groups WHERE id = ?", (gid,))
-                    result = cursor.fetchone()
-                    if result:
-                        names.append(result[0])
+            return self.group_catalog.names(group_ids)
         except Exception as e:
             print(f"Erreur récupération noms de groupes: {e}")
-        return names
+            return []
 
     def load_console_group_names_for_combo(self):
         group_names = []
-        id_map = {}
         try:
-            with self.db.get_connection() as conn:
-                cursor = conn.cursor()
-                cursor.execute("SELECT id, name FROM console_groups ORDER BY name")
-                pairs = cursor.fetchall()
-                group_names = [r[1] for r in pairs]
-                id_map = {r[1]: r[0] for r in pairs}
-                self._console_group_id_name_pairs = id_map
+            groups = self.group_catalog.groups()
+            group_names = [g["name"] for g in groups]
+            self._console_group_id_name_pairs = {g["name"]: g["id"] for g in groups}
         except Exception as e:
             print(f"Erreur chargement noms de groupes pour combobox: {e}")
             self._console_group_id_name_pairs = {}
@@ -1513,10 +1521,11 @@ class AdminInterface:
                 if cursor.fetchone()[0] > 0:
                     messagebox.showerror("Erreur", f"Le poste numéro {numero} existe déjà.")
                     return
-                cursor.execute("INSERT INTO physical_postes (numero, nom, console_group_ids, switch_port, outputs) VALUES (?, ?, ?, ?, ?)",
-                               (numero, nom, json.dumps([]), None, json.dumps(outputs)))
-                conn.commit()
+                cursor.execute("INSERT INTO physical_postes (numero, nom, console_group_ids, switch_port) VALUES (?, ?, ?, ?)",
+                               (numero, nom, json.dumps([]), None))
                 last_id = cursor.lastrowid
+                set_poste_outputs(cursor, last_id, outputs)
+                conn.commit()
                 messagebox.showinfo("Succès", f"Poste '{nom}' ajouté.")
                 self.clear_physical_poste_form()
                 self.load_physical_postes(select_id=last_id)
@@ -1580,7 +1589,8 @@ class AdminInterface:
                 if cursor.fetchone()[0] > 0:
                     messagebox.showerror("Erreur", f"Le poste numéro {numero} existe déjà pour un autre ID.")
                     return
-                cursor.execute("UPDATE physical_postes SET numero = ?, nom = ?, outputs = ? WHERE id = ?", (numero, nom, json.dumps(outputs), poste_id))
+                cursor.execute("UPDATE physical_postes SET numero = ?, nom = ?, outputs = NULL WHERE id = ?", (numero, nom, poste_id))
+                set_poste_outputs(cursor, poste_id, outputs)
                 conn.commit()
                 messagebox.showinfo("Succès", f"Poste '{nom}' modifié.")
                 self.clear_physical_poste_form()
@@ -1639,6 +1649,7 @@ class AdminInterface:
 
         try:
             with self.db.get_connection() as conn:
+                enable_foreign_keys(conn)   # sorties supprimées en cascade
                 cursor = conn.cursor()
                 cursor.execute("DELETE FROM physical_postes WHERE id = ?", (poste_id,))
                 conn.commit()
@@ -1688,17 +1699,13 @@ class AdminInterface:
             try:
                 with self.db.get_connection() as conn:
                     cursor = conn.cursor()
-                    cursor.execute("SELECT numero, nom, outputs FROM physical_postes WHERE id = ?", (pid,))
+                    cursor.execute("SELECT numero, nom FROM physical_postes WHERE id = ?", (pid,))
                     row = cursor.fetchone()
                     if row:
-                        numero, nom, outputs_raw = row
+                        numero, nom = row
                         self.poste_numero_entry.delete(0, tk.END); self.poste_numero_entry.insert(0, str(numero))
                         self.poste_nom_entry.delete(0, tk.END); self.poste_nom_entry.insert(0, nom)
-                        outputs = []
-                        try:
-                            outputs = json.loads(outputs_raw) if outputs_raw else []
-                        except Exception:
-                            outputs = []
+                        outputs = list_poste_outputs(cursor, pid)
                         nb = max(1, len(outputs))
                         if nb > 2: nb = 2
                         try:
@@ -1719,20 +1726,72 @@ class AdminInterface:
                                     w['port_var'].set(str(o.get('switch_port', '')))
                                 except Exception:
                                     pass
-                                try:
-                                    gid = o.get('group_id', None)
-                                    if gid:
-                                        cursor.execute("SELECT name FROM console_groups WHERE id = ?", (gid,))
-                                        r = cursor.fetchone()
-                                        if r:
-                                            w['group_var'].set(r[0])
-                                except Exception:
-                                    pass
+                                gname = self.group_catalog.name(o.get('group_id', None))
+                                if gname:
+                                    w['group_var'].set(gname)
             except Exception as e:
                 messagebox.showerror("Erreur BD", f"Impossible de récupérer les détails du poste: {e}")
                 print("[DEBUG] on_physical_poste_select exception:", e)
 
     # ---------------- User management functions ----------------
+    def _set_user_form_busy(self, busy, text=""):
+        """Boutons du formulaire désactivés pendant le hachage bcrypt (thread de travail)."""
+        state = tk.DISABLED if busy else tk.NORMAL
+        for btn in (self.add_user_btn, self.update_user_btn):
+            try:
+                btn.config(state=state)
+            except tk.TclError:
+                pass
+        if busy:
+            self.status_label.config(text=text)
+
+    def _save_user_worker(self, user_id, username, password, role):
+        """Thread de travail : unicité du nom, hachage (coût configuré) puis INSERT / UPDATE."""
+        with self.db.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT id FROM users WHERE LOWER(username) = ?", (username.lower(),))
+            row = cursor.fetchone()
+        conn.close()
+        if row and (user_id is None or str(row[0]) != str(user_id)):
+            return "exists"
+        hashed = self.hasher.hash(password) if password else None
+        with self.db.get_connection() as conn:
+            cursor = conn.cursor()
+            if user_id is None:
+                cursor.execute("INSERT INTO users (username, password_hash, role) VALUES (?, ?, ?)", (username, hashed, role))
+            elif hashed:
+                cursor.execute("UPDATE users SET username = ?, password_hash = ?, role = ? WHERE id = ?", (username, hashed, role, user_id))
+            else:
+                cursor.execute("UPDATE users SET username = ?, role = ? WHERE id = ?", (username, role, user_id))
+            conn.commit()
+        conn.close()
+        return "saved"
+
+    def _submit_user_save(self, user_id, username, password, role):
+        creating = user_id is None
+
+        def on_done(result):
+            self._set_user_form_busy(False)
+            if result == "exists":
+                self.status_label.config(text="")
+                messagebox.showerror("Erreur", "Ce nom d'utilisateur existe déjà." if creating
+                                     else "Ce nom d'utilisateur est déjà utilisé par un autre compte.")
+                return
+            self.status_label.config(text=f"✅ Utilisateur '{username}' enregistré")
+            messagebox.showinfo("Succès", f"Utilisateur '{username}' créé." if creating else "Utilisateur modifié.")
+            self.clear_user_form()
+            self.load_users()
+
+        def on_error(e):
+            self._set_user_form_busy(False)
+            self.status_label.config(text="")
+            messagebox.showerror("Erreur BD", f"Impossible d'{'ajouter' if creating else 'modifier'} l'utilisateur: {e}")
+            print("[DEBUG] save user exception:", e)
+
+        self._set_user_form_busy(True, "⏳ Chiffrement du mot de passe…" if password else LOADING_TEXT)
+        self.tasks.submit("user_save", self._save_user_worker, user_id, username, password, role,
+                          on_done=on_done, on_error=on_error)
+
     def add_user(self):
         username = self.username_entry.get().strip()
         password = self.password_entry.get()
@@ -1743,82 +1802,26 @@ class AdminInterface:
         if not password:
             messagebox.showerror("Erreur", "Le mot de passe est requis.")
             return
-        try:
-            hashed = bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
-        except Exception:
-            # fallback si bcrypt indisponible pour une raison
-            hashed = password
-        try:
-            with self.db.get_connection() as conn:
-                cursor = conn.cursor()
-                cursor.execute("CREATE TABLE IF NOT EXISTS users (id INTEGER PRIMARY KEY AUTOINCREMENT, username TEXT UNIQUE, password TEXT, role TEXT)")
-                cursor.execute("SELECT COUNT(*) FROM users WHERE LOWER(username) = ?", (username.lower(),))
-                if cursor.fetchone()[0] > 0:
-                    messagebox.showerror("Erreur", "Ce nom d'utilisateur existe déjà.")
-                    return
-                cursor.execute("INSERT INTO users (username, password, role) VALUES (?, ?, ?)", (username, hashed, role))
-                conn.commit()
-            messagebox.showinfo("Succès", f"Utilisateur '{username}' créé.")
-            self.clear_user_form()
-            self.load_users()
-        except Exception as e:
-            messagebox.showerror("Erreur BD", f"Impossible d'ajouter l'utilisateur: {e}")
-            print("[DEBUG] add_user exception:", e)
+        self._submit_user_save(None, username, password, role)
 
     def update_user(self):
-        sel = self.users_tree.selection()
-        if not sel:
+        if not self.selected_user:
             messagebox.showerror("Erreur", "Sélectionnez un utilisateur à modifier.")
             return
-        user_item = sel[0]
-        vals = self.users_tree.item(user_item, 'values')
-        if not vals:
-            messagebox.showerror("Erreur", "Impossible de récupérer l'utilisateur sélectionné.")
-            return
-        user_id = vals[0]
+        user_id = self.selected_user[0]
         username = self.username_entry.get().strip()
         password = self.password_entry.get()
         role = self.role_var.get().strip() or "manager"
         if not username:
             messagebox.showerror("Erreur", "Le nom d'utilisateur est requis.")
             return
-        try:
-            with self.db.get_connection() as conn:
-                cursor = conn.cursor()
-                # check unique username
-                cursor.execute("SELECT id FROM users WHERE LOWER(username) = ?", (username.lower(),))
-                row = cursor.fetchone()
-                if row and str(row[0]) != str(user_id):
-                    messagebox.showerror("Erreur", "Ce nom d'utilisateur est déjà utilisé par un autre compte.")
-                    return
-                if password:
-                    try:
-                        hashed = bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
-                    except Exception:
-                        hashed = password
-                    cursor.execute("UPDATE users SET username = ?, password = ?, role = ? WHERE id = ?", (username, hashed, role, user_id))
-                else:
-                    cursor.execute("UPDATE users SET username = ?, role = ? WHERE id = ?", (username, role, user_id))
-                conn.commit()
-            messagebox.showinfo("Succès", "Utilisateur modifié.")
-            self.clear_user_form()
-            self.load_users()
-        except Exception as e:
-            messagebox.showerror("Erreur BD", f"Impossible de modifier l'utilisateur: {e}")
-            print("[DEBUG] update_user exception:", e)
+        self._submit_user_save(user_id, username, password, role)
 
     def delete_user(self):
-        sel = self.users_tree.selection()
-        if not sel:
+        if not self.selected_user:
             messagebox.showerror("Erreur", "Sélectionnez un utilisateur à supprimer.")
             return
-        user_item = sel[0]
-        vals = self.users_tree.item(user_item, 'values')
-        if not vals:
-            messagebox.showerror("Erreur", "Impossible de récupérer l'utilisateur sélectionné.")
-            return
-        user_id = vals[0]
-        username = vals[1] if len(vals) > 1 else str(user_id)
+        user_id, username = self.selected_user
         if not messagebox.askyesno("Confirmer", f"Supprimer l'utilisateur '{username}' ?"):
             return
         try:
@@ -1834,22 +1837,10 @@ class AdminInterface:
             print("[DEBUG] delete_user exception:", e)
 
     def load_users(self):
-        try:
-            with self.db.get_connection() as conn:
-                cursor = conn.cursor()
-                cursor.execute("CREATE TABLE IF NOT EXISTS users (id INTEGER PRIMARY KEY AUTOINCREMENT, username TEXT UNIQUE, password TEXT, role TEXT)")
-                cursor.execute("SELECT id, username, role FROM users ORDER BY username")
-                rows = cursor.fetchall()
-            # clear tree
-            if self.users_tree and self.users_tree.winfo_exists():
-                for i in self.users_tree.get_children():
-                    self.users_tree.delete(i)
-                for r in rows:
-                    self.users_tree.insert("", tk.END, values=(r[0], r[1], r[2]))
-        except Exception as e:
-            print("[DEBUG] load_users exception:", e)
+        self.users_list.reload()
 
     def clear_user_form(self):
+        self.selected_user = None
         try:
             self.username_entry.delete(0, tk.END)
         except Exception:
@@ -1870,19 +1861,21 @@ class AdminInterface:
 
     def on_user_select(self, event):
         sel = self.users_tree.selection()
-        if not sel:
+        if not sel or is_loading_row(self.users_tree, sel[0]):
             return
-        item = sel[0]
-        vals = self.users_tree.item(item, 'values')
-        if vals:
-            try:
-                self.username_entry.delete(0, tk.END)
-                self.username_entry.insert(0, vals[1])
-                self.role_combo.set(vals[2])
-                # do not prefill password for security
-                self.password_entry.delete(0, tk.END)
-            except Exception:
-                pass
+        row = self.users_list.row_for_item(sel[0])
+        # même utilisateur re-sélectionné par la liste (retour dans la vue) : saisie en cours conservée
+        if not row or (self.selected_user and row[0] == self.selected_user[0]):
+            return
+        self.selected_user = (row[0], row[1])
+        try:
+            self.username_entry.delete(0, tk.END)
+            self.username_entry.insert(0, row[1])
+            self.role_combo.set(row[2])
+            # do not prefill password for security
+            self.password_entry.delete(0, tk.END)
+        except Exception:
+            pass
 
     # ---------------- Settings load/save helpers ----------------
     def _load_lists_from_config(self):
@@ -1908,6 +1901,9 @@ class AdminInterface:
         Cette fonction est appelée chaque fois qu'une section/sous-section est affichée.
         """
         try:
+            # relecture seulement si un autre processus a modifié la configuration
+            if self.config_store.revision_changed():
+                self._load_lists_from_config()
             # generic: currency
             if getattr(self, "devise_var", None):
                 cfg_devise = self._get_config("devise", None)
@@ -2135,48 +2131,51 @@ class AdminInterface:
         ttk.Label(search_frame, text="Utilisateur (ID) (optionnel):", style="Light.TLabel").pack(side=tk.LEFT)
         user_id_entry = ttk.Entry(search_frame, width=10)
         user_id_entry.pack(side=tk.LEFT, padx=(6,6))
-        ttk.Label(search_frame, text="Limite:", style="Light.TLabel").pack(side=tk.LEFT, padx=(8,6))
-        limit_var = tk.IntVar(value=200)
-        limit_entry = ttk.Entry(search_frame, textvariable=limit_var, width=6)
-        limit_entry.pack(side=tk.LEFT)
+        count_label = ttk.Label(search_frame, text="", style="Light.TLabel")
+        # liste virtuelle : seules les pages visibles sont lues, tri SQL par clic sur l'en-tête
+        columns = ("created_at", "user_id", "minutes_delta", "source", "balance_after", "reference", "notes")
+        headings = ("Date", "Utilisateur", "Delta (min)", "Source", "Solde après", "Référence", "Notes")
+        tree_frame = ttk.Frame(frm)
+        tree_frame.pack(fill=tk.BOTH, expand=True)
+        tree = ttk.Treeview(tree_frame, columns=columns, show="headings", selectmode="browse")
+        for col, text, width in zip(columns, headings, (140, 80, 80, 100, 80, 140, 200)):
+            tree.heading(col, text=text, anchor=tk.W)
+            tree.column(col, width=width, stretch=(col == "notes"))
+        vs = ttk.Scrollbar(tree_frame, orient="vertical")
+        vs.pack(side=tk.RIGHT, fill=tk.Y)
+        tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        index = {c: i for i, c in enumerate(HISTORY_COLUMNS)}
+        fmt = lambda row: tuple("" if row[index[c]] is None else row[index[c]] for c in columns)
+
+        def show_count(total):
+            if count_label.winfo_exists():
+                count_label.config(text=f"{total} transaction(s)" if total else "Aucune transaction trouvée.")
+        vlist = VirtualTreeview(tree, vs, self.bonus_manager.history_query(), runner=self.tasks,
+                                name="bonus_history", format_row=fmt, on_count=show_count)
+
         def do_load_history():
             try:
                 uid_txt = user_id_entry.get().strip()
                 uid = int(uid_txt) if uid_txt else None
-                limit = int(limit_entry.get())
             except Exception:
                 messagebox.showerror("Erreur", "Paramètres invalides.")
                 return
-            try:
-                rows = self.bonus_manager.list_bonus_history(user_id=uid, limit=limit, offset=0)
-            except Exception as e:
-                messagebox.showerror("Erreur", f"Impossible de récupérer l'historique : {e}")
-                return
-            text.delete("1.0", tk.END)
-            if not rows:
-                text.insert(tk.END, "Aucune transaction trouvée.\n")
-                return
-            for r in rows:
-                text.insert(tk.END, f"{r['created_at']} | user:{r['user_id']} | delta:{r['minutes_delta']} | source:{r['source']} | balance_after:{r.get('balance_after')} | ref:{r.get('reference')} | notes:{r.get('notes')}\n")
+            vlist.set_source(self.bonus_manager.history_query(user_id=uid))
         ttk.Button(search_frame, text="Charger", command=do_load_history).pack(side=tk.LEFT, padx=(8,0))
-        # text
-        text = tk.Text(frm, wrap=tk.NONE)
-        text.pack(fill=tk.BOTH, expand=True)
-        vs = ttk.Scrollbar(frm, orient="vertical", command=text.yview)
-        vs.pack(side=tk.RIGHT, fill=tk.Y)
-        text.config(yscrollcommand=vs.set)
+        count_label.pack(side=tk.LEFT, padx=(12,0))
+        do_load_history()
 
     def _save_bonus_simples_settings(self):
         try:
+            changes = {}
             # Bonus enabled
             be = 1 if getattr(self, "bonus_enabled_var", None) and self.bonus_enabled_var.get() else 0
-            self._set_config("bonus_enabled", str(be))
+            changes["bonus_enabled"] = str(be)
             # fcfa per min
             if getattr(self, "bonus_fcfa_entry", None):
                 val = self.bonus_fcfa_entry.get().strip()
                 try:
-                    ival = int(val)
-                    self._set_config("bonus_fcfa_per_minute", str(ival))
+                    changes["bonus_fcfa_per_minute"] = str(int(val))
                 except Exception:
                     messagebox.showerror("Erreur", "Valeur FCFA par minute invalide (doit être un entier).")
                     return
@@ -2185,7 +2184,7 @@ class AdminInterface:
                 r = self.bonus_rounding_combo.get().strip() or "floor"
                 if r not in ("floor", "ceil", "none"):
                     r = "floor"
-                self._set_config("bonus_rounding", r)
+                changes["bonus_rounding"] = r
             # apply_on
             apply_on = []
             if getattr(self, "bonus_apply_achats_var", None) and self.bonus_apply_achats_var.get():
@@ -2194,17 +2193,19 @@ class AdminInterface:
                 apply_on.append("prolongations")
             if getattr(self, "bonus_apply_recharge_var", None) and self.bonus_apply_recharge_var.get():
                 apply_on.append("recharges")
-            self._set_config_json("bonus_apply_on", apply_on)
+            changes["bonus_apply_on"] = apply_on
             # welcome bonus
             we = 1 if getattr(self, "welcome_enabled_var", None) and self.welcome_enabled_var.get() else 0
-            self._set_config("welcome_bonus_enabled", str(we))
+            changes["welcome_bonus_enabled"] = str(we)
             if getattr(self, "welcome_minutes_entry", None):
                 try:
-                    wm = int(self.welcome_minutes_entry.get().strip())
-                    self._set_config("welcome_bonus_minutes", str(wm))
+                    changes["welcome_bonus_minutes"] = str(int(self.welcome_minutes_entry.get().strip()))
                 except Exception:
                     messagebox.showerror("Erreur", "Minutes de bienvenue invalides (entier).")
                     return
+            # validation complète avant écriture : rien n'est enregistré si une valeur est invalide
+            if self._save_config(changes) is None:
+                return
 
             messagebox.showinfo("Succès", "Paramètres Bonus Simples sauvegardés.")
             # reload into manager if possible
@@ -2238,42 +2239,42 @@ class AdminInterface:
     # ---------------- autres fonctions (utilisateurs, settings, save, logout, etc.) ----------------
     def save_general_settings(self):
         try:
-            with self.db.get_connection() as conn:
-                cursor = conn.cursor()
-                def save_param(key, value):
-                    cursor.execute("INSERT OR REPLACE INTO config (cle, valeur) VALUES (?, ?)", (key, value))
-                self._set_config_json("currencies", self.currencies)
-                self._set_config_json("serial_ports", self.serial_ports)
-                for key, entry_widget in self.settings_entries.items():
-                    if not entry_widget:
-                        continue
-                    if isinstance(entry_widget, ttk.Combobox):
-                        value = entry_widget.get()
-                    elif isinstance(entry_widget, tk.Listbox):
-                        continue
-                    else:
-                        try:
-                            value = entry_widget.get().strip()
-                        except:
-                            value = str(entry_widget)
-                    if key == 'devise' and value and value not in self.currencies:
-                        self.currencies.append(value)
-                        self._set_config_json("currencies", self.currencies)
-                    if key == 'serial_port_active' and value and value not in self.serial_ports:
-                        self.serial_ports.append(value)
-                        self._set_config_json("serial_ports", self.serial_ports)
-                    save_param(key, value)
-                baud = self.baud_rate_combo.get() if getattr(self, "baud_rate_combo", None) else None
-                if baud:
-                    save_param("baud_rate", baud)
-                std = self.standard_tariff_entry.get() if getattr(self, "standard_tariff_entry", None) else None
-                if std is not None:
-                    save_param("standard_tariff_fcfa_per_6min", std)
-                conn.commit()
-                messagebox.showinfo("Succès", "Tous les paramètres ont été sauvegardés avec succès.")
-                self.status_label.config(text="Paramètres généraux mis à jour.")
-                self._refresh_currency_combobox()
-                self._refresh_serialport_combobox()
+            changes = {}
+            for key, entry_widget in self.settings_entries.items():
+                if not entry_widget:
+                    continue
+                if isinstance(entry_widget, ttk.Combobox):
+                    value = entry_widget.get()
+                elif isinstance(entry_widget, tk.Listbox):
+                    continue
+                else:
+                    try:
+                        value = entry_widget.get().strip()
+                    except:
+                        value = str(entry_widget)
+                if key == 'devise' and value and value not in self.currencies:
+                    self.currencies.append(value)
+                if key == 'serial_port_active' and value and value not in self.serial_ports:
+                    self.serial_ports.append(value)
+                changes[key] = value
+            baud = self.baud_rate_combo.get() if getattr(self, "baud_rate_combo", None) else None
+            if baud:
+                changes["baud_rate"] = baud
+            std = self.standard_tariff_entry.get() if getattr(self, "standard_tariff_entry", None) else None
+            if std is not None:
+                changes["standard_tariff_fcfa_per_6min"] = std
+            changes["currencies"] = self.currencies
+            changes["serial_ports"] = self.serial_ports
+            # une transaction, seules les clés modifiées sont écrites
+            plan = self._save_config(changes)
+            if plan is None:
+                return
+            n = len(plan["added"]) + len(plan["changed"])
+            messagebox.showinfo("Succès", "Tous les paramètres ont été sauvegardés avec succès." if n
+                                else "Aucun paramètre modifié.")
+            self.status_label.config(text=f"Paramètres généraux mis à jour ({n} modifié(s)).")
+            self._refresh_currency_combobox()
+            self._refresh_serialport_combobox()
         except Exception as e:
             messagebox.showerror("Erreur BD", f"Impossible de sauvegarder les paramètres: {e}")
             print("[DEBUG] save_general_settings exception:", e)
@@ -2289,6 +2290,8 @@ class AdminInterface:
                 pass
 
     def on_closing(self):
+        self.tasks.shutdown()
+        self.port_watcher.stop()
         try:
             self.root.destroy()
         except:
@@ -0,0 +1,56 @@
+# interfaces/alert_view.py
+"""
+Affichage des alertes (AlertLog) dans un widget Text, par lots.
+
+- push(entry) ne fait qu'empiler ; un seul flush par frame (after_idle) insère tout le lot
+  en un appel (chaque ligne avec le tag de sa sévérité), puis supprime l'excédent de lignes en un seul delete.
+- Le nombre de lignes est lu via index("end-1c") (O(1)), jamais via get("1.0", END).
+- Couleurs par sévérité (tags Text) : info, warning, error.
+
+Usage:
+    view = AlertView(root, text_widget, max_lines=200)
+    alert_log.add_listener(view.push)
+"""
+
+from typing import Any, Dict, List
+
+SEVERITY_COLORS = {
+    "info": "#ECF0F1",
+    "warning": "#F5B041",
+    "error": "#EC7063",
+}
+
+
+class AlertView:
+    def __init__(self, root, text_widget, max_lines: int = 200, time_format: str = "%H:%M"):
+        self.root = root
+        self.text = text_widget
+        self.max_lines = max_lines
+        self.time_format = time_format
+        self._pending: List[Dict[str, Any]] = []
+        self._flush_id = None
+        for level, color in SEVERITY_COLORS.items():
+            self.text.tag_configure(level, foreground=color)
+
+    def push(self, entry: Dict[str, Any]) -> None:
+        self._pending.append(entry)
+        if self._flush_id is None:
+            try:
+                self._flush_id = self.root.after_idle(self.flush)
+            except Exception:
+                self._flush_id = None
+
+    def flush(self) -> None:
+        self._flush_id = None
+        batch, self._pending = self._pending[-self.max_lines:], []
+        if not batch:
+            return
+        # un seul insert pour tout le lot : texte, tag, texte, tag, ...
+        args = []
+        for entry in batch:
+            args.extend((f"[{entry['at'].strftime(self.time_format)}] {entry['message']}\n", entry["level"]))
+        self.text.insert("end", *args)
+        lines = int(self.text.index("end-1c").split(".")[0]) - 1
+        if lines > self.max_lines:
+            self.text.delete("1.0", f"{lines - self.max_lines + 1}.0")
+        self.text.see("end")
@@ -0,0 +1,117 @@
+# interfaces/card_renderer.py
+"""
+Rendu incrémental des cartes de postes (grille de l'interface gérant).
+
+- Chaque carte est décrite par une "vue" : {clé_widget: {option: valeur}} calculée par l'interface.
+- Le renderer mémorise les valeurs déjà appliquées et ne pousse que les config() qui changent.
+- mark_dirty(pid) : plusieurs changements dans la même frame sont regroupés en un seul flush
+  via root.after_idle.
+
+Options spéciales dans une vue :
+- "_pack": dict d'arguments pack() ou None (pack_forget)
+- "_command_key": identifiant du callback ; "command" n'est reconfiguré que si la clé change
+- toute autre option commençant par "_" est posée comme attribut Python du widget (ex: _original_bg)
+
+Cartes recyclées (interfaces/virtual_grid.py) : rebind(wdict, ancien_pid, nouveau_pid) déplace l'état
+appliqué avec les widgets, de sorte que seul ce qui diffère entre les deux postes est reconfiguré.
+
+Usage:
+    renderer = CardRenderer(root, card_widgets, view_fn=lambda pid: {...})
+    renderer.mark_dirty(pid)     # flush différé (after_idle)
+    renderer.apply(pid)          # application immédiate (création de carte)
+    renderer.rebind(wdict, old_pid, new_pid)
+"""
+
+from typing import Any, Callable, Dict, Hashable, Optional
+
+
+class CardRenderer:
+    def __init__(self, root, card_widgets: Dict[Hashable, Dict[str, Any]], view_fn: Callable[[Hashable], Optional[Dict[str, Dict[str, Any]]]]):
+        self.root = root
+        self.card_widgets = card_widgets
+        self.view_fn = view_fn
+        self._applied: Dict[Hashable, Dict[tuple, Any]] = {}
+        self._dirty = set()
+        self._flush_id = None
+        self.config_calls = 0   # compteur (debug / mesure)
+
+    def mark_dirty(self, pid: Hashable) -> None:
+        self._dirty.add(pid)
+        if self._flush_id is None:
+            try:
+                self._flush_id = self.root.after_idle(self.flush)
+            except Exception:
+                self._flush_id = None
+
+    def mark_all_dirty(self) -> None:
+        for pid in list(self.card_widgets.keys()):
+            self.mark_dirty(pid)
+
+    def forget(self, pid: Hashable) -> None:
+        """Oublie l'état appliqué d'une carte (widgets détruits ou recréés)."""
+        self._applied.pop(pid, None)
+        self._dirty.discard(pid)
+
+    def rebind(self, wdict: Dict[str, Any], old_pid: Optional[Hashable], new_pid: Optional[Hashable]) -> None:
+        """Rattache une carte (widgets) à un autre poste ; None = carte libre (hors vue)."""
+        applied = None
+        if old_pid is not None:
+            applied = self._applied.pop(old_pid, None)
+            self._dirty.discard(old_pid)
+            if self.card_widgets.get(old_pid) is wdict:
+                del self.card_widgets[old_pid]
+        if applied is None:
+            applied = wdict.pop("_applied", None) or {}
+        if new_pid is None:
+            # l'état appliqué voyage avec les widgets jusqu'à leur prochain poste
+            wdict["_applied"] = applied
+            return
+        self.card_widgets[new_pid] = wdict
+        self._applied[new_pid] = applied
+        self.apply(new_pid)
+
+    def flush(self) -> None:
+        self._flush_id = None
+        dirty, self._dirty = self._dirty, set()
+        for pid in dirty:
+            self.apply(pid)
+
+    def apply(self, pid: Hashable) -> None:
+        wdict = self.card_widgets.get(pid)
+        if wdict is None:
+            return
+        view = self.view_fn(pid)
+        if view is None:
+            return
+        applied = self._applied.setdefault(pid, {})
+        for wkey, opts in view.items():
+            widget = wdict.get(wkey)
+            if widget is None:
+                continue
+            changes = {}
+            for opt, value in opts.items():
+                if opt in ("_pack", "command"):
+                    continue
+                if applied.get((wkey, opt), _MISSING) == value:
+                    continue
+                applied[(wkey, opt)] = value
+                if opt == "_command_key":
+                    changes["command"] = opts.get("command")
+                elif opt.startswith("_"):
+                    setattr(widget, opt, value)
+                else:
+                    changes[opt] = value
+            if changes:
+                widget.config(**changes)
+                self.config_calls += 1
+            if "_pack" in opts:
+                pack = opts["_pack"]
+                if applied.get((wkey, "_pack"), _MISSING) != pack:
+                    applied[(wkey, "_pack")] = pack
+                    if pack is None:
+                        widget.pack_forget()
+                    else:
+                        widget.pack(**pack)
+
+
+_MISSING = object()
@@ -0,0 +1,95 @@
+# interfaces/charts.py
+"""
+Graphiques en barres sur Canvas Tk (tableau de bord admin), sans dépendance externe.
+
+- BarChart(canvas, title, colors) : set_data([(libellé, v1[, v2...]), ...]) garde la série et
+  redessine ; un redimensionnement du Canvas redessine depuis la série en cache (aucune requête).
+- Barres groupées si plusieurs valeurs par libellé (ex. bonus émis / consommés), légende `series`.
+- Libellés d'axe éclaircis automatiquement quand ils sont trop nombreux pour la largeur.
+
+Usage:
+    chart = BarChart(canvas, "Occupation par heure (min)", colors=("#3498DB",))
+    chart.set_data([("08h", 120), ("09h", 300)])
+"""
+
+import math
+from typing import Callable, Optional, Sequence, Tuple
+
+PAD_LEFT, PAD_RIGHT, PAD_TOP, PAD_BOTTOM = 48, 12, 28, 36
+
+
+def _format_value(v: float) -> str:
+    v = float(v)
+    if abs(v) >= 1_000_000:
+        return f"{v / 1_000_000:.1f}M"
+    if abs(v) >= 10_000:
+        return f"{v / 1000:.0f}k"
+    return f"{v:.0f}"
+
+
+class BarChart:
+    def __init__(self, canvas, title: str, colors: Sequence[str] = ("#3498DB",),
+                 series: Sequence[str] = (), value_format: Callable[[float], str] = _format_value):
+        self.canvas = canvas
+        self.title = title
+        self.colors = tuple(colors)
+        self.series = tuple(series)
+        self.value_format = value_format
+        self.data: Sequence[Tuple] = ()
+        self.message: Optional[str] = None
+        canvas.bind("<Configure>", lambda e: self.draw(), add="+")
+
+    def set_data(self, data: Sequence[Tuple]) -> None:
+        self.data, self.message = list(data), None
+        self.draw()
+
+    def show_message(self, text: str) -> None:
+        self.data, self.message = (), text
+        self.draw()
+
+    def draw(self) -> None:
+        c = self.canvas
+        try:
+            if not c.winfo_exists():
+                return
+        except Exception:
+            return
+        c.delete("all")
+        w, h = max(c.winfo_width(), 200), max(c.winfo_height(), 120)
+        c.create_text(PAD_LEFT, 6, anchor="nw", text=self.title, font=("Arial", 10, "bold"), fill="#2C3E50")
+        self._draw_legend(w)
+        if self.message or not self.data:
+            c.create_text(w / 2, h / 2, text=self.message or "Aucune donnée sur la période",
+                          font=("Arial", 10), fill="#7F8C8D")
+            return
+        n_series = max(len(row) - 1 for row in self.data)
+        top = max((max(row[1:]) for row in self.data), default=0) or 1
+        plot_w, plot_h = w - PAD_LEFT - PAD_RIGHT, h - PAD_TOP - PAD_BOTTOM
+        base_y = PAD_TOP + plot_h
+        # axe et graduations (0, 1/2, max)
+        c.create_line(PAD_LEFT, base_y, w - PAD_RIGHT, base_y, fill="#BDC3C7")
+        for frac in (0.5, 1.0):
+            y = base_y - plot_h * frac
+            c.create_line(PAD_LEFT, y, w - PAD_RIGHT, y, fill="#ECF0F1", dash=(2, 2))
+            c.create_text(PAD_LEFT - 4, y, anchor="e", text=self.value_format(top * frac), font=("Arial", 8), fill="#7F8C8D")
+        slot = plot_w / len(self.data)
+        bar_w = max(1.0, slot * 0.8 / n_series)
+        label_every = max(1, math.ceil(40 / slot))      # ~40 px par libellé
+        for i, row in enumerate(self.data):
+            x0 = PAD_LEFT + i * slot + slot * 0.1
+            for j, value in enumerate(row[1:]):
+                bar_h = plot_h * (float(value) / top)
+                x = x0 + j * bar_w
+                c.create_rectangle(x, base_y - bar_h, x + bar_w - 1, base_y,
+                                   fill=self.colors[j % len(self.colors)], outline="")
+            if i % label_every == 0:
+                c.create_text(PAD_LEFT + (i + 0.5) * slot, base_y + 4, anchor="n", text=str(row[0]),
+                              font=("Arial", 8), fill="#2C3E50")
+
+    def _draw_legend(self, width: int) -> None:
+        x = width - PAD_RIGHT
+        for name, color in reversed(list(zip(self.series, self.colors))):
+            item = self.canvas.create_text(x, 8, anchor="ne", text=name, font=("Arial", 8), fill="#2C3E50")
+            x = self.canvas.bbox(item)[0] - 4
+            self.canvas.create_rectangle(x - 10, 8, x, 18, fill=color, outline="")
+            x -= 16
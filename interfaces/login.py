@@ -1,8 +1,10 @@
 import tkinter as tk
 from tkinter import ttk, messagebox
-import bcrypt
 from models.database import DatabaseManager
 from config.settings import DATABASE_PATH
+from app.config_store import ConfigStore
+from app.password_hasher import PasswordHasher
+from interfaces.task_runner import TaskRunner
 import os
 
 # --- Importation de l'interface Administrateur ---
@@ -26,6 +28,10 @@ class LoginWindow:
         
         # Base de données
         self.db = DatabaseManager(DATABASE_PATH)
+        # bcrypt hors du thread Tk (coût configuré / calibré au premier usage)
+        self.tasks = TaskRunner(self.root, max_workers=1)
+        self.hasher = PasswordHasher(ConfigStore(self.db))
+        self.tasks.submit("hasher", self.hasher.load_cost, on_done=lambda cost: None)
         
         # Variables
         self.is_new_account = tk.BooleanVar(value=False)
@@ -382,6 +388,8 @@ class LoginWindow:
     
     def handle_main_action(self):
         """Gère l'action principale."""
+        if self.tasks.busy("auth"):
+            return      # calcul bcrypt déjà en cours (double clic / Entrée)
         if self.is_new_account.get():
             self.create_account()
         else:
@@ -420,51 +428,84 @@ class LoginWindow:
             messagebox.showerror("Erreur", "Les mots de passe ne correspondent pas.")
             return
         
+        admin_password = None
         if role == "co_admin":
             admin_password = self.admin_entry.get()
             if not admin_password:
                 messagebox.showerror("Erreur", "Mot de passe administrateur requis.")
                 return
-            
-            if not self.verify_admin_password(admin_password):
-                messagebox.showerror("Erreur", "Mot de passe administrateur incorrect.")
-                return
         
-        try:
-            with self.db.get_connection() as conn:
-                cursor = conn.cursor()
-                cursor.execute("SELECT COUNT(*) FROM users WHERE username = ?", (username,))
-                if cursor.fetchone()[0] > 0:
-                    messagebox.showerror("Erreur", "Nom d'utilisateur déjà existant.")
-                    return
-                
-                password_hash = bcrypt.hashpw(password.encode(), bcrypt.gensalt())
-                cursor.execute(
-                    "INSERT INTO users (username, password_hash, role) VALUES (?, ?, ?)",
-                    (username, password_hash.decode(), role)
-                )
-                conn.commit()
-                
+        def on_done(result):
+            self.set_busy(False)
+            if result == "admin_refused":
+                messagebox.showerror("Erreur", "Mot de passe administrateur incorrect.")
+            elif result == "exists":
+                messagebox.showerror("Erreur", "Nom d'utilisateur déjà existant.")
+            else:
                 messagebox.showinfo("Succès", f"Compte créé avec succès !\n\nUtilisateur: {username}")
                 self.back_to_login()
-                
-        except Exception as e:
+        
+        def on_error(e):
+            self.set_busy(False)
             messagebox.showerror("Erreur", f"Erreur création compte:\n{str(e)}")
+        
+        self.set_busy(True, "⏳ Création du compte…")
+        self.tasks.submit("auth", self._create_account_worker, username, password, role, admin_password,
+                          on_done=on_done, on_error=on_error)
+    
+    def _create_account_worker(self, username, password, role, admin_password):
+        """Thread de travail : vérification admin (si requise), hachage et insertion."""
+        if admin_password is not None and not self.verify_admin_password(admin_password):
+            return "admin_refused"
+        with self.db.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT COUNT(*) FROM users WHERE username = ?", (username,))
+            exists = cursor.fetchone()[0] > 0
+        conn.close()
+        if exists:
+            return "exists"
+        password_hash = self.hasher.hash(password)
+        with self.db.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                "INSERT INTO users (username, password_hash, role) VALUES (?, ?, ?)",
+                (username, password_hash, role)
+            )
+            conn.commit()
+        conn.close()
+        return "created"
     
     def verify_admin_password(self, password):
-        """Vérifie le mot de passe admin."""
+        """Vérifie le mot de passe admin (bcrypt : à appeler hors du thread Tk ; succès récents en cache)."""
         try:
             with self.db.get_connection() as conn:
                 cursor = conn.cursor()
                 cursor.execute("SELECT password_hash FROM users WHERE role = 'admin' LIMIT 1")
                 result = cursor.fetchone()
-                if result:
-                    return bcrypt.checkpw(password.encode(), result[0].encode())
+            conn.close()
+            if result:
+                return self.hasher.verify_cached(password, result[0])
             return False
         except Exception as e:
             print(f"Erreur vérification mot de passe admin: {e}")
             return False
     
+    def set_busy(self, busy, text=""):
+        """Retour visuel pendant un calcul bcrypt : bouton désactivé, curseur d'attente."""
+        try:
+            if busy:
+                self.main_button.config(state=tk.DISABLED, text=text)
+                self.root.config(cursor="watch")
+            else:
+                self.main_button.config(state=tk.NORMAL)
+                self.root.config(cursor="")
+                self.toggle_mode_label()
+        except tk.TclError:
+            pass
+    
+    def toggle_mode_label(self):
+        self.main_button.config(text="➕ Créer le compte" if self.is_new_account.get() else "🔐 Se connecter")
+    
     def login(self):
         """Connexion."""
         username = self.get_username_value()
@@ -475,29 +516,53 @@ class LoginWindow:
             messagebox.showerror("Erreur", "Champs obligatoires manquants.")
             return
         
-        try:
-            with self.db.get_connection() as conn:
-                cursor = conn.cursor()
-                cursor.execute(
-                    "SELECT id, password_hash, role FROM users WHERE username = ? AND role = ?",
-                    (username, role)
-                )
-                user = cursor.fetchone()
+        def on_done(user_id):
+            self.set_busy(False)
+            if user_id is not None:
+                messagebox.showinfo("Succès", f"Bienvenue {username}!")
+                self.tasks.shutdown()
+                self.root.destroy()
                 
-                if user and bcrypt.checkpw(password.encode(), user[1].encode()):
-                    messagebox.showinfo("Succès", f"Bienvenue {username}!")
-                    self.root.destroy()
-                    
-                    if role in ["admin", "co_admin"]:
-                        self.launch_admin_interface(user[0])
-                    else:
-                        self.launch_manager_interface(user[0])
+                if role in ["admin", "co_admin"]:
+                    self.launch_admin_interface(user_id)
                 else:
-                    messagebox.showerror("Erreur", "Identifiants incorrects.")
-                    self.password_entry.delete(0, tk.END)
-                    self.password_entry.focus()
-        except Exception as e:
+                    self.launch_manager_interface(user_id)
+            else:
+                messagebox.showerror("Erreur", "Identifiants incorrects.")
+                self.password_entry.delete(0, tk.END)
+                self.password_entry.focus()
+        
+        def on_error(e):
+            self.set_busy(False)
             messagebox.showerror("Erreur BD", f"Erreur de connexion: {e}")
+        
+        self.set_busy(True, "⏳ Vérification…")
+        self.tasks.submit("auth", self._authenticate, username, password, role, on_done=on_done, on_error=on_error)
+    
+    def _authenticate(self, username, password, role):
+        """Thread de travail : id de l'utilisateur si le mot de passe est correct, sinon None.
+        Un hash d'un autre coût que le coût configuré est réécrit au passage."""
+        with self.db.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                "SELECT id, password_hash FROM users WHERE username = ? AND role = ?",
+                (username, role)
+            )
+            user = cursor.fetchone()
+        conn.close()
+        if not user:
+            return None
+        ok, upgraded = self.hasher.verify_and_upgrade(password, user[1])
+        if not ok:
+            return None
+        if upgraded:
+            with self.db.get_connection() as conn:
+                # condition sur l'ancien hash : un changement de mot de passe concurrent n'est pas écrasé
+                conn.execute("UPDATE users SET password_hash = ? WHERE id = ? AND password_hash = ?",
+                             (upgraded, user[0], user[1]))
+                conn.commit()
+            conn.close()
+        return user[0]
     
     def launch_admin_interface(self, user_id):
         print(f"🔧 Lancement interface admin - utilisateur {user_id}")
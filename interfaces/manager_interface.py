@@ -1,13 +1,24 @@
 import tkinter as tk
 from tkinter import ttk, messagebox, simpledialog
 from datetime import datetime
-import threading
 import time
 from models.database import DatabaseManager
-from config.settings import DATABASE_PATH
+from config.settings import DATABASE_PATH, ALERT_JOURNAL_PATH, ALERT_CAPACITY
+from app.alert_log import AlertLog
+from app.config_store import ConfigStore
+from app.console_names import normalize_console_name
+from app.group_catalog import GroupCatalog
+from app.salle_state import (SalleState, remaining_seconds, EVENT_SESSION_WARNING, EVENT_SESSION_EXPIRED)
+from app.session_store import SessionStore
+from app.station_sync import StationSync
+from app.tariff_engine import TariffEngine
+from app.hdmi_switch import HdmiSwitchDriver, STATUS_OK, STATUS_FAILED
+from app.serial_ports import SerialPortWatcher
+from interfaces.card_renderer import CardRenderer
+from interfaces.virtual_grid import VirtualGrid
+from interfaces.alert_view import AlertView
 import os
 import math
-import re
 
 # ---- Configuration visuelle rapide ----
 DEBUG = False         # Mettre True pour logs de debug
@@ -18,26 +29,11 @@ TV_BEZEL_COLOR = "#2C3E50" # Couleur du cadre de la télé
 TV_SCREEN_OFF_COLOR = "#333333" # Écran éteint (gris foncé)
 TV_SCREEN_ON_COLOR = "#1E90FF"  # Écran allumé (bleu vif)
 TV_STAND_COLOR = "#CCCCCC"      # Pied de la télé (gris clair)
+WARNING_SECONDS = 120           # Alerte "Plus que 2 minutes"
+CONFIG_POLL_MS = 3000           # Période de vérification de la révision de configuration (admin)
+EVENT_DRAIN_MS = 100            # Période de lecture de la file d'évènements de SalleState
 # ------------------------------------------------
 
-def normalize_console_name(name: str) -> str:
-    """Normalise (strip, upper) et réduit les variantes courantes à des clés canoniques."""
-    if not name:
-        return ""
-    s = re.sub(r'[^A-Z0-9]', '', name.strip().upper())
-    mapping = {
-        "PS2": "PS2", "PS3": "PS3", "PS4": "PS4", "PS5": "PS5",
-        "PLAYSTATION2": "PS2", "PLAYSTATION3": "PS3", "PLAYSTATION4": "PS4", "PLAYSTATION5": "PS5",
-        "PSII": "PS2", "PSIII": "PS3", "PSIV": "PS4",
-        "XBOX": "XBOX", "XBOXONE": "XBOX", "XBOX360": "XBOX",
-    }
-    if s in mapping:
-        return mapping[s]
-    for k in mapping:
-        if s.startswith(k):
-            return mapping[k]
-    return s
-
 class ManagerInterface:
     def __init__(self, user_id):
         self.user_id = user_id
@@ -54,7 +50,28 @@ class ManagerInterface:
         self.db = DatabaseManager(DATABASE_PATH)
 
         self.recette_visible = False
+        # cartes matérialisées (postes visibles uniquement, cf. VirtualGrid)
         self.card_widgets = {}
+        # rendu incrémental : seules les options modifiées des cartes sont reconfigurées
+        self.card_renderer = CardRenderer(self.root, self.card_widgets, self._card_view)
+        # état des postes/sessions (thread-safe, hors Tk) ; postes_data en est le miroir côté Tk
+        self.state = SalleState(warning_seconds=WARNING_SECONDS)
+        # sessions persistées (écriture différée) ; None en mode démo (aucun poste en base)
+        self.session_store = None
+        # synchronisation avec les autres postes gérants (flux `events` de la base partagée)
+        self.station_sync = None
+        # grilles tarifaires des groupes (compilées une fois, recompilées si l'admin les modifie)
+        self.group_catalog = GroupCatalog(self.db)
+        self.tariff_engine = TariffEngine(self.db, catalog=self.group_catalog)
+        # configuration admin en cache ; relue quand sa révision change (admin sur un autre poste)
+        self.config_store = ConfigStore(self.db)
+        # switch HDMI : thread d'E/S dédié, les acquittements reviennent par une file
+        self.hdmi_switch = HdmiSwitchDriver(*self._switch_settings())
+        # ports série surveillés en fond : le pilote apprend directement le débranchement de son port
+        self.port_watcher = SerialPortWatcher(interval=1.0)
+        self.port_watcher.add_listener(self.hdmi_switch.notify_ports)
+        # alertes : deque bornée + journal disque asynchrone ; le Text est alimenté par lots
+        self.alert_log = AlertLog(capacity=ALERT_CAPACITY, journal_path=ALERT_JOURNAL_PATH)
         
         self.load_logo()
         self.create_interface()
@@ -89,6 +106,19 @@ class ManagerInterface:
             print(f"Erreur de récupération des infos utilisateur: {e}")
             return {"username": "Gérant"}
 
+    def _switch_settings(self):
+        """(port série actif, débit) depuis la configuration admin."""
+        cfg = {}
+        try:
+            cfg = self.config_store.values()
+        except Exception as e:
+            print(f"Erreur de lecture de la configuration série: {e}")
+        try:
+            baud = int(cfg.get("baud_rate") or 9600)
+        except ValueError:
+            baud = 9600
+        return cfg.get("serial_port_active") or None, baud
+
     def _lighten_color(self, hex_color, factor=30):
         """Éclaircit une couleur hexadécimale."""
         hex_color = hex_color.lstrip('#')
@@ -179,6 +209,8 @@ class ManagerInterface:
         self.alert_text = tk.Text(alert_frame, height=6, font=("Arial", 9), bg="#34495E", fg="#ECF0F1", relief="flat",
                                   wrap=tk.WORD)
         self.alert_text.pack(fill=tk.BOTH, expand=True)
+        self.alert_view = AlertView(self.root, self.alert_text, max_lines=ALERT_CAPACITY)
+        self.alert_log.add_listener(self.alert_view.push)
 
         # Boutons du bas de la sidebar
         bottom_frame = tk.Frame(sidebar, bg="#2C3E50")
@@ -263,10 +295,10 @@ class ManagerInterface:
         postes_frame.pack(fill=tk.BOTH, expand=True)
         self.canvas = tk.Canvas(postes_frame, bg="white", highlightthickness=0)
         self.scrollbar = ttk.Scrollbar(postes_frame, orient="vertical", command=self.canvas.yview)
-        self.scrollable_frame = tk.Frame(self.canvas, bg="white")
-        self.scrollable_frame.bind("<Configure>", lambda e: self.canvas.configure(scrollregion=self.canvas.bbox("all")))
-        self.canvas.create_window((0, 0), window=self.scrollable_frame, anchor="nw")
-        self.canvas.configure(yscrollcommand=self.scrollbar.set)
+        # grille virtualisée : widgets créés pour les lignes visibles uniquement, puis recyclés
+        self.postes_grid = VirtualGrid(self.canvas, self.scrollbar, create_card=self._create_card_widgets,
+                                       bind_card=self.card_renderer.rebind, columns=COLUMNS,
+                                       pad_x=CARD_PAD_X, pad_y=CARD_PAD_Y)
         self.canvas.pack(side="left", fill="both", expand=True)
         self.scrollbar.pack(side="right", fill="y")
 
@@ -298,8 +330,35 @@ class ManagerInterface:
         self.update_stats()
 
     def load_postes(self):
-        """Charge les postes de test (avec normalisation des consoles)."""
-        self.postes_data = {}
+        """
+        Restaure les postes et les sessions en cours depuis la base (reprise après crash/coupure) ;
+        à défaut de postes configurés, charge des postes de test non persistés.
+        """
+        postes = []
+        store = SessionStore(self.db, operator_id=self.user_id)
+        try:
+            postes = store.restore()
+        except Exception as e:
+            print("[DEBUG] load_postes restore error:", e)
+        if postes:
+            self.state.load_postes(postes)
+            self.state.add_listener(store.record)
+            store.start()
+            self.session_store = store
+            self.station_sync = StationSync(self.db, self.state, store.station_id, store.last_event_id)
+            self.station_sync.start()
+            resumed = sum(1 for p in postes if p["statut"] == "occupe")
+            if resumed:
+                self.add_alert(f"♻️ {resumed} session(s) reprise(s)")
+        else:
+            self.state.load_postes(self._test_postes())
+        self.state.drain_events()
+        self.postes_data = self.state.snapshot()
+        self.update_postes_display(columns=COLUMNS)
+        self.update_stats()
+
+    def _test_postes(self):
+        """Postes de test (mode démo ; SalleState normalise les consoles)."""
         test_postes = [
             {"id": i, "nom": f"Poste {i}",
              "type_console": ("PS4" if i % 3 == 0 else "PS5" if i % 3 == 1 else "XBOX"),
@@ -307,98 +366,38 @@ class ManagerInterface:
             for i in range(1, 21) # 20 postes de test
         ]
         for poste in test_postes:
-            canon = normalize_console_name(poste.get("type_console"))
-            poste["type_console"] = canon
-            self.postes_data[poste["id"]] = {
-                **poste,
-                "temps_restant": 1800 if poste["statut"] == "occupe" else 0, # 30 minutes
-                "client_nom": f"Client {poste['id']}" if poste["statut"] == "occupe" else "",
-                "montant_paye": 200 if poste["statut"] == "occupe" else 0
-            }
-        self.update_postes_display(columns=COLUMNS)
-        self.update_stats()
-
-    def _normalize_postes(self):
-        """Assure que tous les postes ont type_console normalisé."""
-        for pid, poste in list(self.postes_data.items()):
-            if "type_console" in poste:
-                poste["type_console"] = normalize_console_name(poste["type_console"])
-            else:
-                poste["type_console"] = ""
-
-    def _clear_scrollable(self):
-        """Détruit TOUS les widgets enfants du scrollable_frame. À utiliser avec parcimonie."""
-        for w in list(self.scrollable_frame.winfo_children()):
-            try:
-                w.destroy()
-            except Exception:
-                pass
+            if poste["statut"] == "occupe":
+                poste["client_nom"] = f"Client {poste['id']}"
+                poste["montant_paye"] = 200
+                poste["remaining_seconds"] = 1800 # 30 minutes
+        return test_postes
 
     def update_postes_display(self, columns=COLUMNS):
         """
-        Met à jour l'affichage des postes.
-        Cache/affiche les cartes existantes et crée de nouvelles si nécessaire.
+        Met à jour la liste affichée (filtre / rechargement). La grille virtualisée ne
+        matérialise que les cartes visibles ; leur contenu passe par le CardRenderer.
         """
-        self._normalize_postes()
-
-        filtered_postes = self.get_filtered_postes()
+        self.postes_grid.columns = max(1, columns)
 
         if not self.postes_data:
-            self._clear_scrollable()
-            loading_label = tk.Label(self.scrollable_frame, text="Chargement des postes...", font=("Arial", 12),
-                                     bg="white", fg="#7F8C8D")
-            loading_label.grid(row=0, column=0, pady=20, padx=10, sticky="n")
+            self.postes_grid.show_message("Chargement des postes...")
             return
-
+        filtered_postes = self.get_filtered_postes()
         if not filtered_postes:
-            for pid, wdict in self.card_widgets.items():
-                wdict["outer"].grid_forget()
-            no_data_label = tk.Label(self.scrollable_frame, text="Aucun poste trouvé pour ce filtre", font=("Arial", 12),
-                                     bg="white", fg="#7F8C8D")
-            no_data_label.grid(row=0, column=0, pady=50, padx=10, sticky="n")
+            self.postes_grid.show_message("Aucun poste trouvé pour ce filtre")
             return
-        else:
-            for w in self.scrollable_frame.winfo_children():
-                if w.winfo_class() == "Label" and "Aucun poste" in w.cget("text"):
-                    w.destroy()
-
-        remaining_in_filter = set()
-        row, col = 0, 0
-        for poste_id, poste in filtered_postes.items():
-            remaining_in_filter.add(poste_id)
-            wdict = self.card_widgets.get(poste_id)
-
-            if wdict:
-                outer = wdict["outer"]
-                self._update_card_widgets(poste, wdict)
-                outer.grid(row=row, column=col, padx=CARD_PAD_X, pady=CARD_PAD_Y, sticky="nsew")
-            else:
-                wdict = self._create_card_widgets(poste)
-                self.card_widgets[poste_id] = wdict
-                outer = wdict["outer"]
-                outer.grid(row=row, column=col, padx=CARD_PAD_X, pady=CARD_PAD_Y, sticky="nsew")
-
-            col += 1
-            if col >= columns:
-                col = 0
-                row += 1
-        
-        for pid, wdict in self.card_widgets.items():
-            if pid not in remaining_in_filter:
-                wdict["outer"].grid_forget()
-        
-        for i in range(columns):
-            self.scrollable_frame.grid_columnconfigure(i, weight=1)
-
-        self.scrollable_frame.update_idletasks()
-        self.canvas.yview_moveto(0)
+        self.postes_grid.set_items(list(filtered_postes.keys()))
+        self.card_renderer.mark_all_dirty()
 
-    def _create_card_widgets(self, poste):
-        """Crée la structure d'une carte (UNE SEULE FOIS) avec le design de télé amélioré."""
-        card_outer = tk.Frame(self.scrollable_frame, bg="#FFFFFF", highlightthickness=1, highlightbackground="lightgray", bd=0)
+    def _create_card_widgets(self, parent):
+        """
+        Crée la structure d'une carte vierge (design de télé) ; appelée par la grille virtualisée
+        uniquement quand aucune carte n'est recyclable. Le contenu est posé par CardRenderer.rebind.
+        """
+        card_outer = tk.Frame(parent, bg="#FFFFFF", highlightthickness=1, highlightbackground="lightgray", bd=0)
         
         # --- Nom du poste (au-dessus de la télé) ---
-        title_lbl = tk.Label(card_outer, text=poste['nom'], font=("Arial", 10, "bold"), bg="#FFFFFF", fg="#2C3E50")
+        title_lbl = tk.Label(card_outer, text="", font=("Arial", 10, "bold"), bg="#FFFFFF", fg="#2C3E50")
         title_lbl.pack(pady=(4, 2))
 
         # --- Représentation visuelle de la Télé ---
@@ -462,94 +461,80 @@ class ManagerInterface:
             "btn_area": btn_area,
             "main_action_btn": main_action_btn,
         }
-        self._update_card_widgets(poste, wdict)
         return wdict
 
-    def _update_card_widgets(self, poste, wdict):
-        """Met à jour uniquement le contenu d'une carte existante (pas de recréation)."""
-        
+    def _card_view(self, poste_id, now=None):
+        """
+        Décrit l'état voulu d'une carte ({widget: {option: valeur}}) ; le CardRenderer
+        compare avec l'état déjà appliqué et ne pousse que les différences.
+        """
+        poste = self.postes_data.get(poste_id)
+        if poste is None:
+            return None
+        statut = poste["statut"]
+        remaining = self._remaining_seconds(poste, now)
+
         # Couleurs dynamiques de la bordure de la carte
-        if poste["statut"] == "libre":
+        if statut == "libre":
             border_color = "#27AE60" # Vert
-        elif poste["statut"] == "maintenance":
+        elif statut == "maintenance":
             border_color = "#F39C12" # Orange
-        elif poste["temps_restant"] <= 120: # Temps critique
+        elif remaining <= WARNING_SECONDS: # Temps critique
             border_color = "#E74C3C" # Rouge
         else: # Occupé (temps normal)
             border_color = "#3498DB" # Bleu
-        
-        wdict["outer"].config(highlightbackground=border_color)
-
-        # Mise à jour de l'écran de la télé
-        tv_screen_frame = wdict["tv_screen_frame"]
-        screen_client_lbl = wdict["screen_client_lbl"]
-        screen_time_lbl = wdict["screen_time_lbl"]
-        screen_pay_lbl = wdict["screen_pay_lbl"]
-        screen_info_container = wdict["screen_info_container"]
-
-        if poste["statut"] == "occupe":
-            tv_screen_frame.config(bg=TV_SCREEN_ON_COLOR, highlightbackground=TV_BEZEL_COLOR)
-            screen_info_container.config(bg=TV_SCREEN_ON_COLOR)
-            screen_client_lbl.config(bg=TV_SCREEN_ON_COLOR, fg="white", text=f"👤 {poste['client_nom']}")
-            minutes = poste["temps_restant"] // 60
-            seconds = poste["temps_restant"] % 60
-            screen_time_lbl.config(bg=TV_SCREEN_ON_COLOR, fg="white", text=f"{minutes:02d}:{seconds:02d}")
-            screen_pay_lbl.config(bg=TV_SCREEN_ON_COLOR, fg="white", text=f"💰 {poste['montant_paye']} FCFA")
-            
-            screen_client_lbl.pack(pady=(0,2))
-            screen_time_lbl.pack()
-            screen_pay_lbl.pack(pady=(2,0))
+
+        view = {"outer": {"highlightbackground": border_color}, "title": {"text": poste["nom"]}}
+
+        # Écran de la télé
+        if statut == "occupe":
+            view["tv_screen_frame"] = {"bg": TV_SCREEN_ON_COLOR}
+            view["screen_info_container"] = {"bg": TV_SCREEN_ON_COLOR}
+            view["screen_client_lbl"] = {"bg": TV_SCREEN_ON_COLOR, "text": f"👤 {poste['client_nom']}", "_pack": {"pady": (0, 2)}}
+            view["screen_time_lbl"] = {"bg": TV_SCREEN_ON_COLOR, "text": f"{remaining // 60:02d}:{remaining % 60:02d}", "_pack": {}}
+            view["screen_pay_lbl"] = {"bg": TV_SCREEN_ON_COLOR, "text": f"💰 {poste['montant_paye']} FCFA", "_pack": {"pady": (2, 0)}}
         else:
-            tv_screen_frame.config(bg=TV_SCREEN_OFF_COLOR, highlightbackground=TV_BEZEL_COLOR)
-            screen_info_container.config(bg=TV_SCREEN_OFF_COLOR)
-            
-            screen_client_lbl.pack_forget()
-            screen_time_lbl.pack_forget()
-            screen_pay_lbl.pack_forget()
-
-        # Mise à jour du bouton d'action unique
-        main_action_btn = wdict["main_action_btn"]
-        btn_area = wdict["btn_area"]
-
-        for child in btn_area.winfo_children():
-            child.pack_forget()
-
-        if poste["statut"] == "libre":
-            main_action_btn.config(text="▶️ DÉMARRER", bg="#27AE60", command=lambda p=poste: self.start_session(p))
-            main_action_btn.pack(fill=tk.X)
-        elif poste["statut"] == "maintenance":
-            main_action_btn.config(text="🔧 RÉPARER", bg="#F39C12", command=lambda p=poste: self.repair_poste(p))
-            main_action_btn.pack(fill=tk.X)
+            view["tv_screen_frame"] = {"bg": TV_SCREEN_OFF_COLOR}
+            view["screen_info_container"] = {"bg": TV_SCREEN_OFF_COLOR}
+            view["screen_client_lbl"] = {"_pack": None}
+            view["screen_time_lbl"] = {"_pack": None}
+            view["screen_pay_lbl"] = {"_pack": None}
+
+        # Bouton d'action unique
+        if statut == "libre":
+            text, color, action = "▶️ DÉMARRER", "#27AE60", self.start_session
+        elif statut == "maintenance":
+            text, color, action = "🔧 RÉPARER", "#F39C12", self.repair_poste
         else: # Occupé
-            main_action_btn.config(text="⚙️ GÉRER", bg="#3498DB", command=lambda p=poste: self.manage_session(p))
-            main_action_btn.pack(fill=tk.X)
+            text, color, action = "⚙️ GÉRER", "#3498DB", self.manage_session
+        view["main_action_btn"] = {
+            "text": text, "bg": color, "activebackground": color, "_original_bg": color,
+            "_command_key": (poste_id, statut), "command": lambda pid=poste_id, f=action: f(self.postes_data[pid]),
+        }
+        return view
 
+    def _update_card_widgets(self, poste, wdict):
+        """Met à jour le contenu d'une carte existante (différé et coalescé via le CardRenderer)."""
+        self.card_renderer.mark_dirty(poste["id"])
 
     def get_filtered_postes(self):
-        """Retourne les postes filtrés en comparant en MAJUSCULES et en enlevant les espaces."""
+        """Retourne les postes du type de console sélectionné (index de SalleState, O(résultat))."""
         sel_raw = (self.selected_console_filter.get() or "").strip()
         sel = normalize_console_name(sel_raw) if sel_raw else ""
         if DEBUG:
             print("DEBUG FILTER SEL_RAW:", repr(sel_raw), "-> SEL:", sel)
-            print("DEBUG available types:", [p.get("type_console") for p in self.postes_data.values()])
+            print("DEBUG available types:", self.state.console_types())
         if sel in ("TOUT", "ALL", ""):
             return self.postes_data
-        result = {}
-        for pid, poste in self.postes_data.items():
-            try:
-                tc = normalize_console_name(poste.get("type_console") or "")
-                if tc == sel:
-                    result[pid] = poste
-            except Exception:
-                continue
-        return result
+        return {pid: self.postes_data[pid] for pid in self.state.postes_by_console(sel) if pid in self.postes_data}
 
     def update_stats(self):
         """Met à jour les statistiques affichées."""
-        libres = sum(1 for p in self.postes_data.values() if p["statut"] == "libre")
-        occupes = sum(1 for p in self.postes_data.values() if p["statut"] == "occupe")
-        maintenance = sum(1 for p in self.postes_data.values() if p["statut"] == "maintenance")
-        recette = sum(p["montant_paye"] for p in self.postes_data.values())
+        stats = self.state.stats()
+        libres, occupes = stats["libres"], stats["occupes"]
+        maintenance, recette = stats["maintenance"], stats["recette"]
+        if self.session_store is not None:
+            recette = self.session_store.recette_du_jour()
         try:
             self.stats_labels["Postes Libres"].config(text=str(libres))
             self.stats_labels["Postes Occupés"].config(text=str(occupes))
@@ -567,50 +552,93 @@ class ManagerInterface:
         self.time_label.config(text=current_time)
         self.root.after(1000, self.update_time)
 
-    def add_alert(self, message):
-        """Ajoute un message à la zone d'alertes."""
-        current_time = datetime.now().strftime("%H:%M")
-        alert_message = f"[{current_time}] {message}\n"
-        self.root.after(0, lambda: (self.alert_text.insert(tk.END, alert_message), self.alert_text.see(tk.END)))
-        def trim():
-            lines = self.alert_text.get("1.0", tk.END).split('\n')
-            if len(lines) > 100:
-                self.alert_text.delete("1.0", "2.0")
-        self.root.after(50, trim)
+    def add_alert(self, message, level="info"):
+        """Ajoute une alerte (info / warning / error) : mémoire bornée, affichage par lot, journal disque."""
+        self.alert_log.add(message, level)
+
+    # ---------------- Échéances des sessions (SalleState) ----------------
+    def _remaining_seconds(self, poste, now=None):
+        """Temps restant (s) calculé à la demande depuis l'échéance monotone de la session."""
+        return remaining_seconds(poste, time.monotonic() if now is None else now)
 
     def start_timer(self):
-        """Démarre un thread séparé pour mettre à jour les timers des postes."""
-        def update_timer():
-            while self.running:
-                changed = False
-                for poste in list(self.postes_data.values()):
-                    if poste["statut"] == "occupe" and poste["temps_restant"] > 0:
-                        poste["temps_restant"] -= 1
-                        changed = True
-                        if poste["temps_restant"] == 120:
-                            self.add_alert(f"⚠️ {poste['nom']} - Plus que 2 minutes !")
-                        elif poste["temps_restant"] == 0:
-                            poste["statut"] = "libre"
-                            poste["client_nom"] = ""
-                            poste["montant_paye"] = 0
-                            self.add_alert(f"🔴 {poste['nom']} - Session terminée")
-                
-                if changed:
-                    self.root.after(0, lambda: (self._refresh_existing_cards(), self.update_stats()))
-                
-                if int(time.time()) % 5 == 0:
-                    self.root.after(0, self.update_stats)
-                
-                time.sleep(1)
-        
-        threading.Thread(target=update_timer, daemon=True).start()
+        """Démarre le thread d'échéances de SalleState, la lecture de ses évènements et le rafraîchissement des comptes à rebours."""
+        self.state.start()
+        self.hdmi_switch.start()
+        self.port_watcher.start()
+        self.port_watcher.drain_events()     # scan initial : état de départ, pas un branchement
+        device = self.hdmi_switch.device
+        if device and device.startswith("/dev/") and device not in self.port_watcher.ports():
+            self.add_alert(f"🔌 Switch HDMI introuvable ({device})", "warning")
+        self._drain_state_events()
+        self._refresh_countdowns()
+        self.root.after(CONFIG_POLL_MS, self._check_config_revision)
+
+    def _check_config_revision(self):
+        """Configuration modifiée par l'admin : port du switch et grilles tarifaires repris à chaud."""
+        if not self.running:
+            return
+        try:
+            if self.config_store.revision_changed():
+                device, baud = self._switch_settings()
+                if self.hdmi_switch.configure(device, baud):
+                    self.add_alert(f"⚙️ Switch HDMI reconfiguré ({device or 'aucun port'}, {baud} bauds)")
+                self.tariff_engine.invalidate()
+        except Exception as e:
+            print("[DEBUG] _check_config_revision error:", e)
+        self.root.after(CONFIG_POLL_MS, self._check_config_revision)
+
+    def _apply_poste_snapshot(self, snap):
+        """Met à jour le miroir Tk d'un poste (en place, pour garder les références existantes)."""
+        poste = self.postes_data.get(snap["id"])
+        if poste is None:
+            self.postes_data[snap["id"]] = dict(snap)
+        else:
+            poste.update(snap)
+        self.card_renderer.mark_dirty(snap["id"])
 
-    def _refresh_existing_cards(self):
-        """Met à jour uniquement le contenu des cartes déjà créées sans les recréer."""
-        for pid, wdict in self.card_widgets.items():
+    def _drain_state_events(self):
+        """Applique (thread Tk) les changements publiés par SalleState."""
+        if not self.running:
+            return
+        events = self.state.drain_events()
+        for event in events:
+            snap = event["poste"]
+            self._apply_poste_snapshot(snap)
+            if event["type"] == EVENT_SESSION_WARNING:
+                self.add_alert(f"⚠️ {snap['nom']} - Plus que 2 minutes !", "warning")
+            elif event["type"] == EVENT_SESSION_EXPIRED:
+                self.add_alert(f"🔴 {snap['nom']} - Session terminée", "error")
+        if events:
+            self.update_stats()
+        for result in self.hdmi_switch.drain_results():
+            poste = self.postes_data.get(result["poste_id"])
+            nom = poste["nom"] if poste else result["poste_id"]
+            if result["status"] == STATUS_OK:
+                self.add_alert(f"🔌 Switch HDMI activé pour {nom}")
+            elif result["status"] == STATUS_FAILED:
+                self.add_alert(f"❗ Echec switch HDMI pour {nom} ({result['error']})", "error")
+        device = self.hdmi_switch.device
+        for event in self.port_watcher.drain_events():
+            if device in event["removed"]:
+                self.add_alert(f"🔌 Switch HDMI débranché ({device})", "error")
+            elif device in event["added"]:
+                self.add_alert(f"🔌 Switch HDMI rebranché ({device})")
+        self.root.after(EVENT_DRAIN_MS, self._drain_state_events)
+
+    def _refresh_countdowns(self):
+        """Chaque seconde, marque les postes occupés ; le renderer ne pousse que le libellé de temps (et la bordure critique)."""
+        if not self.running:
+            return
+        for pid in self.card_widgets:
             poste = self.postes_data.get(pid)
-            if poste:
-                self._update_card_widgets(poste, wdict)
+            if poste and poste["statut"] == "occupe":
+                self.card_renderer.mark_dirty(pid)
+        self.root.after(1000, self._refresh_countdowns)
+
+    def _refresh_existing_cards(self):
+        """Met à jour le contenu des cartes déjà créées (seules les différences sont appliquées)."""
+        self.card_renderer.mark_all_dirty()
 
     def filter_postes(self):
         """Applique le filtre sélectionné et met à jour l'affichage des postes."""
@@ -623,30 +651,25 @@ class ManagerInterface:
 
     def start_session(self, poste):
         """Démarre une nouvelle session sur un poste."""
-        dialog = SessionDialog(self.root, poste)
+        # grilles compilées une fois ; _check_config_revision les invalide après une modification admin
+        dialog = SessionDialog(self.root, poste, tariff_engine=self.tariff_engine)
         if dialog.result:
-            success = self.trigger_hdmi_switch(poste)
-            if success:
-                self.add_alert(f"🔌 Switch HDMI activé pour {poste['nom']}")
-            else:
-                self.add_alert(f"❗ Echec switch HDMI (stub) pour {poste['nom']}")
-            
-            poste["statut"] = "occupe"
-            poste["client_nom"] = dialog.result["client_nom"]
-            poste["temps_restant"] = dialog.result["duree"] * 60
-            poste["montant_paye"] = dialog.result["montant"]
+            try:
+                snap = self.state.start_session(poste["id"], dialog.result["client_nom"], dialog.result["montant"], dialog.result["duree"] * 60)
+            except (KeyError, ValueError) as e:
+                messagebox.showerror("Erreur", str(e))
+                return
+            self._apply_poste_snapshot(snap)
+            # commutation en tâche de fond : l'acquittement arrive via _drain_state_events
+            self.trigger_hdmi_switch(poste)
             self.add_alert(f"▶️ Session démarrée - {poste['nom']} - {dialog.result['client_nom']}")
-            self.update_postes_display(columns=COLUMNS)
             self.update_stats()
 
     def trigger_hdmi_switch(self, poste):
-        """Simule l'activation d'un interrupteur HDMI."""
-        try:
-            print(f"[HDMI STUB] Activation HDMI pour {poste['nom']}")
-            return True
-        except Exception as e:
-            print("[HDMI STUB] Erreur:", e)
-            return False
+        """Demande la commutation HDMI vers l'entrée du poste (non bloquant) ; retourne l'id de la demande."""
+        port = poste.get("switch_port") or poste["id"]
+        # un canal par poste : seule une commande plus récente pour ce même poste la remplace
+        return self.hdmi_switch.request(poste["id"], port, channel=poste["id"])
 
     def manage_session(self, poste):
         """Gère une session en cours via un dialogue d'options."""
@@ -661,7 +684,8 @@ class ManagerInterface:
         frame.pack(fill=tk.BOTH, expand=True)
 
         ttk.Label(frame, text=f"Session de {poste['client_nom']}", font=("Arial", 11, "bold")).pack(pady=(0, 10))
-        ttk.Label(frame, text=f"Temps restant: {poste['temps_restant']//60}:{poste['temps_restant']%60:02d}").pack(pady=(0, 15))
+        remaining = self._remaining_seconds(poste)
+        ttk.Label(frame, text=f"Temps restant: {remaining//60}:{remaining%60:02d}").pack(pady=(0, 15))
 
         btn_prolonger = tk.Button(frame, text="⏰ Prolonger la session", bg="#9B59B6", fg="white",
                                       font=("Arial", 9, "bold"), relief="flat", bd=0, padx=10, pady=5,
@@ -689,12 +713,13 @@ class ManagerInterface:
     def _stop_session(self, poste):
         """Logique pour arrêter une session."""
         if messagebox.askyesno("Arrêter Session", f"Êtes-vous sûr de vouloir arrêter la session de {poste['client_nom']} sur {poste['nom']} ?"):
-            poste["statut"] = "libre"
-            poste["client_nom"] = ""
-            poste["temps_restant"] = 0
-            poste["montant_paye"] = 0
+            try:
+                snap = self.state.stop_session(poste["id"])
+            except (KeyError, ValueError) as e:
+                messagebox.showerror("Erreur", str(e))
+                return
+            self._apply_poste_snapshot(snap)
             self.add_alert(f"⏹️ Session arrêtée - {poste['nom']}")
-            self.update_postes_display(columns=COLUMNS)
             self.update_stats()
 
     def extend_session(self, poste):
@@ -705,18 +730,29 @@ class ManagerInterface:
                 minutes = int(result)
                 if minutes <= 0:
                     raise ValueError("Doit être > 0")
-                poste["temps_restant"] += minutes * 60
-                self.add_alert(f"⏰ {poste['nom']} prolongé de {minutes} minutes")
-                self.update_postes_display(columns=COLUMNS)
+                montant = self.tariff_engine.table_for(poste.get("type_console", "")).quote_amount(minutes)
+                montant = simpledialog.askinteger("Montant payé", f"Montant encaissé pour {minutes} minutes (FCFA):",
+                                                  initialvalue=montant, minvalue=0)
+                if montant is None:
+                    return
+                snap = self.state.extend_session(poste["id"], minutes * 60, montant)
+                self._apply_poste_snapshot(snap)
+                self.add_alert(f"⏰ {poste['nom']} prolongé de {minutes} minutes ({montant} FCFA)")
+            except KeyError:
+                messagebox.showerror("Erreur", f"Poste inconnu: {poste['nom']}")
             except ValueError:
                 messagebox.showerror("Erreur", "Valeur invalide. Veuillez entrer un nombre entier positif.")
 
     def repair_poste(self, poste):
         """Marque un poste en maintenance comme réparé et disponible."""
         if messagebox.askyesno("Réparation", f"Marquer {poste['nom']} comme réparé et disponible ?"):
-            poste["statut"] = "libre"
+            try:
+                snap = self.state.set_statut(poste["id"], "libre")
+            except (KeyError, ValueError) as e:
+                messagebox.showerror("Erreur", str(e))
+                return
+            self._apply_poste_snapshot(snap)
             self.add_alert(f"✅ {poste['nom']} réparé et disponible")
-            self.update_postes_display(columns=COLUMNS)
             self.update_stats()
 
     def handle_bottom_button(self, button_text):
@@ -739,6 +775,14 @@ class ManagerInterface:
     def on_closing(self):
         """Gère la fermeture propre de l'application."""
         self.running = False
+        self.state.stop()
+        self.port_watcher.stop()
+        self.hdmi_switch.stop()
+        if self.station_sync is not None:
+            self.station_sync.stop()
+        if self.session_store is not None:
+            self.session_store.stop()
+        self.alert_log.close()
         try:
             self.root.destroy()
         except:
@@ -751,7 +795,12 @@ class ManagerInterface:
 
 # ----------------- SessionDialog (Dialogue pour démarrer une session) -----------------
 class SessionDialog:
-    def __init__(self, parent, poste):
+    # effets hover partagés avec ManagerInterface
+    _lighten_color = ManagerInterface._lighten_color
+    _on_button_enter = ManagerInterface._on_button_enter
+    _on_button_leave = ManagerInterface._on_button_leave
+
+    def __init__(self, parent, poste, tariff_engine=None):
         self.result = None
         self.dialog = tk.Toplevel(parent)
         self.dialog.title(f"Démarrer Session sur {poste['nom']}")
@@ -774,11 +823,15 @@ class SessionDialog:
         self.montant_entry.pack(fill=tk.X, pady=(4, 8))
 
         ttk.Label(main_frame, text="Tarification:").pack(anchor=tk.W)
-        self.tariffs = [
-            {"key": "standard", "label": "Standard - 50 FCFA = 6 min", "mpf": 6 / 50},
-            {"key": "promo", "label": "Promo - 100 FCFA = 15 min", "mpf": 15 / 100},
-            {"key": "custom", "label": "Custom - définir X FCFA = Y min", "mpf": None}
-        ]
+        # grille du groupe de la console (console_groups), sinon TARIFS_DEFAULT, puis tarif standard
+        self.tariffs = []
+        if tariff_engine is not None:
+            grid = tariff_engine.table_for(poste.get("type_console", ""))
+            standard = tariff_engine.standard_table()
+            if grid is not standard:
+                self.tariffs.append({"key": "grille", "label": f"{grid.label} - {grid.describe()}", "table": grid})
+            self.tariffs.append({"key": "standard", "label": standard.label, "table": standard})
+        self.tariffs.append({"key": "custom", "label": "Custom - définir X FCFA = Y min", "table": None})
         self.tariff_names = [t["label"] for t in self.tariffs]
         self.tariff_var = tk.StringVar(value=self.tariff_names[0])
         self.tariff_combo = ttk.Combobox(main_frame, values=self.tariff_names, state="readonly",
@@ -801,14 +854,14 @@ class SessionDialog:
 
         calc_frame = ttk.Frame(main_frame)
         calc_frame.pack(fill=tk.X, pady=(0, 8))
-        calc_btn = tk.Button(calc_frame, text="Calculer durée depuis montant", font=("Arial", 9, "bold"),
+        calc_btn = tk.Button(calc_frame, text="Calculer durée / montant", font=("Arial", 9, "bold"),
                              bg="#3498DB", fg="white", relief="flat", bd=0, padx=10, pady=5,
                              command=self.calculate_duration)
         calc_btn._original_bg = "#3498DB"
         calc_btn.bind("<Enter>", self._on_button_enter)
         calc_btn.bind("<Leave>", self._on_button_leave)
         calc_btn.pack(side=tk.LEFT)
-        hint_label = ttk.Label(calc_frame, text=" (si montant renseigné)", font=("Arial", 8))
+        hint_label = ttk.Label(calc_frame, text=" (durée si montant, sinon montant)", font=("Arial", 8))
         hint_label.pack(side=tk.LEFT, padx=(6, 0))
 
         bonus_frame = ttk.Frame(main_frame)
@@ -866,9 +919,34 @@ class SessionDialog:
             self.bonus_minutes_entry.delete(0, tk.END)
             self.bonus_minutes_entry.config(state="disabled")
 
+    def _selected_tariff(self):
+        sel = self.tariff_var.get()
+        return next((t for t in self.tariffs if t["label"] == sel), None)
+
+    def calculate_amount(self):
+        """Montant minimal de la grille pour la durée saisie."""
+        tariff = self._selected_tariff()
+        if tariff is None or tariff["table"] is None:
+            messagebox.showinfo("Info", "Veuillez entrer un montant pour calculer la durée.")
+            return
+        try:
+            duree = int(self.duree_entry.get().strip())
+            if duree <= 0:
+                raise ValueError()
+        except ValueError:
+            messagebox.showerror("Erreur", "Durée invalide. Entrez un nombre entier de minutes (>0).")
+            return
+        montant = tariff["table"].quote_amount(duree)
+        self.montant_entry.delete(0, tk.END)
+        self.montant_entry.insert(0, str(montant))
+        messagebox.showinfo("Montant calculé", f"{duree} min : {montant} FCFA")
+
     def calculate_duration(self):
         montant_txt = self.montant_entry.get().strip()
         if not montant_txt:
+            if self.duree_entry.get().strip():
+                self.calculate_amount()
+                return
             messagebox.showinfo("Info", "Veuillez entrer un montant pour calculer la durée.")
             return
         try:
@@ -878,14 +956,17 @@ class SessionDialog:
         except ValueError:
             messagebox.showerror("Erreur", "Montant invalide. Entrez un entier (FCFA).")
             return
-        sel = self.tariff_var.get()
-        tariff = next((t for t in self.tariffs if t["label"] == sel), None)
+        tariff = self._selected_tariff()
         minutes = 0
+        detail = ""
         if tariff is None:
             messagebox.showerror("Erreur", "Tarif inconnu")
             return
-        if tariff["mpf"] is not None:
-            minutes = int(montant * tariff["mpf"])
+        if tariff["table"] is not None:
+            minutes = tariff["table"].quote_minutes(montant)
+            parts = tariff["table"].decompose(montant)
+            if parts:
+                detail = "\n(" + " + ".join(f"{p['count']}×{p['montant']}F" for p in parts) + ")"
         else:
             x_txt = self.custom_fcfa.get().strip()
             y_txt = self.custom_minutes.get().strip()
@@ -913,7 +994,7 @@ class SessionDialog:
         total = minutes + bonus
         self.duree_entry.delete(0, tk.END)
         self.duree_entry.insert(0, str(total))
-        messagebox.showinfo("Durée calculée", f"Durée: {minutes} min + bonus {bonus} min = {total} min")
+        messagebox.showinfo("Durée calculée", f"Durée: {minutes} min + bonus {bonus} min = {total} min{detail}")
 
     def on_ok(self):
         client_nom = self.client_entry.get().strip()
@@ -0,0 +1,162 @@
+# interfaces/task_runner.py
+"""
+Chargements de données hors du thread Tk pour l'interface d'administration.
+
+- TaskRunner.submit(key, func, on_done) : func(*args) s'exécute dans un pool de threads ;
+  le résultat revient sur le thread Tk (file + root.after), jamais de widget touché par un worker.
+- Une nouvelle demande pour la même clé rend la précédente obsolète (son résultat est ignoré,
+  elle est annulée si elle n'a pas encore démarré).
+- cancel_scope(scope) : annule toutes les demandes d'une portée (ex. changement de section).
+- set_tree_loading(tree) / clear_tree(tree) / is_loading_row(tree, iid) : indicateur "Chargement…"
+  dans un Treeview (ligne ignorée par les gestionnaires de sélection).
+
+Usage:
+    runner = TaskRunner(root)
+    set_tree_loading(users_tree)
+    runner.submit("users", fetch_users, on_done=fill_users_tree, scope="section")
+    ...
+    runner.shutdown()
+"""
+
+import itertools
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional, Tuple
+
+LOADING_TEXT = "⏳ Chargement…"
+
+
+class TaskRunner:
+    def __init__(self, root, max_workers: int = 2, poll_ms: int = 30):
+        self.root = root
+        self.poll_ms = poll_ms
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="AdminLoad")
+        self._results: "queue.Queue[Tuple[str, int, bool, Any]]" = queue.Queue()
+        self._tokens = itertools.count(1)
+        self._lock = threading.Lock()
+        # clé -> (jeton courant, future, on_done, on_error, portée)
+        self._tasks: Dict[str, Tuple[int, Any, Callable, Optional[Callable], Optional[str]]] = {}
+        self._poll_id = None
+        self._closed = False
+
+    def submit(self, key: str, func: Callable, *args, on_done: Callable[[Any], None],
+               on_error: Optional[Callable[[Exception], None]] = None, scope: Optional[str] = None) -> int:
+        """Lance func(*args) en arrière-plan ; on_done(résultat) est appelé sur le thread Tk."""
+        if self._closed:
+            return 0
+        token = next(self._tokens)
+        with self._lock:
+            previous = self._tasks.get(key)
+            if previous is not None:
+                previous[1].cancel()
+            future = self._executor.submit(self._work, key, token, func, args)
+            self._tasks[key] = (token, future, on_done, on_error, scope)
+        self._schedule_poll()
+        return token
+
+    def _work(self, key: str, token: int, func: Callable, args: tuple) -> None:
+        with self._lock:
+            current = self._tasks.get(key)
+            if current is None or current[0] != token:
+                return      # devenue obsolète avant de démarrer
+        try:
+            self._results.put((key, token, True, func(*args)))
+        except Exception as e:
+            self._results.put((key, token, False, e))
+
+    def cancel(self, key: str) -> None:
+        with self._lock:
+            task = self._tasks.pop(key, None)
+        if task is not None:
+            task[1].cancel()
+
+    def cancel_scope(self, scope: str) -> None:
+        with self._lock:
+            keys = [k for k, t in self._tasks.items() if t[4] == scope]
+        for key in keys:
+            self.cancel(key)
+
+    def busy(self, key: Optional[str] = None) -> bool:
+        with self._lock:
+            return key in self._tasks if key is not None else bool(self._tasks)
+
+    # ---------------- Retour sur le thread Tk ----------------
+    def _schedule_poll(self) -> None:
+        if self._poll_id is None and not self._closed:
+            try:
+                self._poll_id = self.root.after(self.poll_ms, self._poll)
+            except Exception:
+                self._poll_id = None
+
+    def _poll(self) -> None:
+        self._poll_id = None
+        while True:
+            try:
+                key, token, ok, value = self._results.get_nowait()
+            except queue.Empty:
+                break
+            with self._lock:
+                task = self._tasks.get(key)
+                if task is None or task[0] != token:
+                    continue    # annulée ou remplacée : résultat ignoré
+                del self._tasks[key]
+            _, _, on_done, on_error, _ = task
+            try:
+                if ok:
+                    on_done(value)
+                elif on_error is not None:
+                    on_error(value)
+                else:
+                    print(f"[DEBUG] TaskRunner {key} error:", value)
+            except Exception as e:
+                print(f"[DEBUG] TaskRunner {key} callback error:", e)
+        if self.busy():
+            self._schedule_poll()
+
+    def shutdown(self) -> None:
+        self._closed = True
+        with self._lock:
+            for task in self._tasks.values():
+                task[1].cancel()
+            self._tasks.clear()
+        if self._poll_id is not None:
+            try:
+                self.root.after_cancel(self._poll_id)
+            except Exception:
+                pass
+            self._poll_id = None
+        self._executor.shutdown(wait=False)
+
+
+def clear_tree(tree) -> None:
+    try:
+        children = tree.get_children()
+        if children:
+            tree.delete(*children)
+    except Exception:
+        pass
+
+
+def set_tree_loading(tree, text: str = LOADING_TEXT) -> None:
+    """Vide le Treeview et affiche une ligne d'attente (remplacée au remplissage)."""
+    if tree is None:
+        return
+    try:
+        if not tree.winfo_exists():
+            return
+        clear_tree(tree)
+        # texte dans la 2e colonne (la 1re est en général l'ID, étroite)
+        n = len(tree["columns"] or ("",))
+        values = ("", text) + ("",) * (n - 2) if n > 1 else (text,)
+        tree.insert("", "end", values=values, tags=("loading",))
+        tree.tag_configure("loading", foreground="#7F8C8D")
+    except Exception:
+        pass
+
+
+def is_loading_row(tree, iid) -> bool:
+    try:
+        return "loading" in tree.item(iid, "tags")
+    except Exception:
+        return False
@@ -0,0 +1,175 @@
+# interfaces/virtual_grid.py
+"""
+Grille virtualisée de cartes sur un Canvas (interface gérant).
+
+- Seules les lignes visibles (+ `overscan_rows` de marge) ont des widgets ; la scrollregion
+  couvre toute la liste, de sorte que la barre de défilement reste exacte.
+- Les cartes sont des items "window" du Canvas, placées par coords() (pas de grid/pack),
+  et recyclées : une carte qui sort de la vue est rebranchée sur le poste qui y entre.
+- Mémoire et temps de mise en page indépendants du nombre total de postes
+  (20 ou 500 : même nombre de widgets, celui d'un écran).
+- Le rafraîchissement (défilement, redimensionnement, nouvelle liste) est regroupé via after_idle.
+
+Callbacks :
+- create_card(parent) -> dict de widgets avec au moins "outer" (Frame enfant du Canvas)
+- bind_card(wdict, old_key, new_key) : la carte passe de old_key à new_key (None = libre) ;
+  typiquement CardRenderer.rebind, qui réapplique le contenu par différence.
+
+Usage:
+    grid = VirtualGrid(canvas, scrollbar, create_card=make_card, bind_card=renderer.rebind, columns=7)
+    grid.set_items([poste_id, ...])     # ordre d'affichage
+    grid.show_message("Aucun poste")    # liste vide
+"""
+
+from typing import Any, Callable, Dict, Hashable, List, Optional, Sequence, Tuple
+
+OFFSCREEN = -10000
+
+
+def visible_range(top: float, height: float, cell_height: float, columns: int, count: int, overscan_rows: int = 1) -> Tuple[int, int]:
+    """Indices [début, fin) des éléments à matérialiser pour une fenêtre [top, top + height)."""
+    if count <= 0 or cell_height <= 0 or columns <= 0:
+        return 0, 0
+    first_row = max(0, int(top // cell_height) - overscan_rows)
+    last_row = int((top + max(0.0, height)) // cell_height) + overscan_rows
+    return min(count, first_row * columns), min(count, (last_row + 1) * columns)
+
+
+class VirtualGrid:
+    def __init__(self, canvas, scrollbar, create_card: Callable[[Any], Dict[str, Any]],
+                 bind_card: Callable[[Dict[str, Any], Optional[Hashable], Optional[Hashable]], None],
+                 columns: int = 7, cell_width: int = 150, cell_height: int = 200,
+                 pad_x: int = 6, pad_y: int = 6, overscan_rows: int = 1):
+        self.canvas = canvas
+        self.scrollbar = scrollbar
+        self.create_card = create_card
+        self.bind_card = bind_card
+        self.columns = max(1, columns)
+        self.card_width = cell_width
+        self.card_height = cell_height
+        self.pad_x = pad_x
+        self.pad_y = pad_y
+        self.overscan_rows = overscan_rows
+        self._keys: List[Hashable] = []
+        self._index: Dict[Hashable, int] = {}
+        self._bound: Dict[Hashable, Dict[str, Any]] = {}   # clé -> carte visible
+        self._free: List[Dict[str, Any]] = []              # cartes recyclables
+        self._positions: Dict[Hashable, Tuple[int, int]] = {}
+        self._measured = False
+        self._message_item = None
+        self._scrollregion = None
+        self._refresh_id = None
+        self.created_cards = 0
+
+        canvas.configure(yscrollcommand=self._on_yscroll)
+        canvas.bind("<Configure>", lambda e: self.schedule_refresh(), add="+")
+
+    # ---------------- API ----------------
+    @property
+    def pool_size(self) -> int:
+        return len(self._bound) + len(self._free)
+
+    def visible_keys(self) -> List[Hashable]:
+        return list(self._bound.keys())
+
+    def set_items(self, keys: Sequence[Hashable]) -> None:
+        """Remplace la liste affichée (ordre conservé) ; les cartes déjà liées restent liées."""
+        self._keys = list(keys)
+        self._index = {k: i for i, k in enumerate(self._keys)}
+        self.show_message(None)
+        self.refresh()
+
+    def show_message(self, text: Optional[str]) -> None:
+        """Affiche un message centré à la place des cartes (None pour l'effacer)."""
+        if text is None:
+            if self._message_item is not None:
+                self.canvas.delete(self._message_item)
+                self._message_item = None
+            return
+        self._keys, self._index = [], {}
+        self.refresh()
+        if self._message_item is None:
+            self._message_item = self.canvas.create_text(10, 30, anchor="nw", text=text,
+                                                         font=("Arial", 12), fill="#7F8C8D")
+        else:
+            self.canvas.itemconfigure(self._message_item, text=text)
+
+    def schedule_refresh(self) -> None:
+        if self._refresh_id is None:
+            try:
+                self._refresh_id = self.canvas.after_idle(self.refresh)
+            except Exception:
+                self._refresh_id = None
+
+    def scroll_to(self, key: Hashable) -> None:
+        idx = self._index.get(key)
+        if idx is None or not self._keys:
+            return
+        rows = (len(self._keys) + self.columns - 1) // self.columns
+        self.canvas.yview_moveto((idx // self.columns) / max(1, rows))
+
+    # ---------------- Mise en page ----------------
+    def _cell_size(self) -> Tuple[float, float]:
+        width = max(1, self.canvas.winfo_width())
+        cell_w = max(self.card_width + 2 * self.pad_x, width / self.columns)
+        return cell_w, self.card_height + 2 * self.pad_y
+
+    def _measure(self, wdict: Dict[str, Any]) -> None:
+        """Mesure la taille réelle d'une carte (une seule fois) pour caler la grille."""
+        self._measured = True
+        try:
+            wdict["outer"].update_idletasks()
+            w, h = wdict["outer"].winfo_reqwidth(), wdict["outer"].winfo_reqheight()
+        except Exception:
+            return
+        if w > 1 and h > 1:
+            self.card_width, self.card_height = w, h
+
+    def refresh(self) -> None:
+        self._refresh_id = None
+        cell_w, cell_h = self._cell_size()
+        rows = (len(self._keys) + self.columns - 1) // self.columns
+        region = (0, 0, int(cell_w * self.columns), int(rows * cell_h))
+        if region != self._scrollregion:
+            self._scrollregion = region
+            self.canvas.configure(scrollregion=region)
+
+        top = self.canvas.canvasy(0)
+        start, end = visible_range(top, self.canvas.winfo_height(), cell_h, self.columns, len(self._keys), self.overscan_rows)
+        wanted = self._keys[start:end]
+        wanted_set = set(wanted)
+
+        # libère les cartes sorties de la vue
+        for key in [k for k in self._bound if k not in wanted_set]:
+            wdict = self._bound.pop(key)
+            self._positions.pop(key, None)
+            self.canvas.coords(wdict["_item"], OFFSCREEN, OFFSCREEN)
+            self.bind_card(wdict, key, None)
+            self._free.append(wdict)
+
+        for key in wanted:
+            wdict = self._bound.get(key)
+            if wdict is None:
+                wdict = self._acquire()
+                self._bound[key] = wdict
+                self.bind_card(wdict, None, key)
+                if not self._measured:
+                    self._measure(wdict)
+                    self.schedule_refresh()
+            idx = self._index[key]
+            pos = (int((idx % self.columns) * cell_w + self.pad_x), int((idx // self.columns) * cell_h + self.pad_y))
+            if self._positions.get(key) != pos:
+                self._positions[key] = pos
+                self.canvas.coords(wdict["_item"], *pos)
+
+    def _acquire(self) -> Dict[str, Any]:
+        if self._free:
+            return self._free.pop()
+        wdict = self.create_card(self.canvas)
+        wdict["_item"] = self.canvas.create_window(OFFSCREEN, OFFSCREEN, window=wdict["outer"], anchor="nw")
+        self.created_cards += 1
+        return wdict
+
+    def _on_yscroll(self, first, last) -> None:
+        self.scrollbar.set(first, last)
+        self.schedule_refresh()
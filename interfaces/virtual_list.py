@@ -0,0 +1,295 @@
+# interfaces/virtual_list.py
+"""
+Treeview virtualisé sur une source paginée (app.paged_query.PagedQuery ou équivalent).
+
+- Le Treeview ne contient que les lignes visibles : les items sont créés une fois puis recyclés
+  (tree.item(iid, values=...)) au défilement ; la barre de défilement est pilotée par l'index
+  de la première ligne et le nombre total de lignes (source.count()).
+- Les pages (page_size lignes) sont lues hors du thread Tk via TaskRunner (sinon en direct),
+  avec préchargement de `prefetch_pages` pages avant / après la vue et cache LRU de
+  `cache_pages` pages ; une page pas encore arrivée s'affiche "Chargement…" (tag "loading").
+- Clic sur un en-tête : tri SQL (source.set_order ; sort_columns associe les colonnes du
+  Treeview aux colonnes SQL), second clic = sens inverse (▲ / ▼).
+- La sélection suit la clé de la ligne (et non l'item recyclé).
+
+Source attendue : columns, key, count(), fetch(offset, limit), set_order(col, desc), invalidate().
+
+Usage:
+    vlist = VirtualTreeview(tree, scrollbar, PagedQuery(db, sql, cols), runner=self.tasks, name="users")
+    vlist.reload()                  # après modification des données
+    vlist.set_source(query_filtree) # autre filtre, même tri
+    vlist.selected_row()            # tuple de la ligne sélectionnée (ou None)
+"""
+
+import tkinter as tk
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+from interfaces.task_runner import LOADING_TEXT
+
+_ARROWS = {False: " ▲", True: " ▼"}
+
+
+class VirtualTreeview:
+    def __init__(self, tree, scrollbar, source, runner=None, name: str = "virtual_list",
+                 page_size: int = 100, cache_pages: int = 8, prefetch_pages: int = 1, row_height: int = 22,
+                 format_row: Optional[Callable[[tuple], Sequence[Any]]] = None,
+                 sort_columns: Optional[Dict[str, str]] = None, on_count: Optional[Callable[[int], None]] = None):
+        self.tree = tree
+        self.scrollbar = scrollbar
+        self.source = source
+        self.runner = runner
+        self.name = name
+        self.page_size = max(1, page_size)
+        self.prefetch_pages = max(0, prefetch_pages)
+        # les pages visibles et préchargées doivent tenir dans le cache
+        self.cache_pages = max(cache_pages, 2 * self.prefetch_pages + 2)
+        self.row_height = row_height
+        self.format_row = format_row or (lambda row: row)
+        self.on_count = on_count
+        # colonne du Treeview -> colonne SQL triable (par défaut : même nom)
+        if sort_columns is None:
+            sort_columns = {col: col for col in tree["columns"] if col in source.columns}
+        self.sort_columns = dict(sort_columns)
+        self.total = 0
+        self.top = 0
+        self._pages: "OrderedDict[int, List[tuple]]" = OrderedDict()
+        self._pending = set()
+        self._generation = 0
+        self._items: List[str] = []
+        self._rows = {}                 # iid -> ligne affichée
+        self._selected_key = None
+        self._syncing_selection = False
+        self._refresh_id = None
+        self._headings = {col: tree.heading(col, "text") for col in tree["columns"]}
+        self.fetched_pages = 0
+
+        scrollbar.configure(command=self._yview)
+        for col, sql_col in self.sort_columns.items():
+            tree.heading(col, command=lambda c=sql_col: self.sort_by(c))
+        tree.bind("<Configure>", lambda e: self.schedule_refresh(), add="+")
+        tree.bind("<MouseWheel>", self._on_wheel, add="+")
+        tree.bind("<Button-4>", lambda e: self.scroll(-3), add="+")
+        tree.bind("<Button-5>", lambda e: self.scroll(3), add="+")
+        tree.bind("<Up>", lambda e: self._on_key(-1))
+        tree.bind("<Down>", lambda e: self._on_key(1))
+        tree.bind("<Prior>", lambda e: self._on_page_key(-1))
+        tree.bind("<Next>", lambda e: self._on_page_key(1))
+        tree.bind("<<TreeviewSelect>>", self._on_select, add="+")
+        tree.bind("<Destroy>", lambda e: self._cancel_pending() if e.widget is tree else None, add="+")
+        self._show_sort_arrow()
+
+    # ---------------- API ----------------
+    def reload(self) -> None:
+        """Relit le nombre de lignes et vide le cache (données modifiées)."""
+        self.source.invalidate()
+        self._reset()
+        self._submit("count", self.source.count, self._on_count)
+
+    def set_source(self, source) -> None:
+        """Nouvelle source (ex. autre filtre) ; l'ordre de tri courant est conservé."""
+        source.set_order(self.source.order_column, self.source.descending)
+        self.source = source
+        self.reload()
+
+    def sort_by(self, column: str) -> None:
+        descending = not self.source.descending if column == self.source.order_column else False
+        self.source.set_order(column, descending)
+        self._show_sort_arrow()
+        self._reset(keep_total=True)
+        self.refresh()
+
+    def selected_row(self) -> Optional[tuple]:
+        sel = self.tree.selection()
+        return self._rows.get(sel[0]) if sel else None
+
+    def row_for_item(self, iid) -> Optional[tuple]:
+        return self._rows.get(iid)
+
+    def scroll(self, delta: int) -> None:
+        self.scroll_to(self.top + delta)
+
+    def scroll_to(self, index: int) -> None:
+        top = max(0, min(int(index), self.total - self._visible_count()))
+        if top != self.top:
+            self.top = top
+            self.refresh()
+
+    # ---------------- Chargement ----------------
+    def _submit(self, what: str, func: Callable, on_done: Callable, *args) -> None:
+        generation = self._generation
+        done = lambda result: on_done(generation, result)
+        if self.runner is None:
+            done(func(*args))
+        else:
+            self.runner.submit(f"{self.name}:{what}", func, *args, on_done=done, scope=self.name,
+                               on_error=lambda e: print(f"[DEBUG] {self.name} {what} error:", e))
+
+    def _cancel_pending(self) -> None:
+        if self.runner is not None:
+            self.runner.cancel_scope(self.name)
+
+    def _reset(self, keep_total: bool = False) -> None:
+        self._cancel_pending()
+        self._generation += 1
+        self._pages.clear()
+        self._pending.clear()
+        self.top = 0
+        if not keep_total:
+            self.total = 0
+
+    def _on_count(self, generation: int, total: int) -> None:
+        if generation != self._generation:
+            return
+        self.total = int(total or 0)
+        self.refresh()
+        if self.on_count is not None:
+            self.on_count(self.total)
+
+    def _request_page(self, page: int) -> None:
+        if page in self._pages or page in self._pending or page < 0 or page * self.page_size >= self.total:
+            return
+        self._pending.add(page)
+        self._submit(f"page:{page}", self.source.fetch, lambda g, rows, p=page: self._on_page(g, p, rows),
+                     page * self.page_size, self.page_size)
+
+    def _on_page(self, generation: int, page: int, rows: List[tuple]) -> None:
+        if generation != self._generation:
+            return
+        self._pending.discard(page)
+        self._pages[page] = rows
+        self.fetched_pages += 1
+        while len(self._pages) > self.cache_pages:
+            self._pages.popitem(last=False)      # page la moins récemment affichée
+        self.schedule_refresh()
+
+    def _row(self, index: int) -> Optional[tuple]:
+        page = self._pages.get(index // self.page_size)
+        if page is None:
+            return None
+        offset = index % self.page_size
+        return page[offset] if offset < len(page) else None
+
+    # ---------------- Affichage ----------------
+    def _visible_count(self) -> int:
+        height = self.tree.winfo_height()
+        if height <= 1:
+            return int(self.tree["height"] or 10)
+        # une ligne réservée à l'en-tête
+        return max(1, height // self.row_height - 1)
+
+    def schedule_refresh(self) -> None:
+        if self._refresh_id is None:
+            try:
+                self._refresh_id = self.tree.after_idle(self.refresh)
+            except Exception:
+                self._refresh_id = None
+
+    def refresh(self) -> None:
+        self._refresh_id = None
+        try:
+            if not self.tree.winfo_exists():
+                return
+        except Exception:
+            return
+        visible = self._visible_count()
+        self.top = max(0, min(self.top, self.total - visible))
+        count = max(0, min(visible, self.total - self.top))
+
+        first_page = self.top // self.page_size
+        last_page = (self.top + max(count, 1) - 1) // self.page_size
+        for page in range(first_page, last_page + 1):
+            if page in self._pages:
+                self._pages.move_to_end(page)
+            self._request_page(page)
+        for d in range(1, self.prefetch_pages + 1):
+            self._request_page(last_page + d)
+            self._request_page(first_page - d)
+
+        while len(self._items) < count:
+            self._items.append(self.tree.insert("", tk.END, values=()))
+        while len(self._items) > count:
+            iid = self._items.pop()
+            self._rows.pop(iid, None)
+            self.tree.delete(iid)
+
+        key_index = self.source.columns.index(self.source.key)
+        selected = None
+        for i, iid in enumerate(self._items):
+            row = self._row(self.top + i)
+            if row is None:
+                self._rows.pop(iid, None)
+                n = len(self.tree["columns"])
+                self.tree.item(iid, values=("", LOADING_TEXT) + ("",) * (n - 2) if n > 1 else (LOADING_TEXT,),
+                               tags=("loading",))
+                continue
+            self._rows[iid] = row
+            self.tree.item(iid, values=tuple(self.format_row(row)), tags=())
+            if self._selected_key is not None and row[key_index] == self._selected_key:
+                selected = iid
+        self.tree.tag_configure("loading", foreground="#7F8C8D")
+        self._sync_selection(selected)
+
+        if self.total:
+            self.scrollbar.set(self.top / self.total, min(1.0, (self.top + count) / self.total))
+        else:
+            self.scrollbar.set(0.0, 1.0)
+
+    def _sync_selection(self, iid) -> None:
+        current = self.tree.selection()
+        wanted = (iid,) if iid else ()
+        if tuple(current) == wanted:
+            return
+        self._syncing_selection = True
+        try:
+            self.tree.selection_set(wanted)
+            if iid:
+                self.tree.focus(iid)
+        finally:
+            self.tree.after_idle(lambda: setattr(self, "_syncing_selection", False))
+
+    def _on_select(self, event=None) -> None:
+        if self._syncing_selection:
+            return
+        row = self.selected_row()
+        key_index = self.source.columns.index(self.source.key)
+        self._selected_key = row[key_index] if row else None
+
+    def _show_sort_arrow(self) -> None:
+        for col, text in self._headings.items():
+            sorted_col = self.sort_columns.get(col) == self.source.order_column
+            arrow = _ARROWS[self.source.descending] if sorted_col else ""
+            self.tree.heading(col, text=text + arrow)
+
+    # ---------------- Défilement ----------------
+    def _yview(self, *args) -> None:
+        visible = self._visible_count()
+        if args[0] == "moveto":
+            self.scroll_to(round(float(args[1]) * self.total))
+        elif args[0] == "scroll":
+            step = int(args[1]) * (visible if args[2] == "pages" else 1)
+            self.scroll(step)
+
+    def _on_wheel(self, event) -> str:
+        self.scroll(-3 if event.delta > 0 else 3)
+        return "break"
+
+    def _on_key(self, delta: int) -> Optional[str]:
+        focus = self.tree.focus()
+        if not self._items or focus not in self._items:
+            return None
+        pos = self._items.index(focus) + delta
+        if 0 <= pos < len(self._items):
+            return None         # déplacement normal dans la vue
+        self.scroll(delta)      # bord de la vue : on fait défiler, la sélection suit la ligne voisine
+        index = self.top + (0 if delta < 0 else len(self._items) - 1)
+        row = self._row(index)
+        if row is not None:
+            self._selected_key = row[self.source.columns.index(self.source.key)]
+            self.refresh()
+            self.tree.event_generate("<<TreeviewSelect>>")
+        return "break"
+
+    def _on_page_key(self, direction: int) -> str:
+        self.scroll(direction * self._visible_count())
+        return "break"
@@ -0,0 +1,37 @@
+#!/usr/bin/env python3
+# migrations/003_fidelity_canonical_schema.py
+"""
+Converge tickets_fidelite / fidelity_reward_grants vers le schéma canonique de TicketsManager
+(user_id / ticket_date / minutes_awarded). Les tables créées par 001_create_fidelity_tables.sql
+(client_id / date_jour / minutes_granted) sont reconstruites en conservant leurs données.
+
+Usage:
+    python migrations/003_fidelity_canonical_schema.py [db_path]
+"""
+import sqlite3
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.append(str(ROOT))
+
+from app.fidelity_helpers import DB, migrate_to_canonical_schema
+
+if __name__ == "__main__":
+    db_path = sys.argv[1] if len(sys.argv) > 1 else DB
+    if not Path(db_path).exists():
+        print("DB not found:", db_path)
+        sys.exit(1)
+    print("Using DB:", db_path)
+    conn = sqlite3.connect(db_path)
+    try:
+        rebuilt = migrate_to_canonical_schema(conn)
+        if rebuilt:
+            print("Tables converties au schéma canonique:", ", ".join(rebuilt))
+        else:
+            print("Schéma déjà canonique, rien à faire.")
+    except Exception as e:
+        print("Error applying migration:", e)
+        raise
+    finally:
+        conn.close()
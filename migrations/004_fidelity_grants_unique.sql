@@ -0,0 +1,18 @@
+-- migrations/004_fidelity_grants_unique.sql
+BEGIN TRANSACTION;
+
+-- références non discriminantes ('' / 'admin_force') -> suffixe ':<id>' pour les rendre uniques
+UPDATE fidelity_reward_grants
+SET source_reference = CASE WHEN COALESCE(source_reference, '') = '' THEN 'legacy' ELSE source_reference END || ':' || id
+WHERE COALESCE(source_reference, '') IN ('', 'admin_force');
+
+-- doublons : on garde le premier grant (déjà crédité)
+DELETE FROM fidelity_reward_grants
+WHERE id NOT IN (
+  SELECT MIN(id) FROM fidelity_reward_grants GROUP BY user_id, grant_type, source_reference
+);
+
+-- idempotence des grants : existence + insertion en une seule instruction indexée (INSERT OR IGNORE)
+CREATE UNIQUE INDEX IF NOT EXISTS idx_reward_user_type_ref ON fidelity_reward_grants (user_id, grant_type, source_reference);
+
+COMMIT;
@@ -0,0 +1,35 @@
+#!/usr/bin/env python3
+# migrations/005_revenue_rollup.py
+"""
+Crée la table revenue_rollup (agrégats de recette par jour / heure / console / opérateur / mois)
+et la remplit depuis l'historique des sessions. Relançable : la table est reconstruite.
+
+Usage:
+    python migrations/005_revenue_rollup.py [db_path]
+"""
+import sqlite3
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.append(str(ROOT))
+
+from config.settings import DATABASE_PATH
+from app.revenue_rollup import rebuild_revenue_rollup
+
+if __name__ == "__main__":
+    db_path = sys.argv[1] if len(sys.argv) > 1 else str(DATABASE_PATH)
+    if not Path(db_path).exists():
+        print("DB not found:", db_path)
+        sys.exit(1)
+    print("Using DB:", db_path)
+    conn = sqlite3.connect(db_path)
+    try:
+        count = rebuild_revenue_rollup(conn.cursor())
+        conn.commit()
+        print(f"revenue_rollup reconstruite ({count} paiement(s) repris).")
+    except Exception as e:
+        print("Error applying migration:", e)
+        raise
+    finally:
+        conn.close()
@@ -0,0 +1,40 @@
+#!/usr/bin/env python3
+# migrations/006_relational_outputs_tariffs.py
+"""
+Crée poste_outputs et group_tariffs (clés étrangères, index) et y reprend les blobs JSON
+physical_postes.outputs / console_groups.tariffs (vidés ensuite). Relançable : la reprise n'a lieu
+qu'à la création des tables, une nouvelle exécution ne touche pas aux données.
+
+Usage:
+    python migrations/006_relational_outputs_tariffs.py [db_path]
+"""
+import sqlite3
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.append(str(ROOT))
+
+from config.settings import DATABASE_PATH
+from app.relational_schema import ensure_relational_schema
+
+if __name__ == "__main__":
+    db_path = sys.argv[1] if len(sys.argv) > 1 else str(DATABASE_PATH)
+    if not Path(db_path).exists():
+        print("DB not found:", db_path)
+        sys.exit(1)
+    print("Using DB:", db_path)
+    conn = sqlite3.connect(db_path)
+    try:
+        cur = conn.cursor()
+        created = ensure_relational_schema(cur)
+        conn.commit()
+        if created:
+            print("Tables créées, blobs JSON repris puis vidés.")
+        else:
+            print("Tables déjà présentes : rien à reprendre.")
+    except Exception as e:
+        print("Error applying migration:", e)
+        raise
+    finally:
+        conn.close()
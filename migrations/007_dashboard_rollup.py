@@ -0,0 +1,36 @@
+#!/usr/bin/env python3
+# migrations/007_dashboard_rollup.py
+"""
+Crée les tables dashboard_rollup / rollup_watermarks (tableau de bord admin : occupation,
+bonus émis / consommés, coût des récompenses fidélité) et les remplit depuis l'historique.
+Relançable : les agrégats et les marques d'eau sont reconstruits.
+
+Usage:
+    python migrations/007_dashboard_rollup.py [db_path]
+"""
+import sqlite3
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.append(str(ROOT))
+
+from config.settings import DATABASE_PATH
+from app.dashboard_rollup import rebuild_dashboard_rollup
+
+if __name__ == "__main__":
+    db_path = sys.argv[1] if len(sys.argv) > 1 else str(DATABASE_PATH)
+    if not Path(db_path).exists():
+        print("DB not found:", db_path)
+        sys.exit(1)
+    print("Using DB:", db_path)
+    conn = sqlite3.connect(db_path)
+    try:
+        counts = rebuild_dashboard_rollup(conn.cursor())
+        conn.commit()
+        print("dashboard_rollup reconstruite :", ", ".join(f"{k}={v}" for k, v in counts.items()))
+    except Exception as e:
+        print("Error applying migration:", e)
+        raise
+    finally:
+        conn.close()